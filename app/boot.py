@@ -3,66 +3,207 @@
 """
 Run once at process start-up:
 • Walk through /app/data/persist looking for *.pdf
-• Skip any file already indexed
-• Ingest → chunk → embed → store
+• Skip any file already indexed (one metadata scan, not one per file)
+• Ingest → chunk → embed → store through the staged pipeline in app.indexing
+
+The API starts this as a background task (``start_background``) so it serves
+queries against the partial index meanwhile.  A file lock lets only one
+Uvicorn worker index; progress and ETA go to BOOT_PROGRESS_FILE, which every
+worker can read for ``/admin/index_status``.  The same worker then keeps the
+folder watched (app.watcher) so later additions / edits / deletions apply
+without a restart.
 """
 
 import asyncio
+import json
 import logging
+import os
 import time
-from pathlib import Path
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev boxes
+    fcntl = None
+
+from app.vector_store import indexed_sources
+from app.indexing import IngestPipeline, IngestStats, index_file
+from app.watcher import PERSIST_WATCH, FolderWatcher
 
-from app.vector_store import new_persistent_store, persist_has_source
-from app.ingestion import load_and_split
+PERSIST_PDF_DIR = Path("/app/data/persist")  # created by start_background()
 
-PERSIST_PDF_DIR = Path("/app/data/persist")
-PERSIST_PDF_DIR.mkdir(parents=True, exist_ok=True)
+BOOT_PROGRESS_FILE = Path(os.getenv("BOOT_PROGRESS_FILE", "/app/data/boot_progress.json"))
+BOOT_LOCK_FILE     = Path(os.getenv("BOOT_LOCK_FILE", "/app/data/boot_index.lock"))
+BOOT_PROGRESS_INTERVAL_S = float(os.getenv("BOOT_PROGRESS_INTERVAL_S", "2"))
+
+watcher = FolderWatcher(PERSIST_PDF_DIR)
 
 log = logging.getLogger("boot")
 log.setLevel(logging.INFO)
 
-def _index_file(pdf_path: Path) -> None:
+def _index_file(pdf_path: Path, source_dir: Optional[Path] = None) -> None:
     log.info("🔄  indexing %s", pdf_path.name)
     start = time.perf_counter()
-    store = new_persistent_store()
-    chunks = load_and_split(str(pdf_path))
-    if not chunks:
-        log.warning("⚠️  no text extracted from %s – skipping", pdf_path.name)
-        return
-    for c in chunks:
-        c.metadata["source"] = pdf_path.name
-        c.metadata["indexed_at"] = datetime.utcnow().isoformat()
     try:
-        store.add_documents(chunks)
-        dur = time.perf_counter() - start
-        log.info(
-            "✅  stored %d chunks for %s in %.2fs",
-            len(chunks),
-            pdf_path.name,
-            dur,
-        )
+        n = index_file(pdf_path, source_dir)
     except ValueError as exc:
         log.error("❌  failed to store embeddings for %s: %s", pdf_path.name, exc)
-    finally:
-        del store
+        return
+    if not n:
+        log.warning("⚠️  no text extracted from %s – skipping", pdf_path.name)
+        return
+    log.info(
+        "✅  stored %d chunks for %s in %.2fs",
+        n,
+        pdf_path.name,
+        time.perf_counter() - start,
+    )
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Progress file (shared by all workers)
+# ────────────────────────────────────────────────────────────────────────────────
+def _progress(state: str, stats: Optional[IngestStats] = None, started: Optional[float] = None) -> dict:
+    out = {
+        "state": state,
+        "pid": os.getpid(),
+        "updated_at": datetime.utcnow().isoformat(),
+        "files": 0, "indexed": 0, "empty": 0, "failed": 0, "chunks": 0,
+        "percent": 100.0 if state == "done" else 0.0,
+        "started_at": None,
+        "elapsed_s": None,
+        "eta_s": None,
+    }
+    if stats is not None:
+        out.update(
+            files=stats.files, indexed=stats.indexed, empty=stats.empty,
+            failed=stats.failed, chunks=stats.chunks,
+        )
+        if stats.files:
+            out["percent"] = round(100.0 * stats.finished / stats.files, 1)
+    if started is not None:
+        elapsed = time.time() - started
+        out["started_at"] = datetime.utcfromtimestamp(started).isoformat()
+        out["elapsed_s"] = round(elapsed, 1)
+        if stats is not None and stats.finished and state == "running":
+            out["eta_s"] = round(elapsed / stats.finished * (stats.files - stats.finished), 1)
+    return out
 
+
+def _write_progress(data: dict) -> None:
+    try:
+        BOOT_PROGRESS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = BOOT_PROGRESS_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data), "utf-8")
+        os.replace(tmp, BOOT_PROGRESS_FILE)
+    except OSError as exc:
+        log.debug("could not write %s: %s", BOOT_PROGRESS_FILE, exc)
+
+
+def read_progress() -> dict:
+    """Return the last progress snapshot written by whichever worker indexes."""
+    try:
+        return json.loads(BOOT_PROGRESS_FILE.read_text("utf-8"))
+    except (OSError, ValueError):
+        return _progress("idle")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Indexing run
+# ────────────────────────────────────────────────────────────────────────────────
 async def run() -> None:
     pdfs = sorted(PERSIST_PDF_DIR.glob("*.pdf"))
     if not pdfs:
         log.info("📂  no PDFs found – skipping indexing")
+        _write_progress(_progress("done"))
+        return
+
+    _write_progress(_progress("scanning"))
+    try:
+        done = await asyncio.to_thread(indexed_sources)
+    except Exception:
+        log.exception("❌  could not read the index; skipping boot indexing")
+        _write_progress(_progress("failed"))
         return
+    todo = [p for p in pdfs if p.name not in done]
+    if len(todo) < len(pdfs):
+        log.info("↪︎  %d of %d PDFs already indexed", len(pdfs) - len(todo), len(pdfs))
+    if not todo:
+        _write_progress(_progress("done"))
+        return
+
+    pipe = IngestPipeline("boot")
+    started = time.time()
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(BOOT_PROGRESS_INTERVAL_S)
+            _write_progress(_progress("running", pipe.stats, started))
+
+    _write_progress(_progress("running", IngestStats(files=len(todo)), started))
+    reporter = asyncio.ensure_future(report())
+    try:
+        stats = await pipe.run(todo)
+    except BaseException:
+        _write_progress(_progress("interrupted", pipe.stats, started))
+        raise
+    finally:
+        reporter.cancel()
+    _write_progress(_progress("done", stats, started))
+    log.info(
+        "📚  indexed %d files (%d chunks) in %.1fs – %d empty, %d failed",
+        stats.indexed, stats.chunks, stats.seconds, stats.empty, stats.failed,
+    )
+
+
+_LOCK = None  # open lock file while this process owns boot indexing
+
+
+def _try_lock():
+    """Return an open, exclusively locked file – or None if another worker has it."""
+    if fcntl is None:
+        return True  # no flock (Windows dev box): assume a single worker
+    BOOT_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fh = open(BOOT_LOCK_FILE, "w")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        fh.close()
+        return None
+    return fh
+
+
+def start_background(watch: bool = PERSIST_WATCH) -> Optional[asyncio.Task]:
+    """Start boot indexing (and the folder watcher) unless another worker has.
+
+    The lock is held for the life of the process, so workers that start
+    later (or are restarted by Uvicorn) do not index the folder again.
+    """
+    global _LOCK
+    PERSIST_PDF_DIR.mkdir(parents=True, exist_ok=True)
+    _LOCK = _LOCK or _try_lock()
+    if _LOCK is None:
+        log.info("📚  boot indexing handled by another worker")
+        return None
 
-    async def worker(pdf: Path) -> None:
-        if persist_has_source(pdf.name):
-            log.debug("↪︎  already indexed: %s", pdf.name)
-            return
+    async def _run() -> None:
         try:
-            await asyncio.to_thread(_index_file, pdf)
+            await run()
+        except asyncio.CancelledError:
+            raise
         except Exception:
-            log.exception("❌  failed to index %s", pdf.name)
+            log.exception("❌  boot indexing failed")
+            _write_progress(_progress("failed"))
 
-    await asyncio.gather(*(worker(pdf) for pdf in pdfs))
+    if watch:
+        # start watching first so nothing copied in during the boot run is missed
+        asyncio.ensure_future(watcher.run())
+    return asyncio.ensure_future(_run())
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    _LOCK = _try_lock()
+    if _LOCK is None:
+        log.info("📚  boot indexing already running in another process")
+    else:
+        asyncio.run(run())
@@ -0,0 +1,209 @@
+# app/bulk.py
+
+"""
+Bulk admin uploads
+──────────────────
+``POST /admin/upload_bulk`` takes many PDFs and/or zip archives in one
+request.  Files are spooled into a staging folder, the request returns a
+batch id straight away, and a background task ingests the batch through the
+bounded ``IngestPipeline``.  Each finished PDF is moved into
+``boot.PERSIST_PDF_DIR`` and its status (chunks, seconds, error) recorded.
+
+Batch state is written as JSON under BULK_STATUS_DIR so any Uvicorn worker
+can answer ``GET /admin/upload_bulk/{batch_id}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from app.indexing import IngestPipeline
+from app.vector_store import delete_source
+
+BULK_STATUS_DIR   = Path(os.getenv("BULK_STATUS_DIR", "/app/data/bulk_batches"))
+BULK_MAX_FILES    = int(os.getenv("BULK_MAX_FILES", "1000"))
+BULK_MAX_UNZIP_MB = int(os.getenv("BULK_MAX_UNZIP_MB", "2048"))
+BULK_KEEP_BATCHES = int(os.getenv("BULK_KEEP_BATCHES", "50"))
+
+log = logging.getLogger("bulk")
+
+
+class BulkRejected(ValueError):
+    """The upload cannot be accepted (too many files, bad archive …)."""
+
+
+@dataclass
+class FileStatus:
+    filename: str
+    status: str = "queued"   # queued | indexed | empty | failed | skipped
+    chunks: int = 0
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class Batch:
+    batch_id: str
+    state: str = "queued"    # queued | running | done
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    finished_at: Optional[str] = None
+    seconds: Optional[float] = None
+    files: List[FileStatus] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _safe_name(name: str) -> str:
+    """Drop any directory part so archive members cannot escape the target."""
+    return Path(name.replace("\\", "/")).name
+
+
+def _is_pdf(name: str) -> bool:
+    return name.lower().endswith(".pdf") and not name.startswith(".")
+
+
+class BulkIngest:
+    def __init__(self, pdf_dir: Path, status_dir: Path = BULK_STATUS_DIR) -> None:
+        self.pdf_dir = Path(pdf_dir)
+        self.status_dir = Path(status_dir)
+        self._lock = asyncio.Lock()  # one bulk pipeline at a time per worker
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # -- persistence -------------------------------------------------------
+    def _status_path(self, batch_id: str) -> Path:
+        return self.status_dir / f"{batch_id}.json"
+
+    def _save(self, batch: Batch) -> None:
+        try:
+            self.status_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._status_path(batch.batch_id).with_suffix(".tmp")
+            tmp.write_text(json.dumps(batch.to_dict()), "utf-8")
+            os.replace(tmp, self._status_path(batch.batch_id))
+        except OSError as exc:
+            log.warning("could not save batch %s: %s", batch.batch_id, exc)
+
+    def _prune(self) -> None:
+        files = sorted(self.status_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for p in files[: max(0, len(files) - BULK_KEEP_BATCHES)]:
+            p.unlink(missing_ok=True)
+
+    def get(self, batch_id: str) -> Optional[dict]:
+        if not batch_id.isalnum():
+            return None
+        try:
+            return json.loads(self._status_path(batch_id).read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    # -- staging -----------------------------------------------------------
+    def new_batch(self) -> Batch:
+        return Batch(uuid.uuid4().hex)
+
+    def staging_dir(self, batch: Batch) -> Path:
+        path = self.pdf_dir / f".bulk-{batch.batch_id}"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def stage(self, batch: Batch, filename: str, fh: BinaryIO) -> None:
+        """Copy one uploaded PDF or zip archive into the batch's staging dir."""
+        staging = self.staging_dir(batch)
+        name = _safe_name(filename or "")
+        if name.lower().endswith(".zip"):
+            self._stage_zip(batch, staging, fh)
+        elif _is_pdf(name):
+            self._reserve(batch, name)
+            with open(staging / name, "wb") as out:
+                shutil.copyfileobj(fh, out)
+        else:
+            batch.files.append(FileStatus(name or "<unnamed>", "skipped", error="not a PDF or zip"))
+
+    def _reserve(self, batch: Batch, name: str) -> None:
+        if sum(f.status == "queued" for f in batch.files) >= BULK_MAX_FILES:
+            raise BulkRejected(f"more than {BULK_MAX_FILES} PDFs in one batch")
+        for f in batch.files:
+            if f.filename == name and f.status == "queued":
+                f.error = "duplicate name in batch; last copy wins"
+                return
+        batch.files.append(FileStatus(name))
+
+    def _stage_zip(self, batch: Batch, staging: Path, fh: BinaryIO) -> None:
+        try:
+            zf = zipfile.ZipFile(fh)
+        except zipfile.BadZipFile as exc:
+            raise BulkRejected(f"bad zip archive: {exc}") from exc
+        with zf:
+            members = [m for m in zf.infolist() if not m.is_dir() and _is_pdf(_safe_name(m.filename))]
+            total = sum(m.file_size for m in members)
+            if total > BULK_MAX_UNZIP_MB * 1024 * 1024:
+                raise BulkRejected(f"archive expands to more than {BULK_MAX_UNZIP_MB} MB")
+            for m in members:
+                name = _safe_name(m.filename)
+                self._reserve(batch, name)
+                with zf.open(m) as src, open(staging / name, "wb") as out:
+                    shutil.copyfileobj(src, out)
+
+    def discard(self, batch: Batch) -> None:
+        shutil.rmtree(self.pdf_dir / f".bulk-{batch.batch_id}", ignore_errors=True)
+
+    # -- ingestion ---------------------------------------------------------
+    def start(self, batch: Batch) -> asyncio.Task:
+        self._save(batch)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks[batch.batch_id] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(batch.batch_id, None))
+        return task
+
+    async def _run(self, batch: Batch) -> None:
+        staging = self.pdf_dir / f".bulk-{batch.batch_id}"
+        by_name = {f.filename: f for f in batch.files if f.status == "queued"}
+        start = time.perf_counter()
+        emptied: List[str] = []
+
+        def on_file(path: Path, outcome: str, chunks: int, seconds: float, error: Optional[str]) -> None:
+            st = by_name[path.name]
+            st.status, st.chunks, st.seconds, st.error = outcome, chunks, round(seconds, 2), error
+            if outcome != "failed":
+                # publish only what was ingested; the watcher sees it as indexed.
+                # A failed replacement keeps the old PDF and its chunks.
+                if outcome == "empty" and (self.pdf_dir / path.name).exists():
+                    emptied.append(path.name)
+                os.replace(path, self.pdf_dir / path.name)
+            self._save(batch)
+
+        try:
+            async with self._lock:
+                batch.state = "running"
+                self._save(batch)
+                # a replaced document's surplus chunks are pruned by the writer
+                # once its new chunks are in; one replaced by a text-less PDF
+                # loses all of them here
+                pipe = IngestPipeline("bulk", source_dir=self.pdf_dir, on_file=on_file)
+                await pipe.run([staging / n for n in by_name])
+                for name in emptied:
+                    await asyncio.to_thread(delete_source, name)
+        finally:
+            batch.state = "done"
+            batch.finished_at = datetime.utcnow().isoformat()
+            batch.seconds = round(time.perf_counter() - start, 2)
+            self._save(batch)
+            self.discard(batch)
+            await asyncio.to_thread(self._prune)
+        log.info(
+            "📦  batch %s: %d indexed, %d failed in %.1fs",
+            batch.batch_id,
+            sum(f.status == "indexed" for f in batch.files),
+            sum(f.status == "failed" for f in batch.files),
+            batch.seconds,
+        )
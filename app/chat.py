@@ -8,12 +8,16 @@ from __future__ import annotations
 import os
 import logging
 import time
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
 from uuid import uuid4
 
 import ollama
-from langchain.memory import ConversationBufferMemory
+from app import deadlines
 from app.ollama_utils import finalize_ollama_chat
+from app.metrics import record_ollama, span
+
+if TYPE_CHECKING:  # langchain.memory is imported on the first chat
+    from langchain.memory import ConversationBufferMemory
 
 # ------------------------------------------------------------------
 # system prompts
@@ -34,15 +38,22 @@ OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
 DEFAULT_MODEL    = os.getenv("OLLAMA_DEFAULT_MODEL", "llama3:8b-instruct-q3_K_L")
 
 # in-memory map session_id → ConversationBufferMemory
-_sessions: Dict[str, ConversationBufferMemory] = {}
+_sessions: Dict[str, "ConversationBufferMemory"] = {}
 
 
-def _get_memory(session_id: str) -> ConversationBufferMemory:
+def _get_memory(session_id: str) -> "ConversationBufferMemory":
     if session_id not in _sessions:
+        from langchain.memory import ConversationBufferMemory  # heavy: first chat only
+
         _sessions[session_id] = ConversationBufferMemory(return_messages=True)
     return _sessions[session_id]
 
 
+def forget(session_id: str) -> None:
+    """Drop the conversation memory of an ended or expired session."""
+    _sessions.pop(session_id, None)
+
+
 def new_session_id() -> str:
     return str(uuid4())
 
@@ -59,13 +70,41 @@ def _lc_to_ollama(msg) -> dict:
     return {"role": role_map.get(msg.type, "assistant"), "content": msg.content}
 
 
-def safe_chat(*, model: str, messages: list, stream: bool = False, **kwargs):
+def _collect(raw) -> Dict:
+    """Join a streamed ``ollama.chat`` into one non-streamed response.
+
+    Stops as soon as the caller was cancelled (``deadlines.aborted()``);
+    closing the stream drops the connection, which ends the generation.
+    """
+    if not isinstance(raw, Iterator):
+        return finalize_ollama_chat(raw)
+    parts, last = [], None
+    try:
+        for chunk in raw:
+            if deadlines.aborted():
+                raise deadlines.Aborted("generation cancelled")
+            last = finalize_ollama_chat(chunk)
+            parts.append((last.get("message") or {}).get("content") or "")
+    finally:
+        close = getattr(raw, "close", None)
+        if close is not None:
+            close()
+    if last is None:
+        raise ValueError("No messages received from Ollama")
+    return {**last, "message": {**(last.get("message") or {}), "content": "".join(parts)}}
+
+
+def safe_chat(*, model: str, messages: list, **kwargs):
     """Call ``ollama.chat`` with basic retry logic.
 
     A blank response with ``done_reason == 'load'`` indicates the model is still
     warming up. In this case the request is retried a few times with a short
     delay before giving up. Any error on the first call falls back to
     ``DEFAULT_MODEL`` once.
+
+    Ollama is always streamed and the chunks joined, so a call running under
+    ``deadlines.run_sync`` can be abandoned between tokens.  The caller
+    always gets the whole message; there is no ``stream`` argument.
     """
 
     attempt = 0
@@ -73,8 +112,10 @@ def safe_chat(*, model: str, messages: list, stream: bool = False, **kwargs):
 
     while True:
         try:
-            raw = ollama.chat(model=cur_model, messages=messages, stream=stream, **kwargs)
-            msg = finalize_ollama_chat(raw)
+            raw = ollama.chat(model=cur_model, messages=messages, stream=True, **kwargs)
+            msg = _collect(raw)
+        except deadlines.Aborted:
+            raise
         except Exception as e:
             if cur_model == DEFAULT_MODEL or attempt > 0:
                 raise
@@ -86,11 +127,14 @@ def safe_chat(*, model: str, messages: list, stream: bool = False, **kwargs):
             continue
 
         if msg.get("done_reason") != "load":
+            record_ollama(cur_model, msg)
             return msg
 
         # model is still loading → wait and retry
         if attempt >= 10:
             raise RuntimeError("model did not load in time")
+        if deadlines.aborted():
+            raise deadlines.Aborted("generation cancelled")
         attempt += 1
         time.sleep(1)
 
@@ -115,7 +159,8 @@ def chat(
     mem = _get_memory(session_id)
 
     # 2) rebuild full history in Ollama schema
-    messages = [_lc_to_ollama(m) for m in mem.chat_memory.messages]
+    with span("chat", "history"):
+        messages = [_lc_to_ollama(m) for m in mem.chat_memory.messages]
 
     # 3) choose the model
     chosen_model = model or DEFAULT_MODEL
@@ -128,7 +173,8 @@ def chat(
     messages.append({"role": "user", "content": user_msg})
 
     # 4) call Ollama (no temperature arg here)
-    raw = safe_chat(model=chosen_model, messages=messages, stream=False)
+    with span("chat", "llm"):
+        raw = safe_chat(model=chosen_model, messages=messages)
     msg = finalize_ollama_chat(raw)
     assistant_reply = msg["message"]["content"]
 
@@ -0,0 +1,165 @@
+# app/chunking.py
+
+"""
+Chunking strategies
+───────────────────
+• chars   – RecursiveCharacterTextSplitter on CHUNK_SIZE / CHUNK_OVERLAP
+            characters (the original behaviour)
+• tokens  – 1) strip page headers / footers that repeat across pages, bare
+               page numbers and table-of-contents leader lines
+            2) split on CHUNK_TOKENS / CHUNK_TOKEN_OVERLAP tokens
+               (``tokenizer.count_tokens``)
+            3) merge fragments under CHUNK_MIN_TOKENS into a neighbour
+
+CHUNK_STRATEGY picks the default; CHUNK_STRATEGY_RULES overrides it per
+document with filename globs, e.g. ``slides_*.pdf=chars;*manual*.pdf=tokens``.
+``python benchmarks/chunking.py`` compares the strategies.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from langchain.schema import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.tokenizer import count_tokens
+
+STRATEGIES = ("chars", "tokens")
+
+CHUNK_STRATEGY       = os.getenv("CHUNK_STRATEGY", "chars")
+CHUNK_STRATEGY_RULES = os.getenv("CHUNK_STRATEGY_RULES", "")
+CHUNK_TOKENS         = int(os.getenv("CHUNK_TOKENS", "256"))
+CHUNK_TOKEN_OVERLAP  = int(os.getenv("CHUNK_TOKEN_OVERLAP", "32"))
+CHUNK_MIN_TOKENS     = int(os.getenv("CHUNK_MIN_TOKENS", "48"))
+
+# a line is a header/footer if it sits in the first/last EDGE_LINES of at least
+# this share of pages (and of at least 3 pages)
+BOILERPLATE_SHARE = 0.5
+EDGE_LINES = 2
+EDGE_MAX_WORDS = 12  # running heads are short; never drop a body line
+
+_DIGITS = re.compile(r"\d+")
+_PAGE_NO = re.compile(r"^\W*(page\s*)?\d+(\s*(of|/)\s*\d+)?\W*$", re.IGNORECASE)
+_TOC_LINE = re.compile(r"(\.\s*){4,}\d+\s*$")
+
+
+def _rules(spec: str) -> Dict[str, str]:
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        pattern, _, strategy = part.partition("=")
+        if strategy.strip() in STRATEGIES:
+            out[pattern.strip()] = strategy.strip()
+    return out
+
+
+def strategy_for(file_path: str, default: Optional[str] = None) -> str:
+    """Strategy for *file_path*: first matching CHUNK_STRATEGY_RULES glob,
+    else *default* / CHUNK_STRATEGY."""
+    name = Path(file_path).name
+    for pattern, strategy in _rules(CHUNK_STRATEGY_RULES).items():
+        if fnmatch.fnmatch(name, pattern):
+            return strategy
+    strategy = default or CHUNK_STRATEGY
+    return strategy if strategy in STRATEGIES else "chars"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Boilerplate
+# ────────────────────────────────────────────────────────────────────────────────
+def _norm(line: str) -> str:
+    return " ".join(_DIGITS.sub("#", line.lower()).split())
+
+
+def _edges(lines: List[str]) -> List[int]:
+    idx = [i for i, line in enumerate(lines) if line.strip()]
+    return sorted(i for i in set(idx[:EDGE_LINES] + idx[-EDGE_LINES:]) if len(lines[i].split()) <= EDGE_MAX_WORDS)
+
+
+def repeated_edge_lines(pages: List[Document]) -> Set[str]:
+    """Normalised lines that open or close many pages (running heads/feet)."""
+    seen: Counter = Counter()
+    for p in pages:
+        lines = p.page_content.splitlines()
+        seen.update({_norm(lines[i]) for i in _edges(lines)})
+    need = max(3, BOILERPLATE_SHARE * len(pages))
+    return {line for line, n in seen.items() if n >= need and line}
+
+
+def strip_boilerplate(pages: List[Document]) -> List[Document]:
+    """Copies of *pages* without running headers/footers, bare page numbers
+    and table-of-contents leader lines."""
+    repeated = repeated_edge_lines(pages)
+    out = []
+    for p in pages:
+        lines = p.page_content.splitlines()
+        edges = set(_edges(lines))
+        kept = [
+            line for i, line in enumerate(lines)
+            if not (i in edges and (_norm(line) in repeated or _PAGE_NO.match(line)))
+            and not _TOC_LINE.search(line)
+        ]
+        out.append(Document(page_content="\n".join(kept).strip(), metadata=dict(p.metadata)))
+    return out
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Splitting
+# ────────────────────────────────────────────────────────────────────────────────
+def merge_small(chunks: List[Document], min_tokens: int, max_tokens: int) -> List[Document]:
+    """Fold chunks under *min_tokens* into the previous chunk (or, at the
+    start, the next one) as long as the result stays under *max_tokens*."""
+    out: List[Document] = []
+    carry = ""
+    for c in chunks:
+        text = c.page_content.strip()
+        if not text:
+            continue
+        if carry:
+            text = f"{carry}\n{text}"
+            carry = ""
+        n = count_tokens(text)
+        if n < min_tokens and out:
+            prev = out[-1]
+            if count_tokens(prev.page_content) + n <= max_tokens:
+                prev.page_content = f"{prev.page_content}\n{text}"
+                continue
+        if n < min_tokens and not out:
+            carry = text  # nothing before it yet: prepend to the next chunk
+            continue
+        out.append(Document(page_content=text, metadata=dict(c.metadata)))
+    if carry:
+        if out:
+            out[-1].page_content = f"{out[-1].page_content}\n{carry}"
+        else:
+            out.append(Document(page_content=carry, metadata=dict(chunks[0].metadata)))
+    return out
+
+
+def split_tokens(
+    pages: List[Document],
+    *,
+    chunk_tokens: int = CHUNK_TOKENS,
+    overlap: int = CHUNK_TOKEN_OVERLAP,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+) -> List[Document]:
+    pages = [p for p in strip_boilerplate(pages) if p.page_content]
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=overlap,
+        length_function=count_tokens,
+    )
+    return merge_small(splitter.split_documents(pages), min_tokens, chunk_tokens + min_tokens)
+
+
+def split_chars(pages: List[Document], *, chunk_size: int, overlap: int) -> List[Document]:
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=overlap,
+    )
+    return splitter.split_documents(pages)
@@ -0,0 +1,233 @@
+# app/deadlines.py
+
+"""
+Request deadlines and client disconnects
+────────────────────────────────────────
+An HTTP request that nobody waits for any more should not keep the CPU LLM
+busy.  ``RequestDeadlineMiddleware`` gives every request a deadline
+(REQUEST_DEADLINE_S; it plus ABORT_GRACE_S stays under Nginx's proxy
+timeout, PROXY_TIMEOUT_S, so the 504 still reaches the client) and watches
+the connection once the request body has been read.  When the client goes
+away or the deadline passes, the handler task is cancelled; a deadline
+answers 504 if nothing was sent yet.
+
+Code further down reads the deadline through this module:
+
+• remaining() / check() – seconds left / raise ``DeadlineExceeded`` between
+                          stages (retrieve, rerank) and bound the LLM queue
+• run_sync()            – ``asyncio.to_thread`` whose thread sees
+                          ``aborted()`` turn true on cancellation; the
+                          streamed Ollama call in ``safe_chat`` then closes
+                          its connection, which stops the generation
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TypeVar
+
+from app import metrics
+
+T = TypeVar("T")
+
+log = logging.getLogger("deadlines")
+
+# proxy_read_timeout of the /api/ location in docker/nginx.conf
+PROXY_TIMEOUT_S = float(os.getenv("PROXY_TIMEOUT_S", "300"))
+# how long a cancelled caller waits for its thread to notice (next token)
+ABORT_GRACE_S = max(0.0, float(os.getenv("ABORT_GRACE_S", "15")))
+
+
+def _request_deadline(configured: Optional[str], grace: float, proxy_timeout: float) -> float:
+    """The 504 can go out up to *grace* after the deadline, so the two must
+    fit inside the proxy timeout (by default with 5 s to spare)."""
+    ceiling = proxy_timeout - grace
+    deadline = float(configured) if configured else ceiling - 5
+    if deadline > ceiling:
+        log.warning(
+            "REQUEST_DEADLINE_S=%g + ABORT_GRACE_S=%g exceeds PROXY_TIMEOUT_S=%g; using %g",
+            deadline, grace, proxy_timeout, ceiling,
+        )
+        deadline = ceiling
+    return deadline
+
+
+# 0 disables the deadline; disconnects are still detected
+REQUEST_DEADLINE_S = _request_deadline(os.getenv("REQUEST_DEADLINE_S"), ABORT_GRACE_S, PROXY_TIMEOUT_S)
+
+ABORTED = metrics.counter(
+    "offlinellm_requests_aborted_total",
+    "Requests cancelled before completion, by reason (disconnect / deadline).",
+    ["reason"],
+)
+
+
+class DeadlineExceeded(Exception):
+    """The current request ran out of time before *stage*."""
+
+    def __init__(self, stage: str = "") -> None:
+        self.stage = stage
+        super().__init__(f"request deadline exceeded{' before ' + stage if stage else ''}")
+
+
+class Aborted(Exception):
+    """Raised inside a ``run_sync`` thread whose caller was cancelled."""
+
+
+@dataclass
+class RequestContext:
+    deadline: Optional[float] = None  # time.monotonic() value
+    reason: Optional[str] = None      # set once the request was aborted
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return math.inf
+        return self.deadline - time.monotonic()
+
+
+current: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
+    "request_context", default=None
+)
+_abort: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    "abort_event", default=None
+)
+
+
+def remaining() -> float:
+    """Seconds left for the current request (``inf`` outside one)."""
+    ctx = current.get()
+    return math.inf if ctx is None else ctx.remaining()
+
+
+def check(stage: str = "") -> None:
+    if remaining() <= 0:
+        raise DeadlineExceeded(stage)
+
+
+def aborted() -> bool:
+    """True inside a ``run_sync`` thread whose caller has gone away."""
+    event = _abort.get()
+    return event is not None and event.is_set()
+
+
+async def run_sync(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run *fn* in a thread; on cancellation tell it and wait for it to stop.
+
+    The cancellation is re-raised only once *fn* has returned (or after
+    ABORT_GRACE_S), so a scheduler slot is not handed to the next caller
+    while Ollama is still generating for this one.
+    """
+    event = threading.Event()
+    ctx = contextvars.copy_context()
+    ctx.run(_abort.set, event)
+    fut = asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(ctx.run, fn, *args, **kwargs)
+    )
+    try:
+        return await asyncio.shield(fut)
+    except asyncio.CancelledError:
+        event.set()
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        await asyncio.wait({fut}, timeout=ABORT_GRACE_S)
+        raise
+
+
+_TIMEOUT_BODY = b'{"detail":"request deadline exceeded"}'
+
+
+class RequestDeadlineMiddleware:
+    """Pure ASGI middleware enforcing deadlines and noticing disconnects.
+
+    The connection can only be watched with ``receive()``, and the handler
+    reads its body through ``receive()`` too, so the watch starts after the
+    last body chunk was handed over; later ``receive()`` calls (Starlette's
+    streaming responses) share the watcher's result.
+    """
+
+    def __init__(self, app, deadline_s: float = REQUEST_DEADLINE_S) -> None:
+        self.app = app
+        self.deadline_s = deadline_s
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ctx = RequestContext(time.monotonic() + self.deadline_s if self.deadline_s > 0 else None)
+        started = finished = False
+        watcher: Optional[asyncio.Future] = None
+        task: Optional[asyncio.Future] = None
+
+        def abort(reason: str) -> None:
+            if ctx.reason is None and not finished and task is not None and not task.done():
+                ctx.reason = reason
+                ABORTED.inc(reason=reason)
+                task.cancel()
+
+        def on_watch(fut: asyncio.Future) -> None:
+            if not fut.cancelled() and fut.exception() is None and fut.result()["type"] == "http.disconnect":
+                abort("disconnect")
+
+        async def watched_receive():
+            nonlocal watcher
+            if watcher is not None:
+                return await asyncio.shield(watcher)
+            message = await receive()
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                watcher = asyncio.ensure_future(receive())
+                watcher.add_done_callback(on_watch)
+            return message
+
+        async def tracked_send(message) -> None:
+            nonlocal started, finished
+            if message["type"] == "http.response.start":
+                started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+            await send(message)
+
+        token = current.set(ctx)
+        try:
+            task = asyncio.ensure_future(self.app(scope, watched_receive, tracked_send))
+        finally:
+            current.reset(token)
+        timer = None
+        if ctx.deadline is not None:
+            timer = asyncio.get_running_loop().call_later(self.deadline_s, abort, "deadline")
+        try:
+            await task
+        except asyncio.CancelledError:
+            if ctx.reason is None:  # we were cancelled ourselves (shutdown)
+                task.cancel()
+                raise
+            if ctx.reason == "deadline" and not started:
+                await self._timeout(send)
+        except DeadlineExceeded:
+            if ctx.reason is None:
+                ctx.reason = "deadline"
+                ABORTED.inc(reason="deadline")
+            if started:
+                raise
+            await self._timeout(send)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if watcher is not None and not watcher.done():
+                watcher.cancel()
+
+    @staticmethod
+    async def _timeout(send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": _TIMEOUT_BODY})
@@ -0,0 +1,164 @@
+# app/embedding.py
+
+"""
+In-process embedding backends
+─────────────────────────────
+Alternatives to ``OllamaEmbeddings`` selected with EMBED_BACKEND:
+
+• sentence-transformers – ``SentenceTransformer`` on EMBED_DEVICE
+• onnx                  – ``model.onnx`` + ``tokenizer.json`` run by ONNX
+                          Runtime with mean pooling (no torch needed)
+
+Both load EMBED_MODEL_DIR offline (like the cross-encoder), embed in batches
+of EMBED_BATCH and use EMBED_THREADS CPU threads, so query and indexing
+embeddings no longer queue behind chat generation in Ollama.  They expose
+the same ``embed_documents`` / ``embed_query`` pair LangChain and Chroma call.
+
+Vectors from different backends (even of the "same" model) are not
+interchangeable: switching backend means re-indexing the permanent KB.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+EMBED_MODEL_DIR    = Path(os.getenv("EMBED_MODEL_DIR", "/app/models/embedder"))
+EMBED_DEVICE       = os.getenv("EMBED_DEVICE", "cpu")
+EMBED_THREADS      = int(os.getenv("EMBED_THREADS", "0"))  # 0 = library default
+EMBED_BATCH        = max(1, int(os.getenv("EMBED_BATCH", "32")))
+EMBED_MAX_TOKENS   = int(os.getenv("EMBED_MAX_TOKENS", "512"))
+EMBED_NORMALIZE    = os.getenv("EMBED_NORMALIZE", "1") == "1"
+EMBED_TRUST_REMOTE_CODE = os.getenv("EMBED_TRUST_REMOTE_CODE", "0") == "1"
+# same defaults as OllamaEmbeddings, so queries and chunks are embedded alike
+EMBED_DOC_PREFIX   = os.getenv("EMBED_DOC_PREFIX", "passage: ")
+EMBED_QUERY_PREFIX = os.getenv("EMBED_QUERY_PREFIX", "query: ")
+
+BACKENDS = ("ollama", "sentence-transformers", "onnx")
+
+log = logging.getLogger("embedding")
+
+
+class LocalEmbeddings:
+    """Batched in-process embedder; the model loads on first use."""
+
+    backend = "local"
+
+    def __init__(
+        self,
+        model_dir: Path = EMBED_MODEL_DIR,
+        *,
+        batch_size: int = EMBED_BATCH,
+        threads: int = EMBED_THREADS,
+        doc_prefix: str = EMBED_DOC_PREFIX,
+        query_prefix: str = EMBED_QUERY_PREFIX,
+    ) -> None:
+        self.model_dir = Path(model_dir)
+        self.batch_size = batch_size
+        self.threads = threads
+        self.doc_prefix = doc_prefix
+        self.query_prefix = query_prefix
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    if not self.model_dir.exists():
+                        raise RuntimeError(f"embedding model not found in {self.model_dir}")
+                    log.info("Loading %s embedder from %s", self.backend, self.model_dir)
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _encode(self, texts: List[str]):
+        """Return a float32 array of shape (len(texts), dim)."""
+        raise NotImplementedError
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = [self.doc_prefix + t for t in texts[i:i + self.batch_size]]
+            out += self._encode(batch).tolist()
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([self.query_prefix + text])[0].tolist()
+
+
+class SentenceTransformerEmbeddings(LocalEmbeddings):
+    backend = "sentence-transformers"
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads > 0:
+            import torch
+
+            torch.set_num_threads(self.threads)
+        kwargs = {"device": EMBED_DEVICE, "trust_remote_code": EMBED_TRUST_REMOTE_CODE}
+        try:
+            return SentenceTransformer(str(self.model_dir), local_files_only=True, **kwargs)
+        except TypeError:
+            # older sentence-transformers versions do not support these keywords
+            return SentenceTransformer(str(self.model_dir), device=EMBED_DEVICE)
+
+    def _encode(self, texts: List[str]):
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=EMBED_NORMALIZE,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+
+class OnnxEmbeddings(LocalEmbeddings):
+    backend = "onnx"
+
+    def _load(self):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model = self.model_dir / "model.onnx"
+        if not model.exists():
+            model = self.model_dir / "onnx" / "model.onnx"  # optimum export layout
+        opts = ort.SessionOptions()
+        if self.threads > 0:
+            opts.intra_op_num_threads = self.threads
+        session = ort.InferenceSession(str(model), opts, providers=["CPUExecutionProvider"])
+        tok = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        tok.enable_truncation(EMBED_MAX_TOKENS)
+        tok.enable_padding()
+        return session, tok, {i.name for i in session.get_inputs()}
+
+    def _encode(self, texts: List[str]):
+        import numpy as np
+
+        session, tok, inputs = self.model
+        enc = tok.encode_batch(texts)
+        ids = np.asarray([e.ids for e in enc], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in enc], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = session.run(None, feed)[0]  # (batch, tokens, dim)
+        m = mask[..., None].astype(np.float32)
+        vecs = (hidden * m).sum(axis=1) / np.maximum(m.sum(axis=1), 1e-9)
+        if EMBED_NORMALIZE:
+            vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        return vecs.astype(np.float32)
+
+
+def local_embeddings(backend: str, model_dir: Optional[Path] = None) -> LocalEmbeddings:
+    cls = {"sentence-transformers": SentenceTransformerEmbeddings, "onnx": OnnxEmbeddings}.get(backend)
+    if cls is None:
+        raise ValueError(f"unknown EMBED_BACKEND {backend!r}; use one of {BACKENDS}")
+    return cls(model_dir or EMBED_MODEL_DIR)
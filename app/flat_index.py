@@ -0,0 +1,425 @@
+# app/flat_index.py
+
+"""
+Shared, memory-mapped read index for the permanent KB
+─────────────────────────────────────────────────────
+Every Uvicorn worker used to open its own Chroma client on PERSIST_PATH and
+load its own copy of the HNSW index, so RAM grew with UVICORN_WORKERS.
+Instead, one process *publishes* an immutable snapshot of the collection and
+every worker memory-maps it; the pages live once in the OS page cache no
+matter how many workers read them.
+
+    FLAT_INDEX_DIR/
+        CURRENT            – name of the live version (swapped with os.replace)
+        v<ns>/vectors.npy  – float32 matrix, one row per chunk
+        v<ns>/vectors_q.npy – optional float16 / int8 copy (FLAT_INDEX_QUANT)
+        v<ns>/qscale.npy   – per-dimension int8 scale
+        v<ns>/norms.npy    – squared L2 norm of every row
+        v<ns>/rows.bin     – one JSON object per chunk: id, text, metadata
+        v<ns>/offsets.npy  – byte offsets into rows.bin
+        v<ns>/manifest.json
+        v<ns>/deleted      – "id\t<chunk id>" / "source\t<file>" lines for
+                             chunks deleted since (appended by any worker)
+
+Search is an exact scan (one mat-vec over the mapped matrix) rather than an
+HNSW graph walk: for a few hundred thousand chunks that is a few tens of ms
+on CPU, needs no graph to be rebuilt on every publish, and returns the same
+squared-L2 / cosine distances Chroma would.
+
+With FLAT_INDEX_QUANT=float16|int8 the scan reads the 2× / 4× smaller
+quantized copy; the best FLAT_INDEX_RESCORE × k rows are then rescored
+against the float32 vectors, which stay on disk and are only paged in for
+those rows.  ``python benchmarks/quantization.py`` shows the memory / recall
+trade-off.
+
+``keep_published()`` runs in every worker and republishes, under a file lock,
+once that worker's writes (uploads, watcher, bulk, boot indexing) have
+settled; readers notice the new CURRENT within FLAT_INDEX_CHECK_S.  Deletes
+must not wait for that: ``note_deleted()`` appends the removed chunks to the
+live version's ``deleted`` list, which searches skip – at once in the
+deleting worker, within FLAT_INDEX_CHECK_S in the others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from app import vector_store
+from app.vector_store import EMBED_MODEL, PERSIST_PATH
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev boxes
+    fcntl = None
+
+FLAT_INDEX           = os.getenv("FLAT_INDEX", "1") == "1"
+FLAT_INDEX_DIR       = Path(os.getenv("FLAT_INDEX_DIR", str(PERSIST_PATH / "flat_index")))
+FLAT_INDEX_CHECK_S   = float(os.getenv("FLAT_INDEX_CHECK_S", "1"))
+FLAT_INDEX_SETTLE_S  = float(os.getenv("FLAT_INDEX_SETTLE_S", "5"))
+FLAT_INDEX_MAX_LAG_S = float(os.getenv("FLAT_INDEX_MAX_LAG_S", "120"))
+FLAT_INDEX_KEEP      = max(1, int(os.getenv("FLAT_INDEX_KEEP", "2")))
+FLAT_INDEX_QUANT     = os.getenv("FLAT_INDEX_QUANT", "none")  # none | float16 | int8
+FLAT_INDEX_RESCORE   = max(1, int(os.getenv("FLAT_INDEX_RESCORE", "4")))
+
+QUANT_MODES = ("none", "float16", "int8")
+_SCAN_ROWS = 4096  # rows converted to float32 at a time by the quantized scan
+
+log = logging.getLogger("flat_index")
+
+
+class FlatIndex:
+    """Read-only view of one published version."""
+
+    def __init__(self, path: Path) -> None:
+        import numpy as np
+
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / "manifest.json").read_text("utf-8"))
+        self.space = self.manifest.get("space", "l2")
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.norms = np.load(self.path / "norms.npy", mmap_mode="r")
+        self.offsets = np.load(self.path / "offsets.npy", mmap_mode="r")
+        self.quant = self.manifest.get("quant", "none")
+        self.qvectors = self.qscale = None
+        if self.quant != "none":
+            self.qvectors = np.load(self.path / "vectors_q.npy", mmap_mode="r")
+            if self.quant == "int8":
+                self.qscale = np.load(self.path / "qscale.npy")
+        self._fh = open(self.path / "rows.bin", "rb")
+        self._rows = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+        self.deleted: Set[str] = set()          # chunk ids
+        self.deleted_sources: Set[str] = set()  # files deleted without known ids
+        self._deleted_size = 0
+        self.load_deleted()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row(self, i: int) -> dict:
+        return json.loads(self._rows[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+    def load_deleted(self) -> None:
+        """Pick up ids other workers appended to ``deleted`` since last time."""
+        try:
+            with open(self.path / "deleted", "rb") as fh:
+                fh.seek(self._deleted_size)
+                tail = fh.read()
+        except OSError:
+            return
+        whole = tail[: tail.rfind(b"\n") + 1]  # a line still being written waits
+        self._deleted_size += len(whole)
+        for line in whole.decode("utf-8").splitlines():
+            kind, _, value = line.partition("\t")
+            (self.deleted_sources if kind == "source" else self.deleted).add(value)
+
+    def _live(self, i: int) -> bool:
+        if not self.deleted and not self.deleted_sources:
+            return True
+        r = self.row(i)
+        meta = r["meta"] or {}
+        return r["id"] not in self.deleted and not (
+            {meta.get("source"), meta.get("source_file")} & self.deleted_sources
+        )
+
+    def _to_distance(self, dots, norms, q):
+        import numpy as np
+
+        if self.space == "cosine":
+            denom = np.sqrt(norms) * float(np.linalg.norm(q))
+            return 1.0 - dots / np.maximum(denom, 1e-12)
+        if self.space == "ip":
+            return 1.0 - dots
+        return norms - 2.0 * dots + float(q @ q)
+
+    def distances(self, qv: Sequence[float], rows=None):
+        """Exact distance from *qv* to every row (or just *rows*), in the
+        collection's metric."""
+        import numpy as np
+
+        q = np.asarray(qv, dtype=np.float32)
+        if rows is None:
+            return self._to_distance(self.vectors @ q, self.norms, q)
+        return self._to_distance(self.vectors[rows] @ q, self.norms[rows], q)
+
+    def approx_distances(self, qv: Sequence[float]):
+        """Distances from the quantized copy, converted block by block so no
+        full float32 matrix is materialised."""
+        import numpy as np
+
+        q = np.asarray(qv, dtype=np.float32)
+        w = q * self.qscale if self.qscale is not None else q
+        dots = np.empty(len(self), dtype=np.float32)
+        for i in range(0, len(self), _SCAN_ROWS):
+            dots[i:i + _SCAN_ROWS] = self.qvectors[i:i + _SCAN_ROWS].astype(np.float32) @ w
+        return self._to_distance(dots, self.norms, q)
+
+    def search(self, qv: Sequence[float], n: int, rescore: int = FLAT_INDEX_RESCORE) -> Tuple[List[int], List[float]]:
+        """Indices and distances of the *n* nearest live rows, closest first."""
+        if not self.deleted and not self.deleted_sources:
+            return self._search(qv, n, rescore)
+        # widen the search until *n* rows survive (or every row was looked at)
+        fetch = n + len(self.deleted)
+        while True:
+            idx, d = self._search(qv, fetch, rescore)
+            keep = [j for j, i in enumerate(idx) if self._live(i)][:n]
+            if len(keep) == n or fetch >= len(self):
+                return [idx[j] for j in keep], [d[j] for j in keep]
+            fetch *= 2
+
+    def _search(self, qv: Sequence[float], n: int, rescore: int) -> Tuple[List[int], List[float]]:
+        import numpy as np
+
+        if not len(self):
+            return [], []
+        n = min(n, len(self))
+        if self.qvectors is None:
+            d = self.distances(qv)
+            top = _smallest(d, n)
+            return top.tolist(), d[top].tolist()
+        pool = np.sort(_smallest(self.approx_distances(qv), min(len(self), n * rescore)))
+        d = self.distances(qv, pool)  # exact float32 rescoring
+        best = _smallest(d, n)
+        return pool[best].tolist(), d[best].tolist()
+
+
+def _smallest(d, n: int):
+    """Indices of the *n* smallest values of *d*, sorted ascending."""
+    import numpy as np
+
+    top = np.argpartition(d, n - 1)[:n]
+    return top[np.argsort(d[top])]
+
+
+def quantize(matrix, mode: str):
+    """Return ``(quantized, scale)`` for *mode*; scale is None unless int8."""
+    import numpy as np
+
+    if mode == "float16":
+        return matrix.astype(np.float16), None
+    if mode == "int8":
+        # symmetric per-dimension scale: x ≈ q * scale with q in [-127, 127]
+        scale = np.abs(matrix).max(axis=0) / 127.0
+        scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        return np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8), scale
+    raise ValueError(f"unknown quantization {mode!r}; use one of {QUANT_MODES}")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Publishing (one process at a time)
+# ────────────────────────────────────────────────────────────────────────────────
+def _current_name() -> Optional[str]:
+    try:
+        return (FLAT_INDEX_DIR / "CURRENT").read_text("utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def _write(dest: Path, quant: str = FLAT_INDEX_QUANT) -> dict:
+    import numpy as np
+
+    coll = vector_store.persistent_store._collection
+    dest.mkdir(parents=True)
+    blocks, offsets, pos = [], [0], 0
+    with open(dest / "rows.bin", "wb") as rows:
+        for got in vector_store.scan(["embeddings", "documents", "metadatas"]):
+            if not got["ids"]:
+                continue
+            blocks.append(np.asarray(got["embeddings"], dtype=np.float32))
+            for cid, text, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+                b = json.dumps({"id": cid, "text": text, "meta": meta or {}}, ensure_ascii=False).encode("utf-8")
+                rows.write(b)
+                pos += len(b)
+                offsets.append(pos)
+    matrix = np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+    np.save(dest / "offsets.npy", np.asarray(offsets, dtype=np.int64))
+    return write_vectors(dest, matrix, quant, space=(coll.metadata or {}).get("hnsw:space", "l2"))
+
+
+def write_vectors(dest: Path, matrix, quant: str = FLAT_INDEX_QUANT, *, space: str = "l2") -> dict:
+    """Write the vector files and manifest of a version into *dest*."""
+    import numpy as np
+
+    np.save(dest / "vectors.npy", matrix)
+    np.save(dest / "norms.npy", np.einsum("ij,ij->i", matrix, matrix).astype(np.float32))
+    if quant != "none" and matrix.size:
+        qmat, scale = quantize(matrix, quant)
+        np.save(dest / "vectors_q.npy", qmat)
+        if scale is not None:
+            np.save(dest / "qscale.npy", scale)
+    else:
+        quant = "none"
+    manifest = {
+        "count": len(matrix),
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "space": space,
+        "embed_model": EMBED_MODEL,
+        "quant": quant,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    (dest / "manifest.json").write_text(json.dumps(manifest), "utf-8")
+    return manifest
+
+
+def _prune(keep: int = FLAT_INDEX_KEEP) -> None:
+    # unlinking a version a worker still maps is fine on Linux: the pages stay
+    # valid until that worker switches to the new one
+    current = _current_name()
+    versions = sorted(p for p in FLAT_INDEX_DIR.glob("v*") if p.is_dir())
+    for p in versions[: max(0, len(versions) - keep)]:
+        if p.name != current:
+            shutil.rmtree(p, ignore_errors=True)
+    for p in FLAT_INDEX_DIR.glob(".tmp-*"):
+        shutil.rmtree(p, ignore_errors=True)
+
+
+def publish() -> dict:
+    """Write a new version from the Chroma collection and make it current."""
+    FLAT_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    name = f"v{time.time_ns()}"
+    tmp = FLAT_INDEX_DIR / f".tmp-{name}"
+    manifest = _write(tmp)
+    os.rename(tmp, FLAT_INDEX_DIR / name)
+    ptr = FLAT_INDEX_DIR / f"CURRENT.{os.getpid()}.tmp"
+    ptr.write_text(name, "utf-8")
+    os.replace(ptr, FLAT_INDEX_DIR / "CURRENT")
+    _prune()
+    log.info(
+        "🗂️  published flat index %s: %d vectors in %.1fs",
+        name, manifest["count"], time.perf_counter() - start,
+    )
+    return manifest
+
+
+def publish_locked(only_if_stale: bool = False) -> Optional[dict]:
+    """``publish()`` serialised across processes (waits for a running one).
+
+    With *only_if_stale*, skip it if another worker published meanwhile.
+    """
+    FLAT_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        return publish() if not only_if_stale or _is_stale() else None
+    with open(FLAT_INDEX_DIR / "publish.lock", "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            return publish() if not only_if_stale or _is_stale() else None
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def note_deleted(ids: Iterable[str] = (), sources: Iterable[str] = ()) -> None:
+    """Hide deleted chunks – by id, or every chunk of *sources* – from the
+    live version until the next publish drops them."""
+    name = _current_name() if FLAT_INDEX else None
+    lines = [f"id\t{i}\n" for i in ids] + [f"source\t{s}\n" for s in sources]
+    if name is None or not lines:
+        return
+    with open(FLAT_INDEX_DIR / name / "deleted", "a", encoding="utf-8") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)  # one line never splits another
+        fh.write("".join(lines))
+    if _open is not None and _open.path.name == name:
+        _open.load_deleted()
+
+
+def _published_as_configured() -> bool:
+    """A version is live and was written with FLAT_INDEX_QUANT (no Chroma access)."""
+    name = _current_name()
+    if name is None:
+        return False
+    try:
+        manifest = json.loads((FLAT_INDEX_DIR / name / "manifest.json").read_text("utf-8"))
+    except (OSError, ValueError):
+        return False
+    return manifest.get("quant", "none") == FLAT_INDEX_QUANT
+
+
+def _is_stale() -> bool:
+    """True when no version is published, or it disagrees with the collection
+    or with FLAT_INDEX_QUANT."""
+    name = _current_name()
+    if name is None:
+        return vector_store.count() > 0
+    try:
+        manifest = json.loads((FLAT_INDEX_DIR / name / "manifest.json").read_text("utf-8"))
+    except (OSError, ValueError):
+        return True
+    count = vector_store.count()
+    if manifest.get("count") != count:
+        return True
+    return bool(count) and manifest.get("quant", "none") != FLAT_INDEX_QUANT
+
+
+async def keep_published(
+    check_s: float = FLAT_INDEX_CHECK_S,
+    settle_s: float = FLAT_INDEX_SETTLE_S,
+    max_lag_s: float = FLAT_INDEX_MAX_LAG_S,
+) -> None:
+    """Republish after this worker's KB writes settle (or every *max_lag_s*
+    during a long ingest)."""
+    if not FLAT_INDEX:
+        return
+    # with a version already live, don't make every worker open Chroma just
+    # to count it; this worker's own writes still trigger a republish below
+    if not _published_as_configured():
+        try:
+            await asyncio.to_thread(publish_locked, True)
+        except Exception:
+            log.exception("❌  initial flat-index publish failed")
+    seen = vector_store.kb_version()
+    first = last = None
+    while True:
+        await asyncio.sleep(check_s)
+        now = time.monotonic()
+        v = vector_store.kb_version()
+        if v != seen:
+            seen, last = v, now
+            first = first or now
+        if first is None or (now - last < settle_s and now - first < max_lag_s):
+            continue
+        first = None
+        try:
+            await asyncio.to_thread(publish_locked)
+        except Exception:
+            log.exception("❌  flat-index publish failed")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Reader side
+# ────────────────────────────────────────────────────────────────────────────────
+_open: Optional[FlatIndex] = None
+_checked = 0.0
+
+
+def current() -> Optional[FlatIndex]:
+    """The live version, reopened when CURRENT changes; None if unpublished."""
+    global _open, _checked
+    if not FLAT_INDEX:
+        return None
+    now = time.monotonic()
+    if _open is not None and now - _checked < FLAT_INDEX_CHECK_S:
+        return _open
+    _checked = now
+    name = _current_name()
+    if name is None:
+        return None
+    if _open is not None and _open.path.name == name:
+        _open.load_deleted()
+    if _open is None or _open.path.name != name:
+        try:
+            fresh = FlatIndex(FLAT_INDEX_DIR / name)
+        except (OSError, ValueError, ImportError) as exc:
+            log.warning("could not open flat index %s: %s", name, exc)
+            return _open
+        # the old maps are released once in-flight searches drop them
+        _open = fresh
+    return _open
@@ -0,0 +1,274 @@
+# app/indexing.py
+
+"""
+Staged PDF ingestion into the permanent knowledge base
+──────────────────────────────────────────────────────
+parse → chunk → embed → write, each stage with its own concurrency limit and
+a bounded queue in front of it, so a folder of hundreds of PDFs keeps every
+stage busy without holding everything in memory:
+
+• parse  – INDEX_PARSE_WORKERS threads running PyPDF
+• chunk  – INDEX_CHUNK_WORKERS threads splitting pages
+• embed  – INDEX_EMBED_WORKERS concurrent embedding calls of
+           INDEX_EMBED_BATCH chunks each
+• write  – ONE writer upserting up to INDEX_WRITE_BATCH rows at a time through
+           the shared persistent Chroma handle (no client per file, no
+           SQLite lock storms)
+
+``index_file()`` runs the same stages inline for a single upload.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+from app.ingestion import load_pages, split_pages
+from app.metrics import QUEUE_DEPTH, span
+from app import vector_store
+from app.vector_store import write_embedded
+
+INDEX_PARSE_WORKERS = max(1, int(os.getenv("INDEX_PARSE_WORKERS", str(min(4, os.cpu_count() or 1)))))
+INDEX_CHUNK_WORKERS = max(1, int(os.getenv("INDEX_CHUNK_WORKERS", "2")))
+INDEX_EMBED_WORKERS = max(1, int(os.getenv("INDEX_EMBED_WORKERS", "2")))
+INDEX_EMBED_BATCH   = max(1, int(os.getenv("INDEX_EMBED_BATCH", "64")))
+INDEX_WRITE_BATCH   = max(1, int(os.getenv("INDEX_WRITE_BATCH", "512")))
+INDEX_WRITE_DELAY_S = float(os.getenv("INDEX_WRITE_DELAY_S", "1.0"))
+
+log = logging.getLogger("indexing")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Stage functions (blocking; run in threads)
+# ────────────────────────────────────────────────────────────────────────────────
+def chunk_ids(name: str, n: int) -> List[str]:
+    """Stable ids so re-indexing a file overwrites instead of duplicating."""
+    return [hashlib.sha1(f"{name}\0{i}".encode("utf-8")).hexdigest() for i in range(n)]
+
+
+def parse(path: Path) -> list:
+    with span("index", "parse"):
+        return load_pages(str(path))
+
+
+def chunk(path: Path, pages: list, source_dir: Optional[Path] = None) -> list:
+    """Split *pages*; *source_dir* is where the file will live once indexed."""
+    source = source_dir / path.name if source_dir is not None else path
+    with span("index", "chunk"):
+        chunks = split_pages(pages, str(source))
+    now = datetime.utcnow().isoformat()
+    for c in chunks:
+        c.metadata["source"] = path.name
+        c.metadata["indexed_at"] = now
+    return chunks
+
+
+def embed(texts: List[str]) -> List[List[float]]:
+    with span("index", "embed"):
+        return vector_store.get_embeddings().embed_documents(texts)
+
+
+@dataclass
+class _Doc:
+    path: Path
+    pages: list = field(default_factory=list)
+    chunks: list = field(default_factory=list)
+    embeddings: list = field(default_factory=list)
+    started: Optional[float] = None
+
+
+def _write(docs: Sequence[_Doc], batch: int) -> None:
+    ids: List[str] = []
+    texts: List[str] = []
+    metas: List[dict] = []
+    vecs: list = []
+    for d in docs:
+        ids += chunk_ids(d.path.name, len(d.chunks))
+        texts += [c.page_content for c in d.chunks]
+        metas += [dict(c.metadata) for c in d.chunks]
+        vecs += d.embeddings
+    with span("index", "write"):
+        for i in range(0, len(ids), batch):
+            write_embedded(ids[i:i + batch], texts[i:i + batch], metas[i:i + batch], vecs[i:i + batch])
+        for d in docs:  # a re-indexed file may now have fewer chunks
+            vector_store.prune_source(d.path.name, chunk_ids(d.path.name, len(d.chunks)))
+
+
+def index_file(path: Path, source_dir: Optional[Path] = None) -> int:
+    """Parse, chunk, embed and store one PDF inline; return the chunk count."""
+    chunks = chunk(path, parse(path), source_dir)
+    if not chunks:
+        return 0
+    doc = _Doc(path, chunks=chunks)
+    texts = [c.page_content for c in chunks]
+    for i in range(0, len(texts), INDEX_EMBED_BATCH):
+        doc.embeddings += embed(texts[i:i + INDEX_EMBED_BATCH])
+    _write([doc], INDEX_WRITE_BATCH)
+    return len(chunks)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Pipeline
+# ────────────────────────────────────────────────────────────────────────────────
+@dataclass
+class IngestStats:
+    files: int = 0
+    indexed: int = 0
+    empty: int = 0
+    failed: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def finished(self) -> int:
+        return self.indexed + self.empty + self.failed
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        name: str = "index",
+        *,
+        parse_workers: int = INDEX_PARSE_WORKERS,
+        chunk_workers: int = INDEX_CHUNK_WORKERS,
+        embed_workers: int = INDEX_EMBED_WORKERS,
+        embed_batch: int = INDEX_EMBED_BATCH,
+        write_batch: int = INDEX_WRITE_BATCH,
+        write_delay_s: float = INDEX_WRITE_DELAY_S,
+        source_dir: Optional[Path] = None,
+        on_file: Optional[Callable[[Path, str, int, float, Optional[str]], None]] = None,
+    ) -> None:
+        """*on_file(path, outcome, chunks, seconds, error)* fires as each file
+        finishes; *source_dir* overrides the directory recorded in metadata
+        (for files indexed from a staging area)."""
+        self.name = name
+        self.parse_workers = parse_workers
+        self.chunk_workers = chunk_workers
+        self.embed_workers = embed_workers
+        self.embed_batch = embed_batch
+        self.write_batch = write_batch
+        self.write_delay_s = write_delay_s
+        self.source_dir = source_dir
+        self.on_file = on_file
+        self.stats = IngestStats()
+
+    # -- bookkeeping -------------------------------------------------------
+    def _finish(self, doc: _Doc, outcome: str, exc: Optional[BaseException] = None) -> None:
+        if outcome == "indexed":
+            self.stats.indexed += 1
+            self.stats.chunks += len(doc.chunks)
+            log.info("✅  stored %d chunks for %s", len(doc.chunks), doc.path.name)
+        elif outcome == "empty":
+            self.stats.empty += 1
+            log.warning("⚠️  no text extracted from %s – skipping", doc.path.name)
+        else:
+            self.stats.failed += 1
+            log.error("❌  failed to index %s: %s", doc.path.name, exc)
+        QUEUE_DEPTH.set(self.stats.files - self.stats.finished, queue=f"{self.name}_index")
+        if self.on_file is not None:
+            took = time.perf_counter() - doc.started if doc.started else 0.0
+            self.on_file(doc.path, outcome, len(doc.chunks), took, str(exc) if exc else None)
+
+    # -- stages ------------------------------------------------------------
+    async def _parse(self, doc: _Doc) -> Optional[_Doc]:
+        doc.started = time.perf_counter()
+        doc.pages = await asyncio.to_thread(parse, doc.path)
+        return doc
+
+    async def _chunk(self, doc: _Doc) -> Optional[_Doc]:
+        doc.chunks = await asyncio.to_thread(chunk, doc.path, doc.pages, self.source_dir)
+        doc.pages = []
+        if not doc.chunks:
+            self._finish(doc, "empty")
+            return None
+        return doc
+
+    async def _embed(self, doc: _Doc) -> Optional[_Doc]:
+        texts = [c.page_content for c in doc.chunks]
+        for i in range(0, len(texts), self.embed_batch):
+            doc.embeddings += await asyncio.to_thread(embed, texts[i:i + self.embed_batch])
+        return doc
+
+    async def _stage(self, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue], fn) -> None:
+        while True:
+            doc = await inbox.get()
+            try:
+                out = await fn(doc)
+                if out is not None and outbox is not None:
+                    await outbox.put(out)
+            except Exception as exc:
+                self._finish(doc, "failed", exc)
+            finally:
+                inbox.task_done()
+
+    async def _writer(self, inbox: asyncio.Queue) -> None:
+        pending: List[_Doc] = []
+        rows = 0
+        while True:
+            try:
+                if pending:
+                    doc = await asyncio.wait_for(inbox.get(), self.write_delay_s)
+                else:
+                    doc = await inbox.get()
+                pending.append(doc)
+                rows += len(doc.chunks)
+                if rows < self.write_batch:
+                    continue
+            except asyncio.TimeoutError:
+                pass  # upstream is slow: commit what we have
+            await self._flush(pending)
+            for _ in pending:
+                inbox.task_done()
+            pending, rows = [], 0
+
+    async def _flush(self, docs: List[_Doc]) -> None:
+        try:
+            await asyncio.to_thread(_write, docs, self.write_batch)
+        except Exception as exc:
+            if len(docs) == 1:
+                self._finish(docs[0], "failed", exc)
+                return
+            # isolate the bad file instead of failing the whole batch
+            for d in docs:
+                await self._flush([d])
+            return
+        for d in docs:
+            self._finish(d, "indexed")
+
+    # -- entry point -------------------------------------------------------
+    async def run(self, paths: Sequence[Path]) -> IngestStats:
+        """Index *paths*; per-file errors are logged and counted, never raised."""
+        self.stats = IngestStats(files=len(paths))
+        start = time.perf_counter()
+        QUEUE_DEPTH.set(len(paths), queue=f"{self.name}_index")
+
+        q_parse: asyncio.Queue = asyncio.Queue()
+        q_chunk: asyncio.Queue = asyncio.Queue(maxsize=self.parse_workers * 2)
+        q_embed: asyncio.Queue = asyncio.Queue(maxsize=self.embed_workers * 2)
+        q_write: asyncio.Queue = asyncio.Queue(maxsize=self.embed_workers * 2)
+        for p in paths:
+            q_parse.put_nowait(_Doc(Path(p)))
+
+        tasks = (
+            [asyncio.ensure_future(self._stage(q_parse, q_chunk, self._parse)) for _ in range(self.parse_workers)]
+            + [asyncio.ensure_future(self._stage(q_chunk, q_embed, self._chunk)) for _ in range(self.chunk_workers)]
+            + [asyncio.ensure_future(self._stage(q_embed, q_write, self._embed)) for _ in range(self.embed_workers)]
+            + [asyncio.ensure_future(self._writer(q_write))]
+        )
+        try:
+            for q in (q_parse, q_chunk, q_embed, q_write):
+                await q.join()
+        finally:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.stats.seconds = time.perf_counter() - start
+        return self.stats
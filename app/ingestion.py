@@ -6,13 +6,14 @@ PDF loader and text splitter utilities.
 """
 
 from io import BytesIO
-from typing import List
+from typing import List, Optional
 import os
 
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
+from app.chunking import split_chars, split_tokens, strategy_for
+
 DEFAULT_CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
 DEFAULT_CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
 
@@ -20,28 +21,20 @@ DEFAULT_CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
 # ────────────────────────────────────────────────────────────────────────────────
 # Common splitter
 # ────────────────────────────────────────────────────────────────────────────────
-def _split(pages: List[Document], *, chunk_size: int, overlap: int) -> List[Document]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=overlap,
-    )
-    return splitter.split_documents(pages)
+def _split(
+    pages: List[Document], *, chunk_size: int, overlap: int, strategy: str = "chars"
+) -> List[Document]:
+    """Split with *strategy* (see app.chunking); sizes apply to ``chars``."""
+    if strategy == "tokens":
+        return split_tokens(pages)
+    return split_chars(pages, chunk_size=chunk_size, overlap=overlap)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
 # 1) Disk-based PDFs (unchanged)
 # ────────────────────────────────────────────────────────────────────────────────
-def load_and_split(
-    file_path: str,
-    chunk_size: int = DEFAULT_CHUNK_SIZE,
-    overlap: int = DEFAULT_CHUNK_OVERLAP,
-) -> List[Document]:
-    """
-    Load a PDF from *file_path* and return a list of LangChain Document
-    chunks ready for embedding.
-
-    Each Document has .page_content (text) and .metadata (page number, file).
-    """
+def load_pages(file_path: str) -> List[Document]:
+    """Parse *file_path* into one Document per page (no splitting)."""
     pages = PyPDFLoader(file_path).load()  # one Document per page
     for p in pages:
         # Ensure page number survives the splitting step
@@ -50,8 +43,23 @@ def load_and_split(
                 p.metadata["page_number"] = p.metadata["page"]
             else:
                 p.metadata["page_number"] = None
+    return pages
+
+
+def split_pages(
+    pages: List[Document],
+    file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    strategy: Optional[str] = None,
+) -> List[Document]:
+    """Chunk the output of `load_pages` and tag each chunk with its file.
 
-    chunks = _split(pages, chunk_size=chunk_size, overlap=overlap)
+    *strategy* defaults to the one configured for *file_path*.
+    """
+    chunks = _split(
+        pages, chunk_size=chunk_size, overlap=overlap, strategy=strategy or strategy_for(file_path)
+    )
 
     # augment metadata for easier tracing later
     for c in chunks:
@@ -61,6 +69,26 @@ def load_and_split(
     return chunks
 
 
+def load_and_split(
+    file_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    filename: Optional[str] = None,
+) -> List[Document]:
+    """
+    Load a PDF from *file_path* and return a list of LangChain Document
+    chunks ready for embedding.
+
+    Each Document has .page_content (text) and .metadata (page number, file).
+    *filename* is the name CHUNK_STRATEGY_RULES are matched against when
+    *file_path* is a temporary copy (session uploads).
+    """
+    return split_pages(
+        load_pages(file_path), file_path, chunk_size, overlap,
+        strategy=strategy_for(filename or file_path),
+    )
+
+
 # ────────────────────────────────────────────────────────────────────────────────
 # 2) In-memory PDFs (for /upload_pdf)
 # ────────────────────────────────────────────────────────────────────────────────
@@ -68,10 +96,12 @@ def load_and_split_bytes(
     data: bytes,
     chunk_size: int = DEFAULT_CHUNK_SIZE,
     overlap: int = DEFAULT_CHUNK_OVERLAP,
+    filename: Optional[str] = None,
 ) -> List[Document]:
     """
     Same as `load_and_split`, but accepts a PDF **byte stream**—handy for
     ephemeral uploads where we don’t want to write the file to disk.
+    *filename* (the uploaded name) selects the chunking strategy.
     """
     try:
         pages = PyPDFLoader(BytesIO(data)).load()
@@ -84,7 +114,7 @@ def load_and_split_bytes(
     except Exception as e:
         raise ValueError(f"Pdf load failed: {e}") from e
 
-    chunks = _split(pages, chunk_size=chunk_size, overlap=overlap)
+    chunks = _split(pages, chunk_size=chunk_size, overlap=overlap, strategy=strategy_for(filename or "<uploaded-pdf>"))
 
     # metadata: mark these as “memory” so we can recognise the source later
     for c in chunks:
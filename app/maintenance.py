@@ -0,0 +1,234 @@
+# app/maintenance.py
+
+"""
+Vector-store maintenance
+────────────────────────
+• sweep_orphan_sessions()  – delete session folders nobody has used for
+                             ORPHAN_SESSION_MIN (left behind by crashes/restarts)
+• vacuum()                 – VACUUM the Chroma SQLite file so space freed by
+                             deletes and re-uploads is given back
+• report()                 – disk usage, SQLite free-page fragmentation and
+                             HNSW size per stored vector
+• run()                    – all of the above with a before/after report,
+                             saved to MAINT_REPORT_FILE
+
+``schedule()`` runs ``run()`` every MAINT_INTERVAL_H hours; a file lock makes
+sure only one Uvicorn worker does it per cycle.
+
+Chroma exposes no call to compact its HNSW segment, so deleted vectors there
+are only reported (bytes per live vector), not reclaimed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from app import vector_store
+from app.sessions import LAST_USED, manager as session_manager
+from app.vector_store import PERSIST_PATH, SESSIONS_ROOT
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev boxes
+    fcntl = None
+
+MAINT_INTERVAL_H   = float(os.getenv("MAINT_INTERVAL_H", "24"))
+MAINT_REPORT_FILE  = Path(os.getenv("MAINT_REPORT_FILE", str(PERSIST_PATH / "maintenance_report.json")))
+MAINT_LOCK_FILE    = Path(os.getenv("MAINT_LOCK_FILE", str(PERSIST_PATH / "maintenance.lock")))
+ORPHAN_SESSION_MIN = int(os.getenv("ORPHAN_SESSION_MIN", os.getenv("SESSION_TTL_MIN", "60")))
+
+SQLITE_FILE = PERSIST_PATH / "chroma.sqlite3"
+
+log = logging.getLogger("maintenance")
+
+
+def _dir_bytes(path: Path) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def _children(path: Path) -> List[Path]:
+    # the stores create their folders lazily, so they may not exist yet
+    return list(path.iterdir()) if path.is_dir() else []
+
+
+def _latest_mtime(path: Path) -> float:
+    latest = path.stat().st_mtime
+    for root, _dirs, files in os.walk(path):
+        for f in files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, f)))
+            except OSError:
+                pass
+    return latest
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Reporting
+# ────────────────────────────────────────────────────────────────────────────────
+def report() -> dict:
+    out = {
+        "persist_bytes": _dir_bytes(PERSIST_PATH),
+        "sessions_bytes": _dir_bytes(SESSIONS_ROOT),
+        "session_dirs": sum(1 for p in _children(SESSIONS_ROOT) if p.is_dir()),
+        "sqlite_bytes": 0,
+        "sqlite_free_pages": 0,
+        "sqlite_pages": 0,
+        "fragmentation": 0.0,
+        "vectors": None,
+        "hnsw_bytes": 0,
+        "hnsw_bytes_per_vector": None,
+    }
+    if SQLITE_FILE.exists():
+        out["sqlite_bytes"] = SQLITE_FILE.stat().st_size
+        con = sqlite3.connect(f"file:{SQLITE_FILE}?mode=ro", uri=True, timeout=5)
+        try:
+            pages = con.execute("PRAGMA page_count").fetchone()[0]
+            free = con.execute("PRAGMA freelist_count").fetchone()[0]
+            out.update(sqlite_pages=pages, sqlite_free_pages=free)
+            out["fragmentation"] = round(free / pages, 4) if pages else 0.0
+            try:
+                out["vectors"] = con.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except sqlite3.Error:
+                pass  # schema differs between Chroma versions
+        finally:
+            con.close()
+    # every HNSW segment lives in a uuid-named sub-directory
+    out["hnsw_bytes"] = sum(_dir_bytes(p) for p in _children(PERSIST_PATH) if p.is_dir() and len(p.name) == 36)
+    if out["vectors"]:
+        out["hnsw_bytes_per_vector"] = round(out["hnsw_bytes"] / out["vectors"], 1)
+    return out
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Tasks
+# ────────────────────────────────────────────────────────────────────────────────
+def sweep_orphan_sessions(max_idle_min: int = ORPHAN_SESSION_MIN) -> int:
+    """Remove session folders idle for longer than *max_idle_min*.
+
+    Sessions this worker tracks are skipped outright.  For the rest, idle
+    time comes from the ``last_used`` marker that every worker refreshes on
+    use (queries only read Chroma's files, so their mtimes say nothing);
+    folders from before the marker fall back to their newest file mtime.
+    """
+    cutoff = time.time() - max_idle_min * 60
+    removed = 0
+    for path in _children(SESSIONS_ROOT):
+        if not path.is_dir() or path.name in session_manager:
+            continue
+        try:
+            marker = path / LAST_USED
+            last = marker.stat().st_mtime if marker.exists() else _latest_mtime(path)
+            if last < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        log.info("🧹  removed %d orphaned session folder(s)", removed)
+    return removed
+
+
+def vacuum() -> bool:
+    if not SQLITE_FILE.exists():
+        return False
+    with vector_store._WRITE_LOCK:
+        con = sqlite3.connect(str(SQLITE_FILE), timeout=30)
+        try:
+            con.execute("VACUUM")
+            return True
+        except sqlite3.Error as exc:
+            log.warning("VACUUM skipped: %s", exc)
+            return False
+        finally:
+            con.close()
+
+
+def run() -> dict:
+    """Sweep, (re)build the id sidecar if missing, vacuum; report before/after."""
+    start = time.perf_counter()
+    before = report()
+    orphans = sweep_orphan_sessions()
+    sources = None
+    if not vector_store.SOURCE_IDS_DIR.exists():
+        try:
+            sources = vector_store.rebuild_source_ids()
+        except Exception as exc:
+            log.warning("could not build the source-id sidecar: %s", exc)
+    vacuumed = vacuum()
+    after = report()
+    result = {
+        "finished_at": datetime.utcnow().isoformat(),
+        "seconds": round(time.perf_counter() - start, 2),
+        "orphan_sessions_removed": orphans,
+        "sidecar_sources_rebuilt": sources,
+        "vacuumed": vacuumed,
+        "before": before,
+        "after": after,
+    }
+    log.info(
+        "🧰  maintenance: %.1f MB → %.1f MB, fragmentation %.1f%% → %.1f%%, %d orphan session(s)",
+        before["persist_bytes"] / 1e6, after["persist_bytes"] / 1e6,
+        100 * before["fragmentation"], 100 * after["fragmentation"], orphans,
+    )
+    try:
+        MAINT_REPORT_FILE.write_text(json.dumps(result), "utf-8")
+    except OSError as exc:
+        log.warning("could not save maintenance report: %s", exc)
+    return result
+
+
+def last_report() -> Optional[dict]:
+    try:
+        return json.loads(MAINT_REPORT_FILE.read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def run_locked() -> Optional[dict]:
+    """``run()`` unless another worker is already doing it (then None)."""
+    if fcntl is None:
+        return run()
+    MAINT_LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(MAINT_LOCK_FILE, "w") as fh:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        try:
+            return run()
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+async def schedule(interval_h: float = MAINT_INTERVAL_H) -> None:
+    """Run maintenance every *interval_h* hours, skipping cycles another worker
+    took."""
+    if interval_h <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval_h * 3600)
+        last = last_report()
+        if last:
+            age = datetime.utcnow() - datetime.fromisoformat(last["finished_at"])
+            if age.total_seconds() < interval_h * 3600 / 2:
+                continue  # another worker just did it
+        try:
+            await asyncio.to_thread(run_locked)
+        except Exception:
+            log.exception("❌  maintenance failed")
@@ -0,0 +1,345 @@
+# app/metrics.py
+
+"""
+Prometheus metrics + per-request stage timing
+─────────────────────────────────────────────
+• span(op, stage)          – time one pipeline stage (histogram + Server-Timing)
+• record_ollama(model, r)  – export Ollama's own prefill / decode timings
+• record_cache(name, hit)  – cache hit / miss counters
+• QUEUE_DEPTH              – gauge for work waiting in front of a resource
+• render()                 – text exposition format served on ``/metrics``
+
+Dependency-free on purpose: the exposition format is tiny and the container
+must build offline.  Metrics are kept per process, so with several Uvicorn
+workers each scrape reports the worker that answered it.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# latency buckets (seconds) – covers a 5 ms cache hit up to a 5 min generation
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+_LabelKey = Tuple[str, ...]
+
+
+def _escape(val: str) -> str:
+    return val.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(val: float) -> str:
+    if math.isinf(val):
+        return "+Inf" if val > 0 else "-Inf"
+    return repr(float(val))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> _LabelKey:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[k]) for k in self.labels)
+
+    def _label_str(self, key: _LabelKey, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _samples(self) -> List[str]:  # pragma: no cover - overridden
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(head + self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *a, **k) -> None:
+        super().__init__(*a, **k)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._label_str(k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *a, buckets: Sequence[float] = DEFAULT_BUCKETS, **k) -> None:
+        super().__init__(*a, **k)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., sum, count]
+        self._values: Dict[_LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels: str) -> int:
+        row = self._values.get(self._key(labels))
+        return int(row[-1]) if row else 0
+
+    def _samples(self) -> List[str]:
+        out: List[str] = []
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            for bound, n in zip(self.buckets, row):
+                le = f'le="{_fmt(bound)}"'
+                out.append(f"{self.name}_bucket{self._label_str(key, le)} {_fmt(n)}")
+            inf = self._label_str(key, 'le="+Inf"')
+            out.append(f"{self.name}_bucket{inf} {_fmt(row[-1])}")
+            out.append(f"{self.name}_sum{self._label_str(key)} {_fmt(row[-2])}")
+            out.append(f"{self.name}_count{self._label_str(key)} {_fmt(row[-1])}")
+        return out
+
+
+_REGISTRY: Dict[str, _Metric] = {}
+
+
+def _register(metric: _Metric) -> _Metric:
+    if metric.name in _REGISTRY:
+        raise ValueError(f"metric {metric.name} already registered")
+    _REGISTRY[metric.name] = metric
+    return metric
+
+
+def counter(name: str, doc: str, labels: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, doc, labels))  # type: ignore[return-value]
+
+
+def gauge(name: str, doc: str, labels: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, doc, labels))  # type: ignore[return-value]
+
+
+def histogram(
+    name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    return _register(Histogram(name, doc, labels, buckets=buckets))  # type: ignore[return-value]
+
+
+def render() -> str:
+    """Return every registered metric in Prometheus text format."""
+    return "\n".join(m.render() for m in _REGISTRY.values()) + "\n"
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Core metrics
+# ────────────────────────────────────────────────────────────────────────────────
+REQUEST_SECONDS = histogram(
+    "offlinellm_http_request_duration_seconds",
+    "End-to-end HTTP request latency.",
+    ["route", "method", "status"],
+)
+IN_FLIGHT = gauge(
+    "offlinellm_http_requests_in_flight", "HTTP requests currently being served."
+)
+STAGE_SECONDS = histogram(
+    "offlinellm_stage_duration_seconds",
+    "Latency of one pipeline stage (embed, search, rerank, prompt, llm, ...).",
+    ["op", "stage"],
+)
+OLLAMA_PROMPT_EVAL_SECONDS = histogram(
+    "offlinellm_ollama_prompt_eval_seconds",
+    "Ollama prompt_eval_duration (prefill) per call.",
+    ["model"],
+)
+OLLAMA_EVAL_SECONDS = histogram(
+    "offlinellm_ollama_eval_seconds",
+    "Ollama eval_duration (decode) per call.",
+    ["model"],
+)
+OLLAMA_LOAD_SECONDS = histogram(
+    "offlinellm_ollama_load_seconds",
+    "Ollama load_duration (model load) per call.",
+    ["model"],
+)
+OLLAMA_PROMPT_TOKENS = counter(
+    "offlinellm_ollama_prompt_tokens_total",
+    "Prompt tokens evaluated by Ollama (prompt_eval_count).",
+    ["model"],
+)
+OLLAMA_EVAL_TOKENS = counter(
+    "offlinellm_ollama_eval_tokens_total",
+    "Tokens generated by Ollama (eval_count).",
+    ["model"],
+)
+CACHE_REQUESTS = counter(
+    "offlinellm_cache_requests_total",
+    "Cache lookups by cache name and result (hit / miss).",
+    ["cache", "result"],
+)
+QUEUE_DEPTH = gauge(
+    "offlinellm_queue_depth",
+    "Work items waiting for a resource.",
+    ["queue"],
+)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Stage spans + Server-Timing
+# ────────────────────────────────────────────────────────────────────────────────
+# list of (name, seconds) collected for the current HTTP request
+_TIMINGS: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "server_timings", default=None
+)
+
+
+def add_timing(name: str, seconds: float) -> None:
+    """Attach a Server-Timing entry to the current request, if any."""
+    timings = _TIMINGS.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+def record_stage(op: str, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, op=op, stage=stage)
+    add_timing(stage, seconds)
+
+
+@contextmanager
+def span(op: str, stage: str) -> Iterator[None]:
+    """Time the enclosed block as *stage* of operation *op*."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(op, stage, time.perf_counter() - start)
+
+
+def record_ollama(model: str, resp: Dict) -> None:
+    """Export the timing / token fields Ollama returns with ``done=True``."""
+    durations = (
+        ("prompt_eval_duration", OLLAMA_PROMPT_EVAL_SECONDS, "ollama_prefill"),
+        ("eval_duration", OLLAMA_EVAL_SECONDS, "ollama_decode"),
+        ("load_duration", OLLAMA_LOAD_SECONDS, "ollama_load"),
+    )
+    for field, hist, timing in durations:
+        ns = resp.get(field)
+        if isinstance(ns, (int, float)) and ns > 0:
+            hist.observe(ns / 1e9, model=model)
+            add_timing(timing, ns / 1e9)
+    for field, ctr in (
+        ("prompt_eval_count", OLLAMA_PROMPT_TOKENS),
+        ("eval_count", OLLAMA_EVAL_TOKENS),
+    ):
+        n = resp.get(field)
+        if isinstance(n, (int, float)) and n > 0:
+            ctr.inc(n, model=model)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def format_server_timing(timings: Sequence[Tuple[str, float]], total: float) -> str:
+    """Render ``name;dur=ms`` pairs; repeated stages are summed."""
+    merged: Dict[str, float] = {}
+    for name, sec in timings:
+        merged[name] = merged.get(name, 0.0) + sec
+    merged["total"] = total
+    return ", ".join(f"{name};dur={sec * 1000:.1f}" for name, sec in merged.items())
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware: request histogram + ``Server-Timing`` header.
+
+    Written without Starlette's BaseHTTPMiddleware so the handler runs in the
+    same context and the spans it records land in this request's list.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _TIMINGS.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = format_server_timing(timings, time.perf_counter() - start)
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode("latin-1"))
+                ]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                route=route,
+                method=scope.get("method", ""),
+                status=str(status),
+            )
+            _TIMINGS.reset(token)
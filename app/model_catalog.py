@@ -0,0 +1,232 @@
+# app/model_catalog.py
+
+"""
+Model catalog
+─────────────
+Cached view of what Ollama has pulled, shared by ``/models``, ``/api/models``
+and any code that needs a model's context window:
+
+• tags    – ``/api/tags``, fresh for MODEL_CATALOG_TTL_S; a stale list is
+            served at once while a background refresh runs
+• details – ``/api/show`` per model (family, parameter size, quantization,
+            trained context length, configured ``num_ctx``), cached the same way
+• run()   – startup task that refreshes both every MODEL_CATALOG_REFRESH_S,
+            so UI polling never waits on Ollama
+
+Concurrent misses share one request (``SingleFlight``) and one pooled
+``httpx.AsyncClient``.  A failed refresh keeps the last good data.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from app import metrics
+from app.singleflight import SingleFlight
+
+OLLAMA_HOST             = os.getenv("OLLAMA_HOST", "http://ollama:11434")
+MODEL_CATALOG_TTL_S     = float(os.getenv("MODEL_CATALOG_TTL_S", "30"))
+MODEL_CATALOG_REFRESH_S = float(os.getenv("MODEL_CATALOG_REFRESH_S", "60"))
+
+log = logging.getLogger("model_catalog")
+
+# embedding models are pulled next to the chat models but cannot chat
+_NOT_CHAT = ("nomic-embed-text",)
+
+
+@dataclass
+class ModelDetails:
+    name: str
+    family: Optional[str] = None
+    parameter_size: Optional[str] = None
+    quantization_level: Optional[str] = None
+    context_length: Optional[int] = None  # what the model was trained for
+    num_ctx: Optional[int] = None         # what its Modelfile asks Ollama for
+
+    @property
+    def context_limit(self) -> Optional[int]:
+        return self.num_ctx or self.context_length
+
+
+def _as_dict(m) -> dict:
+    return m.model_dump() if hasattr(m, "model_dump") else m.dict() if hasattr(m, "dict") else m
+
+
+def describe(entry: dict) -> Optional[str]:
+    """"family, 7B, Q4_K_M" from a tags entry (or None)."""
+    details = entry.get("details", {}) or {}
+    desc = ", ".join(
+        p for p in [
+            details.get("family", ""),
+            details.get("parameter_size", ""),
+            details.get("quantization_level", ""),
+        ] if p
+    )
+    return desc or None
+
+
+def parse_show(name: str, raw: dict) -> ModelDetails:
+    details = raw.get("details", {}) or {}
+    context_length = None
+    for key, value in (raw.get("model_info") or {}).items():
+        if key.endswith(".context_length"):
+            context_length = int(value)
+            break
+    num_ctx = None
+    for line in (raw.get("parameters") or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == "num_ctx":
+            num_ctx = int(parts[1])
+    return ModelDetails(
+        name=name,
+        family=details.get("family") or None,
+        parameter_size=details.get("parameter_size") or None,
+        quantization_level=details.get("quantization_level") or None,
+        context_length=context_length,
+        num_ctx=num_ctx,
+    )
+
+
+class ModelCatalog:
+    def __init__(
+        self,
+        host: str = OLLAMA_HOST,
+        *,
+        ttl_s: float = MODEL_CATALOG_TTL_S,
+        timeout: float = 30,
+    ) -> None:
+        self.host = host.rstrip("/")
+        self.ttl_s = ttl_s
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tags: Optional[List[dict]] = None
+        self._tags_at = 0.0
+        self._show: Dict[str, Tuple[float, ModelDetails]] = {}
+        self._flight = SingleFlight("model_catalog")
+        self._background: set = set()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _stale(self, at: float) -> bool:
+        return time.monotonic() - at > self.ttl_s
+
+    def _in_background(self, key, fn) -> None:
+        if self._flight.in_flight(key):
+            return
+
+        async def _refresh():
+            try:
+                await self._flight.do(key, fn)
+            except Exception as exc:
+                log.warning("model catalog refresh %s failed: %s", key, exc)
+
+        task = asyncio.ensure_future(_refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    # -- /api/tags ---------------------------------------------------------
+    async def _fetch_tags(self) -> List[dict]:
+        r = await self.client.get(f"{self.host}/api/tags")
+        r.raise_for_status()
+        self._tags = [_as_dict(m) for m in r.json().get("models", [])]
+        self._tags_at = time.monotonic()
+        names = {m.get("name") for m in self._tags}
+        for gone in set(self._show) - names:
+            del self._show[gone]
+        return self._tags
+
+    async def refresh(self) -> List[dict]:
+        return await self._flight.do("tags", self._fetch_tags)
+
+    async def models(self) -> List[dict]:
+        """Raw ``/api/tags`` entries; raises only if Ollama was never reached."""
+        metrics.record_cache("model_catalog", self._tags is not None)
+        if self._tags is None:
+            return await self.refresh()
+        if self._stale(self._tags_at):
+            self._in_background("tags", self._fetch_tags)
+        return self._tags
+
+    async def chat_models(self) -> List[dict]:
+        """``{"name", "description"}`` for every distinct chat-capable model."""
+        out, seen = [], set()
+        for m in await self.models():
+            name = m.get("name") or ""
+            if not name or name in seen or name.startswith(_NOT_CHAT):
+                continue
+            seen.add(name)
+            out.append({"name": name, "description": describe(m)})
+        return out
+
+    # -- /api/show ---------------------------------------------------------
+    async def _fetch_show(self, name: str) -> ModelDetails:
+        r = await self.client.post(f"{self.host}/api/show", json={"model": name, "name": name})
+        r.raise_for_status()
+        info = parse_show(name, r.json())
+        self._show[name] = (time.monotonic(), info)
+        return info
+
+    async def details(self, name: str) -> ModelDetails:
+        cached = self._show.get(name)
+        metrics.record_cache("model_details", cached is not None)
+        if cached is None:
+            return await self._flight.do(("show", name), lambda: self._fetch_show(name))
+        at, info = cached
+        if self._stale(at):
+            self._in_background(("show", name), lambda: self._fetch_show(name))
+        return info
+
+    def context_limit(self, name: str, default: Optional[int] = None) -> Optional[int]:
+        """Context window of *name* from cache, without waiting on Ollama.
+
+        A miss returns *default* and, inside a running loop, fetches the
+        details for next time.
+        """
+        cached = self._show.get(name)
+        if cached is None or self._stale(cached[0]):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                self._in_background(("show", name), lambda: self._fetch_show(name))
+        if cached is None:
+            return default
+        return cached[1].context_limit or default
+
+    # -- background --------------------------------------------------------
+    async def refresh_all(self) -> None:
+        tags = await self.refresh()
+        names = sorted({m.get("name") for m in tags if m.get("name")})
+        results = await asyncio.gather(*(self._fetch_show(n) for n in names), return_exceptions=True)
+        for name, res in zip(names, results):
+            if isinstance(res, Exception):
+                log.warning("model catalog: /api/show %s failed: %s", name, res)
+
+    async def run(self, interval_s: float = MODEL_CATALOG_REFRESH_S) -> None:
+        """Keep the catalog warm until cancelled."""
+        while True:
+            try:
+                await self.refresh_all()
+            except Exception as exc:
+                log.warning("model catalog refresh failed: %s", exc)
+            await asyncio.sleep(interval_s)
+
+
+catalog = ModelCatalog()
@@ -0,0 +1,134 @@
+# app/paragraphs.py
+
+"""
+Paragraph splitting + per-paragraph result cache for /proofread and /redraft
+────────────────────────────────────────────────────────────────────────────
+• split_sections(text)  – paragraphs (tiny ones glued to the next, long ones
+                          cut at sentence ends) with the exact separators so
+                          the rewritten text reassembles in order
+• ParagraphCache        – LRU keyed on (task, model, paragraph hash); an
+                          edited draft only re-runs the paragraphs that changed
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.metrics import record_cache
+from app.tokenizer import count_tokens
+
+PARA_MAX_TOKENS = int(os.getenv("PARA_MAX_TOKENS", "400"))
+PARA_MIN_TOKENS = int(os.getenv("PARA_MIN_TOKENS", "12"))
+PARA_CACHE_SIZE = int(os.getenv("PARA_CACHE_SIZE", "2048"))
+
+_BLANK_LINE_RE = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class Section:
+    text: str
+    sep: str = ""   # whitespace that followed the section in the input
+
+
+def _split_long(text: str, sep: str, max_tokens: int) -> List[Section]:
+    """Cut an over-long paragraph into sentence groups of <= *max_tokens*."""
+    parts = _SENTENCE_END_RE.split(text)
+    out: List[Section] = []
+    cur: List[str] = []
+    cur_tokens = 0
+    for sent in parts:
+        n = count_tokens(sent)
+        if cur and cur_tokens + n > max_tokens:
+            out.append(Section(" ".join(cur), " "))
+            cur, cur_tokens = [], 0
+        cur.append(sent)
+        cur_tokens += n
+    out.append(Section(" ".join(cur), sep))
+    return out
+
+
+def split_sections(
+    text: str,
+    max_tokens: int = PARA_MAX_TOKENS,
+    min_tokens: int = PARA_MIN_TOKENS,
+) -> List[Section]:
+    """Split *text* into rewrite units.
+
+    ``"".join(s.text + s.sep for s in sections)`` reproduces the stripped input
+    (apart from whitespace inside sentence-split paragraphs).
+    """
+    body = text.strip()
+    if not body:
+        return []
+
+    paras: List[Section] = []
+    pos = 0
+    for m in _BLANK_LINE_RE.finditer(body):
+        paras.append(Section(body[pos:m.start()], m.group(0)))
+        pos = m.end()
+    paras.append(Section(body[pos:], ""))
+
+    # headings, list markers, "Subject:" lines… ride along with what follows
+    merged: List[Section] = []
+    pending: Optional[Section] = None
+    for p in paras:
+        if pending is not None:
+            p = Section(pending.text + pending.sep + p.text, p.sep)
+            pending = None
+        if count_tokens(p.text) < min_tokens and p.sep:
+            pending = p
+            continue
+        merged.append(p)
+    if pending is not None:
+        merged.append(pending)
+
+    out: List[Section] = []
+    for p in merged:
+        if count_tokens(p.text) > max_tokens:
+            out.extend(_split_long(p.text, p.sep, max_tokens))
+        else:
+            out.append(p)
+    return out
+
+
+class ParagraphCache:
+    """Thread-safe LRU of rewritten paragraphs."""
+
+    def __init__(self, maxsize: int = PARA_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(task: str, model: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{task}:{model}:{digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            val = self._data.get(key)
+            if val is not None:
+                self._data.move_to_end(key)
+        record_cache("paragraph", val is not None)
+        return val
+
+    def put(self, key: str, val: str) -> None:
+        with self._lock:
+            self._data[key] = val
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+paragraph_cache = ParagraphCache()
@@ -1,22 +1,48 @@
 # app/rerank.py
 from functools import lru_cache
-from typing import List
+from typing import TYPE_CHECKING, Hashable, List, Optional, Sequence, Tuple
+import math
 import os
 import logging
-from sentence_transformers import CrossEncoder
+
+from app import metrics
+
+if TYPE_CHECKING:  # sentence-transformers pulls in torch; imported on first use
+    from sentence_transformers import CrossEncoder
 
 MODEL_DIR = os.getenv("CROSS_ENCODER_DIR", "/app/models/cross_encoder")
 DEVICE = os.getenv("CROSS_ENCODER_DEVICE", "cpu")
 
 DEFAULT_TOP_K = int(os.getenv("RERANK_TOP_K", "3"))
 
+# bi-encoder prefilter: only candidates whose stored embedding is within
+# PREFILTER_GAP cosine of the best one reach the cross-encoder (clamped to
+# [PREFILTER_MIN, PREFILTER_MAX]), plus up to DIVERSITY best-of-other-source picks
+PREFILTER_MIN = int(os.getenv("RERANK_PREFILTER_MIN", "6"))
+PREFILTER_MAX = int(os.getenv("RERANK_PREFILTER_MAX", "12"))
+PREFILTER_GAP = float(os.getenv("RERANK_PREFILTER_GAP", "0.15"))
+DIVERSITY     = int(os.getenv("RERANK_DIVERSITY", "2"))
+
+PAIRS = metrics.counter(
+    "offlinellm_rerank_pairs_total",
+    "Query/chunk pairs cross-encoded or skipped by the bi-encoder prefilter.",
+    ["result"],
+)
+CANDIDATES = metrics.histogram(
+    "offlinellm_rerank_candidates",
+    "Candidates sent to the cross-encoder per query.",
+    buckets=(2, 4, 6, 8, 12, 16, 24, 32, 48),
+)
+
 #MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
 @lru_cache(maxsize=1)
-def _cross() -> CrossEncoder:
+def _cross() -> "CrossEncoder":
     """Return a cached cross-encoder instance."""
     if not os.path.exists(MODEL_DIR):
         raise RuntimeError(f"cross-encoder model not found in {MODEL_DIR}")
+    # imported here: sentence-transformers pulls in torch
+    from sentence_transformers import CrossEncoder
 
     try:
         logging.info("Loading cross-encoder from %s on %s", MODEL_DIR, DEVICE)
@@ -33,7 +59,94 @@ def _cross() -> CrossEncoder:
         logging.warning("Cross-encoder model missing at %s: %s", MODEL_DIR, exc)
         raise RuntimeError(f"cross-encoder model not found in {MODEL_DIR}") from exc
 
-def rerank(query: str, docs: List[str], top_k: int = DEFAULT_TOP_K) -> List[str]:
-    scores = _cross().predict([[query, d] for d in docs])
-    ranked = sorted(zip(docs, scores), key=lambda x: x[1], reverse=True)
-    return [d for d, _ in ranked[:top_k]]
+def warm() -> None:
+    """Load the cross-encoder now (start-up warm-up)."""
+    _cross()
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def prefilter(
+    query_vec: Sequence[float],
+    doc_vecs: Sequence[Optional[Sequence[float]]],
+    top_k: int = DEFAULT_TOP_K,
+    *,
+    groups: Optional[Sequence[Hashable]] = None,
+    min_keep: int = PREFILTER_MIN,
+    max_keep: int = PREFILTER_MAX,
+    gap: float = PREFILTER_GAP,
+    diversity: int = DIVERSITY,
+) -> List[int]:
+    """Indices of the candidates worth cross-encoding, best first.
+
+    Candidates without a stored vector cannot be judged and are always kept.
+    *groups* (e.g. source file per candidate) lets up to *diversity* extra
+    candidates from otherwise unrepresented groups through.
+    """
+    floor = max(min_keep, top_k)
+    if len(doc_vecs) <= floor:
+        return list(range(len(doc_vecs)))
+
+    scored, unknown = [], []
+    for i, vec in enumerate(doc_vecs):
+        if vec is None or len(vec) == 0:
+            unknown.append(i)
+        else:
+            scored.append((_cosine(query_vec, vec), i))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    if not scored:
+        return unknown
+
+    # a sharp drop after the leaders means the tail is not worth scoring
+    best = scored[0][0]
+    keep = sum(1 for s, _ in scored if s >= best - gap)
+    keep = max(floor, min(max_keep, keep))
+    chosen = [i for _, i in scored[:keep]]
+
+    if groups is not None and diversity > 0:
+        seen = {groups[i] for i in chosen}
+        for _, i in scored[keep:]:
+            if diversity == 0:
+                break
+            if groups[i] not in seen:
+                chosen.append(i)
+                seen.add(groups[i])
+                diversity -= 1
+    return chosen + unknown
+
+
+def rerank_scored(
+    query: str,
+    docs: Sequence[str],
+    top_k: int = DEFAULT_TOP_K,
+    *,
+    query_vec: Optional[Sequence[float]] = None,
+    doc_vecs: Optional[Sequence[Optional[Sequence[float]]]] = None,
+    groups: Optional[Sequence[Hashable]] = None,
+) -> List[Tuple[int, float]]:
+    """Return ``(index, score)`` of the *top_k* most relevant *docs*, best first.
+
+    With *query_vec* and per-doc *doc_vecs* the candidates are first narrowed
+    by embedding similarity (see ``prefilter``) so the cross-encoder only
+    scores the promising ones.
+    """
+    idx = list(range(len(docs)))
+    if query_vec is not None and doc_vecs is not None and len(doc_vecs) == len(docs):
+        idx = prefilter(query_vec, doc_vecs, top_k, groups=groups)
+        PAIRS.inc(len(docs) - len(idx), result="skipped")
+    if not idx:
+        return []
+    PAIRS.inc(len(idx), result="scored")
+    CANDIDATES.observe(len(idx))
+    scores = _cross().predict([[query, docs[i]] for i in idx])
+    ranked = sorted(zip(idx, scores), key=lambda x: x[1], reverse=True)
+    return [(i, float(s)) for i, s in ranked[:top_k]]
+
+
+def rerank(query: str, docs: List[str], top_k: int = DEFAULT_TOP_K, **kwargs) -> List[str]:
+    """Return the *top_k* most relevant of *docs* (see ``rerank_scored``)."""
+    return [docs[i] for i, _ in rerank_scored(query, docs, top_k, **kwargs)]
@@ -0,0 +1,203 @@
+# app/retrieval.py
+
+"""
+Typed retrieval candidates
+──────────────────────────
+Chunks travel from the vector stores to the prompt as ``Candidate`` objects
+that carry their id, metadata, embedding distance and rerank score:
+
+• retrieve()           – one store → candidates (+ the query embedding);
+                         query embeddings and KB results are kept in short
+                         TTL caches, which /doc_qa/prefetch fills ahead of
+                         the real question
+• fuse(*lists)         – merge KB / session results, dropping identical text
+                         so the cross-encoder never scores a chunk twice
+• rerank_candidates()  – cross-encoder scores written back onto candidates
+
+Sources shown to the user therefore always come from the chunk that was
+actually used, even when two stores hold the same text.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from app import deadlines, metrics
+from app.rerank import DEFAULT_TOP_K, rerank_scored
+from app.singleflight import normalize_text
+from app.vector_store import kb_version, search_with_vectors
+
+QUERY_CACHE_SIZE  = int(os.getenv("QUERY_CACHE_SIZE", "256"))
+# bounds staleness after KB writes made by *other* workers (own writes bump kb_version)
+QUERY_CACHE_TTL_S = float(os.getenv("QUERY_CACHE_TTL_S", "300"))
+
+DUPLICATES = metrics.counter(
+    "offlinellm_retrieval_duplicates_total",
+    "Retrieved chunks dropped because identical text was already a candidate.",
+)
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries also expire after *ttl_s*."""
+
+    def __init__(self, name: str, maxsize: int = QUERY_CACHE_SIZE, ttl_s: float = QUERY_CACHE_TTL_S) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and now - item[0] > self.ttl_s:
+                del self._data[key]
+                item = None
+            if item is not None:
+                self._data.move_to_end(key)
+        metrics.record_cache(self.name, item is not None)
+        return None if item is None else item[1]
+
+    def put(self, key: Hashable, val: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), val)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+query_embeddings = TTLCache("query_embedding")
+kb_results = TTLCache("kb_retrieval")
+
+
+@dataclass
+class Candidate:
+    text: str
+    metadata: dict = field(default_factory=dict)
+    doc_id: Optional[str] = None
+    distance: Optional[float] = None
+    embedding: Optional[Sequence[float]] = field(default=None, repr=False)
+    origin: str = "kb"              # "kb" or "session"
+    score: Optional[float] = None   # cross-encoder score once reranked
+
+    @property
+    def page(self) -> Optional[int]:
+        return self.metadata.get("page_number") or self.metadata.get("page")
+
+    @property
+    def source(self) -> Optional[str]:
+        return self.metadata.get("source_file") or self.metadata.get("source")
+
+    @property
+    def group(self) -> Tuple[str, Optional[str]]:
+        """Key for the reranker's per-source diversity quota."""
+        return (self.origin, self.source)
+
+
+def retrieve(
+    query: str,
+    k: int,
+    *,
+    origin: str = "kb",
+    store=None,
+    use_mmr: bool = False,
+    query_embedding: Optional[Sequence[float]] = None,
+    sources: Optional[Sequence[str]] = None,
+    shard_filter: Optional[Sequence[str]] = None,
+) -> Tuple[List[Candidate], Optional[Sequence[float]]]:
+    """Return candidates from *store* (default: the KB) and the query vector.
+
+    *sources* / *shard_filter* limit a KB search to those documents / shards.
+    KB results are cached per question, filter and ``kb_version()``;
+    candidates are copies, so callers may rerank them in place.
+    """
+    deadlines.check("retrieve")
+    text = " ".join(query.split())
+    if query_embedding is None:
+        query_embedding = query_embeddings.get(text)
+    kb_key = None
+    if store is None:
+        kb_key = (
+            origin, text, k, use_mmr,
+            tuple(sorted(sources or ())), tuple(sorted(shard_filter or ())), kb_version(),
+        )
+        cached = kb_results.get(kb_key)
+        if cached is not None:
+            return [replace(c) for c in cached[0]], cached[1]
+
+    hits = search_with_vectors(
+        query, k=k, use_mmr=use_mmr, store=store, query_embedding=query_embedding,
+        sources=sources, shard_filter=shard_filter,
+    )
+    cands = [
+        Candidate(
+            text=doc.page_content,
+            metadata=doc.metadata or {},
+            doc_id=hits.ids[i] if i < len(hits.ids) else None,
+            distance=hits.distances[i] if i < len(hits.distances) else None,
+            embedding=hits.embeddings[i] if i < len(hits.embeddings) else None,
+            origin=origin,
+        )
+        for i, doc in enumerate(hits.docs)
+    ]
+    if hits.query_embedding is not None:
+        query_embeddings.put(text, hits.query_embedding)
+    if kb_key is not None:
+        kb_results.put(kb_key, ([replace(c) for c in cands], hits.query_embedding))
+    return cands, hits.query_embedding
+
+
+def fuse(*lists: List[Candidate]) -> List[Candidate]:
+    """Merge candidate lists, keeping the closest copy of identical text.
+
+    Order is preserved (first list first), so the caller's store priority
+    decides ties.
+    """
+    best: Dict[str, int] = {}
+    out: List[Candidate] = []
+    for cands in lists:
+        for c in cands:
+            key = normalize_text(c.text)
+            pos = best.get(key)
+            if pos is None:
+                best[key] = len(out)
+                out.append(c)
+                continue
+            DUPLICATES.inc()
+            kept = out[pos]
+            if c.distance is not None and (kept.distance is None or c.distance < kept.distance):
+                out[pos] = c
+    return out
+
+
+def rerank_candidates(
+    query: str,
+    cands: List[Candidate],
+    *,
+    query_vec: Optional[Sequence[float]] = None,
+    top_k: int = DEFAULT_TOP_K,
+) -> List[Candidate]:
+    """Return the *top_k* best candidates with ``score`` filled in."""
+    ranked = rerank_scored(
+        query,
+        [c.text for c in cands],
+        top_k,
+        query_vec=query_vec,
+        doc_vecs=[c.embedding for c in cands],
+        groups=[c.group for c in cands],
+    )
+    out = []
+    for i, score in ranked:
+        cands[i].score = score
+        out.append(cands[i])
+    return out
@@ -1,6 +1,9 @@
 from fastapi import APIRouter, HTTPException
 
-from app.chat import safe_chat, chat as chat_fn, new_session_id
+from app import deadlines
+from app.chat import safe_chat, chat as chat_fn, new_session_id, DEFAULT_MODEL
+from app.scheduler import PRIORITY_INTERACTIVE, SchedulerBusy, scheduler
+from app.sessions import manager as session_manager
 
 router = APIRouter()
 
@@ -11,16 +14,26 @@ async def chat(payload: dict):
         messages = payload.get("messages")
 
         if isinstance(messages, list):
-            kwargs = {k: v for k, v in payload.items() if k not in {"model", "messages"}}
-            return safe_chat(model=model, messages=messages, stream=False, **kwargs)
+            # the reply is always sent whole, so an Ollama-style "stream" flag is dropped
+            kwargs = {k: v for k, v in payload.items() if k not in {"model", "messages", "stream"}}
+            async with scheduler.slot(model or DEFAULT_MODEL, priority=PRIORITY_INTERACTIVE):
+                return await deadlines.run_sync(
+                    safe_chat, model=model, messages=messages, **kwargs
+                )
 
         # fallback: behave like /chat for compatibility
         user_msg = payload.get("user_msg")
         if user_msg is not None:
             session_id = payload.get("session_id") or new_session_id()
-            answer = chat_fn(session_id, user_msg, model=model)
+            async with scheduler.slot(model or DEFAULT_MODEL, priority=PRIORITY_INTERACTIVE):
+                answer = await deadlines.run_sync(chat_fn, session_id, user_msg, model=model)
+            session_manager.touch(session_id)
             return {"session_id": session_id, "answer": answer}
 
         raise ValueError("messages must be a list or provide user_msg")
+    except SchedulerBusy as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=502, detail=str(e))
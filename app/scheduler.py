@@ -0,0 +1,341 @@
+# app/scheduler.py
+
+"""
+Admission control for LLM generations
+─────────────────────────────────────
+Ollama on a CPU box serves one or two generations at a time; everything
+beyond that only makes every request slower.  ``LLMScheduler`` sits in front
+of ``safe_chat``:
+
+• at most *N* in-flight generations per model (``LLM_MAX_INFLIGHT``)
+• priority classes – interactive chat / QA ahead of proofreading ahead of
+  bulk redrafting
+• per-client fairness inside a class (start-time fair queuing on a virtual
+  clock, so one client submitting ten requests cannot starve another)
+• fail fast with ``SchedulerBusy`` (→ HTTP 429 + Retry-After) when the
+  estimated wait exceeds ``LLM_QUEUE_DEADLINE_S`` or the time the request
+  has left (``app.deadlines``)
+• a generation cancelled mid-run (client gone, deadline) is counted with
+  the seconds it would still have needed, estimated from recent runs
+
+Limits are enforced per process.  When ``LLM_SLOT_DIR`` is set, every
+granted slot must also take one of *N* file locks in that directory, which
+caps generations across all Uvicorn workers on the host; waiting for a lock
+counts against the same budget and ends in ``SchedulerBusy`` too.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev boxes
+    fcntl = None
+
+from app import deadlines, metrics
+
+log = logging.getLogger("scheduler")
+
+# priority classes (lower is served first)
+PRIORITY_INTERACTIVE = 0   # /chat, /doc_qa, /session_qa
+PRIORITY_EDIT        = 1   # /proofread, /grammar_check
+PRIORITY_BULK        = 2   # /redraft
+
+
+def _parse_limits(val: str | None) -> Dict[str, int]:
+    """Parse ``"model=2,other:tag=1"`` into a per-model limit map."""
+    out: Dict[str, int] = {}
+    for part in (val or "").split(","):
+        if "=" not in part:
+            continue
+        name, _, num = part.rpartition("=")
+        try:
+            out[name.strip()] = max(1, int(num))
+        except ValueError:
+            raise ValueError(f"invalid LLM_MAX_INFLIGHT_PER_MODEL entry: {part!r}") from None
+    return out
+
+
+MAX_INFLIGHT     = max(1, int(os.getenv("LLM_MAX_INFLIGHT", "1")))
+MODEL_LIMITS     = _parse_limits(os.getenv("LLM_MAX_INFLIGHT_PER_MODEL"))
+QUEUE_DEADLINE_S = float(os.getenv("LLM_QUEUE_DEADLINE_S", "120"))
+EST_SERVICE_S    = float(os.getenv("LLM_EST_SERVICE_S", "20"))
+SLOT_DIR         = os.getenv("LLM_SLOT_DIR") or None
+
+IN_FLIGHT = metrics.gauge(
+    "offlinellm_llm_in_flight", "LLM generations currently running.", ["model"]
+)
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "offlinellm_llm_queue_wait_seconds",
+    "Time an LLM call waited for a generation slot.",
+    ["model", "priority"],
+)
+CANCELLED = metrics.counter(
+    "offlinellm_llm_cancelled_total",
+    "LLM generations cancelled before they finished.",
+    ["model"],
+)
+SECONDS_SAVED = metrics.counter(
+    "offlinellm_llm_generation_seconds_saved_total",
+    "Estimated generation seconds not spent on cancelled requests.",
+    ["model"],
+)
+REJECTED = metrics.counter(
+    "offlinellm_llm_rejected_total",
+    "LLM calls rejected with 429 because the estimated wait was too long.",
+    ["model"],
+)
+
+# client identity for fairness; set per request by ClientIdentityMiddleware
+current_client: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_client", default="anonymous"
+)
+
+
+class SchedulerBusy(Exception):
+    """Raised when a call cannot be admitted within the queue deadline."""
+
+    def __init__(self, model: str, retry_after: float) -> None:
+        self.model = model
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"model '{model}' is busy; retry in {self.retry_after}s")
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    tag: float
+    seq: int
+    client: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class _ModelQueue:
+    def __init__(self, model: str, limit: int) -> None:
+        self.model = model
+        self.limit = limit
+        self.active = 0
+        self.heap: List[_Waiter] = []
+        self.waiting = 0
+        self.vclock = 0.0
+        self.client_tags: Dict[Tuple[int, str], float] = {}
+        self.service_s = EST_SERVICE_S
+
+    def next_tag(self, priority: int, client: str) -> float:
+        """Start tag for a new call; it is only recorded once the call runs,
+        so rejected or abandoned calls do not push the client back."""
+        key = (priority, client)
+        last = self.client_tags.get(key, 0.0)
+        for w in self.heap:
+            if not w.future.done() and (w.priority, w.client) == key:
+                last = max(last, w.tag)
+        return max(self.vclock, last) + 1.0
+
+    def ahead_of(self, priority: int, tag: float) -> int:
+        return sum(
+            1 for w in self.heap
+            if not w.future.done() and (w.priority, w.tag) <= (priority, tag)
+        )
+
+    def estimate_wait(self, ahead: int) -> float:
+        """Rough wait in seconds for a caller with *ahead* waiters before it."""
+        free = self.limit - self.active
+        if free > ahead:
+            return 0.0
+        rounds = (ahead - free) // self.limit + 1
+        return rounds * self.service_s
+
+    def observe_service(self, seconds: float) -> None:
+        # exponentially weighted moving average of generation time
+        self.service_s = 0.8 * self.service_s + 0.2 * seconds
+
+    def dispatch(self) -> None:
+        while self.active < self.limit and self.heap:
+            w = heapq.heappop(self.heap)
+            if w.future.done():  # cancelled while queued
+                continue
+            self.waiting -= 1
+            self.active += 1
+            self.vclock = max(self.vclock, w.tag)
+            key = (w.priority, w.client)
+            self.client_tags[key] = max(self.client_tags.get(key, 0.0), w.tag)
+            w.future.set_result(None)
+        # forget clients that fell behind the virtual clock
+        if len(self.client_tags) > 1024:
+            self.client_tags = {c: t for c, t in self.client_tags.items() if t > self.vclock}
+        metrics.QUEUE_DEPTH.set(self.waiting, queue=f"llm:{self.model}")
+        IN_FLIGHT.set(self.active, model=self.model)
+
+
+class _HostSlots:
+    """Cross-process slot tokens backed by ``flock`` on N files."""
+
+    def __init__(self, directory: str, poll_s: float = 0.1) -> None:
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.poll_s = poll_s
+
+    def _try_take(self, model: str, limit: int) -> Optional[int]:
+        safe = "".join(c if c.isalnum() else "_" for c in model)
+        for i in range(limit):
+            fd = os.open(self.dir / f"{safe}.{i}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    async def take(self, model: str, limit: int, timeout: float) -> Optional[int]:
+        """Wait up to *timeout* seconds for a token; ``None`` if none came free."""
+        give_up = time.monotonic() + timeout
+        while True:
+            fd = self._try_take(model, limit)
+            if fd is not None:
+                return fd
+            left = give_up - time.monotonic()
+            if left <= 0:
+                return None
+            await asyncio.sleep(min(self.poll_s, left))
+
+    @staticmethod
+    def give(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        default_limit: int = MAX_INFLIGHT,
+        limits: Optional[Dict[str, int]] = None,
+        deadline_s: float = QUEUE_DEADLINE_S,
+        slot_dir: Optional[str] = SLOT_DIR,
+    ) -> None:
+        self.default_limit = default_limit
+        self.limits = dict(MODEL_LIMITS if limits is None else limits)
+        self.deadline_s = deadline_s
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self._host = _HostSlots(slot_dir) if slot_dir and fcntl is not None else None
+
+    def _queue(self, model: str) -> _ModelQueue:
+        q = self._queues.get(model)
+        if q is None:
+            q = self._queues[model] = _ModelQueue(model, self.limits.get(model, self.default_limit))
+        return q
+
+    def limit(self, model: str) -> int:
+        """In-flight generation limit for *model*."""
+        return self._queue(model).limit
+
+    def depth(self, model: str) -> int:
+        """Number of callers waiting for *model*."""
+        return self._queue(model).waiting
+
+    async def _acquire(self, q: _ModelQueue, priority: int, client: str) -> None:
+        tag = q.next_tag(priority, client)
+        est = q.estimate_wait(q.ahead_of(priority, tag))
+        budget = max(0.0, min(self.deadline_s, deadlines.remaining()))
+        if est > budget:
+            REJECTED.inc(model=q.model)
+            log.warning("rejecting call for %s: estimated wait %.0fs", q.model, est)
+            raise SchedulerBusy(q.model, est)
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(q.heap, _Waiter(priority, tag, next(self._seq), client, fut))
+        q.waiting += 1
+        q.dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=budget)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if fut.done() and not fut.cancelled():
+                # slot was granted in the same tick we gave up – hand it back
+                q.active -= 1
+            else:
+                fut.cancel()
+                q.waiting -= 1
+            q.dispatch()
+            if isinstance(exc, asyncio.TimeoutError):
+                REJECTED.inc(model=q.model)
+                raise SchedulerBusy(q.model, q.service_s) from None
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        model: str,
+        *,
+        priority: int = PRIORITY_INTERACTIVE,
+        client: Optional[str] = None,
+    ) -> AsyncIterator[None]:
+        """Hold one generation slot for *model* for the duration of the block."""
+        q = self._queue(model)
+        start = time.perf_counter()
+        await self._acquire(q, priority, client or current_client.get())
+        fd = None
+        try:
+            if self._host is not None:
+                # the host-wide wait counts against the same budget as the queue
+                budget = min(self.deadline_s, deadlines.remaining()) - (time.perf_counter() - start)
+                fd = await self._host.take(model, q.limit, max(0.0, budget))
+                if fd is None:
+                    REJECTED.inc(model=model)
+                    raise SchedulerBusy(model, q.service_s)
+            waited = time.perf_counter() - start
+            QUEUE_WAIT_SECONDS.observe(waited, model=model, priority=str(priority))
+            metrics.add_timing("llm_queue", waited)
+            run_start = time.perf_counter()
+            try:
+                yield
+            except asyncio.CancelledError:
+                CANCELLED.inc(model=model)
+                SECONDS_SAVED.inc(max(0.0, q.service_s - (time.perf_counter() - run_start)), model=model)
+                raise
+            q.observe_service(time.perf_counter() - run_start)
+        finally:
+            if fd is not None:
+                self._host.give(fd)
+            q.active -= 1
+            q.dispatch()
+
+
+class ClientIdentityMiddleware:
+    """Pure ASGI middleware recording the caller for fair scheduling.
+
+    Behind Nginx the peer is always the proxy, so ``X-Real-IP`` /
+    ``X-Forwarded-For`` take precedence over the socket address.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        ident = headers.get(b"x-real-ip") or headers.get(b"x-forwarded-for", b"").split(b",")[0]
+        client = ident.decode("latin-1").strip() if ident else ""
+        if not client and scope.get("client"):
+            client = scope["client"][0]
+        token = current_client.set(client or "anonymous")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
+
+
+scheduler = LLMScheduler()
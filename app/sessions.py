@@ -0,0 +1,277 @@
+# app/sessions.py
+
+"""
+Session lifecycle
+─────────────────
+One ``SessionManager`` per worker tracks every session created by /chat,
+/upload_pdf or /session_qa:
+
+• expiry    – a min-heap of (deadline, session) with lazy invalidation, so the
+              GC pops only what is due instead of scanning every session
+• handles   – open Chroma session stores live in an LRU capped at
+              SESSION_MAX_OPEN; idle ones beyond the cap are closed (their
+              SQLite files and cached Chroma system released) and reopened on
+              demand.  Handles in use by a request are never evicted.
+• deletion  – folders are removed with ``asyncio.to_thread`` off the loop
+• liveness  – every use/touch (at most once a minute) refreshes a
+              ``last_used`` file in the session folder, which the orphan
+              sweep in every worker reads; Chroma reads leave no mtime
+• quotas    – SESSION_MAX_CHUNKS and SESSION_MAX_UPLOAD_MB per session;
+              exceeding either raises ``SessionQuotaExceeded`` (HTTP 413)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app import metrics
+from app.vector_store import (
+    SESSIONS_ROOT,
+    close_store,
+    get_session_store,
+    new_session_store,
+    purge_session_store,
+)
+
+SESSION_TTL_MIN        = int(os.getenv("SESSION_TTL_MIN", 60))
+SESSION_MAX_OPEN       = max(1, int(os.getenv("SESSION_MAX_OPEN", "32")))
+SESSION_MAX_CHUNKS     = int(os.getenv("SESSION_MAX_CHUNKS", "5000"))
+SESSION_MAX_UPLOAD_MB  = int(os.getenv("SESSION_MAX_UPLOAD_MB", "200"))
+
+LAST_USED = "last_used"     # marker file inside each session folder
+_MARK_EVERY_S = 60.0
+
+log = logging.getLogger("sessions")
+
+OPEN_STORES = metrics.gauge(
+    "offlinellm_session_stores_open",
+    "Session Chroma handles currently open in this worker.",
+)
+EVENTS = metrics.counter(
+    "offlinellm_sessions_total",
+    "Session lifecycle events (expired, ended, evicted handle, quota refusal).",
+    ["event"],
+)
+
+
+class SessionQuotaExceeded(Exception):
+    """An upload would take a session over its chunk or byte quota."""
+
+
+def mark_used(sid: str) -> None:
+    """Refresh the session folder's ``last_used`` marker (if it has a folder)."""
+    folder = SESSIONS_ROOT / sid
+    if folder.is_dir():
+        try:
+            (folder / LAST_USED).touch()
+        except OSError as exc:
+            log.warning("could not mark session %s as used: %s", sid, exc)
+
+
+@dataclass
+class _Session:
+    deadline: float
+    chunks: int = 0
+    bytes: int = 0
+    pins: int = 0
+    marked: float = 0.0  # last mark_used(), monotonic
+    ending: bool = False  # end() called while requests were using it
+
+
+class SessionManager:
+    def __init__(
+        self,
+        *,
+        ttl_s: float = SESSION_TTL_MIN * 60,
+        max_open: int = SESSION_MAX_OPEN,
+        max_chunks: int = SESSION_MAX_CHUNKS,
+        max_bytes: int = SESSION_MAX_UPLOAD_MB * 1024 * 1024,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.max_open = max_open
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        self._meta: Dict[str, _Session] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._open: "OrderedDict[str, object]" = OrderedDict()
+        self._on_expire: List[Callable[[str], None]] = []
+
+    # -- bookkeeping -------------------------------------------------------
+    def on_expire(self, fn: Callable[[str], None]) -> None:
+        """Call *fn(session_id)* whenever a session expires or is ended."""
+        self._on_expire.append(fn)
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._meta
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def _mark(self, sid: str, meta: _Session, *, force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - meta.marked >= _MARK_EVERY_S:
+            meta.marked = now
+            mark_used(sid)
+
+    def touch(self, sid: str) -> None:
+        deadline = time.monotonic() + self.ttl_s
+        meta = self._meta.get(sid)
+        if meta is None:
+            meta = self._meta[sid] = _Session(deadline)
+        meta.deadline = deadline
+        self._mark(sid, meta)
+        heapq.heappush(self._heap, (deadline, sid))
+        if sid in self._open:
+            self._open.move_to_end(sid)
+        # stale heap entries pile up on busy sessions; rebuild when mostly dead
+        if len(self._heap) > 4 * len(self._meta) + 64:
+            self._heap = [(m.deadline, s) for s, m in self._meta.items()]
+            heapq.heapify(self._heap)
+
+    # -- store handles -----------------------------------------------------
+    def _evict(self) -> None:
+        for sid in list(self._open):
+            if len(self._open) <= self.max_open:
+                break
+            meta = self._meta.get(sid)
+            if meta is not None and meta.pins:
+                continue  # a request is using it
+            close_store(self._open.pop(sid))
+            EVENTS.inc(event="evicted")
+        OPEN_STORES.set(len(self._open))
+
+    @asynccontextmanager
+    async def use(self, sid: str, *, create: bool = False) -> AsyncIterator[object]:
+        """Yield the session's store, pinned against eviction while in use.
+
+        Raises ``ValueError`` (like ``get_session_store``) if the session has
+        no store and *create* is False, or is being ended.  If it was ended
+        while in use, it is dropped when the last user exits.
+        """
+        meta = self._meta.get(sid)
+        if meta is not None and meta.ending:
+            raise ValueError(f"Session '{sid}' has ended")
+        self.touch(sid)
+        meta = self._meta[sid]
+        meta.pins += 1
+        try:
+            store = self._open.get(sid)
+            metrics.record_cache("session_store", store is not None)
+            if store is None:
+                opener = new_session_store if create else get_session_store
+                try:
+                    store = await asyncio.to_thread(opener, sid)
+                except ValueError:
+                    if meta.pins == 1 and not meta.chunks:
+                        self._meta.pop(sid, None)  # no such session: do not track it
+                    raise
+                self._open[sid] = store
+                self._mark(sid, meta, force=True)  # the folder may be new
+            self._open.move_to_end(sid)
+            self._evict()
+            yield store
+        finally:
+            meta.pins -= 1
+            if not meta.pins and self._meta.get(sid) is meta:
+                if meta.ending:
+                    await self._drop(sid)
+                else:
+                    self.touch(sid)  # idle time counts from the last request
+
+    # -- quotas ------------------------------------------------------------
+    def check_upload(self, sid: str, nbytes: int, chunks: int = 0) -> None:
+        meta = self._meta.get(sid) or _Session(0.0)
+        if self.max_bytes and meta.bytes + nbytes > self.max_bytes:
+            EVENTS.inc(event="quota")
+            raise SessionQuotaExceeded(
+                f"session upload limit of {self.max_bytes // (1024 * 1024)} MB reached"
+            )
+        if self.max_chunks and meta.chunks + chunks > self.max_chunks:
+            EVENTS.inc(event="quota")
+            raise SessionQuotaExceeded(f"session limit of {self.max_chunks} chunks reached")
+
+    def charge(self, sid: str, nbytes: int, chunks: int) -> None:
+        self.touch(sid)
+        meta = self._meta[sid]
+        meta.bytes += nbytes
+        meta.chunks += chunks
+
+    def usage(self, sid: str) -> Optional[dict]:
+        meta = self._meta.get(sid)
+        if meta is None:
+            return None
+        return {"chunks": meta.chunks, "bytes": meta.bytes, "open": sid in self._open}
+
+    # -- removal -----------------------------------------------------------
+    async def _drop(self, sid: str) -> None:
+        meta = self._meta.get(sid)
+        if meta is not None and meta.pins:
+            meta.ending = True  # use() finishes the job once unpinned
+            return
+        self._meta.pop(sid, None)
+        store = self._open.pop(sid, None)
+        OPEN_STORES.set(len(self._open))
+        for fn in self._on_expire:
+            try:
+                fn(sid)
+            except Exception:
+                log.exception("session expiry hook failed for %s", sid)
+        if store is not None:
+            close_store(store)
+        await asyncio.to_thread(purge_session_store, sid)
+
+    async def end(self, sid: str) -> None:
+        """Drop *sid* now, or once the requests still using it finish."""
+        await self._drop(sid)
+        EVENTS.inc(event="ended")
+
+    def due(self, now: Optional[float] = None) -> List[str]:
+        """Pop and return sessions whose deadline has passed (and are idle)."""
+        now = time.monotonic() if now is None else now
+        out = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, sid = heapq.heappop(self._heap)
+            meta = self._meta.get(sid)
+            if meta is None or meta.deadline != deadline:
+                continue  # touched again since, or already gone
+            if meta.pins:
+                continue  # serving a request; use() re-arms the deadline on exit
+            out.append(sid)
+        return out
+
+    async def expire_due(self) -> int:
+        expired = 0
+        for sid in self.due():
+            # each drop awaits, so a later sid may have been used again meanwhile
+            meta = self._meta.get(sid)
+            if meta is None or meta.pins or meta.deadline > time.monotonic():
+                continue
+            await self._drop(sid)
+            EVENTS.inc(event="expired")
+            expired += 1
+        if expired:
+            log.info("🧹  expired %d idle session(s)", expired)
+        return expired
+
+    async def run(self, max_sleep_s: float = 60.0) -> None:
+        """Expire sessions as their deadlines come up, until cancelled."""
+        while True:
+            wait = max_sleep_s
+            if self._heap:
+                wait = min(max_sleep_s, max(0.0, self._heap[0][0] - time.monotonic()))
+            await asyncio.sleep(wait)
+            try:
+                await self.expire_due()
+            except Exception:
+                log.exception("❌  session expiry failed")
+
+
+manager = SessionManager()
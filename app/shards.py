@@ -0,0 +1,82 @@
+# app/shards.py
+
+"""
+Knowledge-base shards
+─────────────────────
+The permanent KB can be split over several Chroma collections ("shards") so
+a question about one manual series only searches that series, and one
+shard can be rebuilt without touching the rest.
+
+• KB_SHARD_RULES – filename globs to named shards,
+                   e.g. ``manual_*.pdf=manuals;hr_*.pdf=hr``
+• KB_SHARD_COUNT – documents no rule matches are spread over this many hash
+                   shards (``h00`` …); 0 keeps them in the default shard
+
+The default shard is the original ``persistent_docs`` collection, so an
+unconfigured node – or one that only adds rules – keeps its existing data.
+Routing is by source filename only; this module does no I/O
+(``vector_store`` opens the collections).
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+KB_SHARD_RULES   = os.getenv("KB_SHARD_RULES", "")
+KB_SHARD_COUNT   = max(0, int(os.getenv("KB_SHARD_COUNT", "0")))
+KB_SHARD_WORKERS = max(1, int(os.getenv("KB_SHARD_WORKERS", "4")))
+
+DEFAULT_SHARD = "default"
+BASE_COLLECTION = "persistent_docs"
+_SEP = "__"
+_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,40}$")
+
+
+def _rules(spec: str) -> Dict[str, str]:
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(";"))):
+        pattern, _, shard = part.partition("=")
+        shard = shard.strip().lower()
+        if _NAME.match(shard):
+            out[pattern.strip()] = shard
+    return out
+
+
+def _hash_shard(name: str, count: int) -> str:
+    return f"h{zlib.crc32(name.encode('utf-8')) % count:02d}"
+
+
+def shard_for(source: str, *, rules: Optional[str] = None, count: Optional[int] = None) -> str:
+    """Shard that new chunks of *source* are written to."""
+    name = Path(source).name
+    for pattern, shard in _rules(KB_SHARD_RULES if rules is None else rules).items():
+        if fnmatch.fnmatch(name, pattern):
+            return shard
+    count = KB_SHARD_COUNT if count is None else count
+    return _hash_shard(name, count) if count else DEFAULT_SHARD
+
+
+def configured() -> List[str]:
+    """Every shard the current configuration can route to, default first."""
+    names = [DEFAULT_SHARD] + sorted(set(_rules(KB_SHARD_RULES).values()))
+    names += [f"h{i:02d}" for i in range(KB_SHARD_COUNT)]
+    return list(dict.fromkeys(names))
+
+
+def collection_name(shard: str) -> str:
+    return BASE_COLLECTION if shard == DEFAULT_SHARD else f"{BASE_COLLECTION}{_SEP}{shard}"
+
+
+def shard_of_collection(collection: str) -> Optional[str]:
+    """Inverse of ``collection_name`` (None for unrelated collections)."""
+    if collection == BASE_COLLECTION:
+        return DEFAULT_SHARD
+    prefix = BASE_COLLECTION + _SEP
+    if collection.startswith(prefix) and _NAME.match(collection[len(prefix):]):
+        return collection[len(prefix):]
+    return None
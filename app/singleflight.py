@@ -0,0 +1,141 @@
+# app/singleflight.py
+
+"""
+Single-flight coalescing of identical in-flight work
+────────────────────────────────────────────────────
+When many users ask the same question at the same moment only the first
+request does the retrieval + rerank + generation; everyone else awaits the
+same task.  Nothing is cached once the task finishes – this only merges
+calls that overlap in time.
+
+• SingleFlight.do(key, fn)        – share one awaitable result
+• SingleFlight.stream(key, make)  – share one async token stream; late
+                                    subscribers replay what was already sent
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from app import metrics
+
+T = TypeVar("T")
+
+COALESCED = metrics.counter(
+    "offlinellm_coalesced_requests_total",
+    "Requests that joined an identical in-flight call instead of starting one.",
+    ["flight"],
+)
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form used in coalescing keys."""
+    return " ".join(text.casefold().split())
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """Fan one async iterator out to any number of subscribers."""
+
+    def __init__(self, source: AsyncIterator[Any]) -> None:
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except BaseException as exc:  # includes cancellation of the pump
+            self.error = exc
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        pos = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: pos < len(self.items) or self.done)
+                batch = self.items[pos:]
+                finished = self.done
+            for item in batch:
+                yield item
+            pos += len(batch)
+            if finished and pos >= len(self.items):
+                if self.error is not None and not isinstance(self.error, asyncio.CancelledError):
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._streams: Dict[Hashable, _SharedStream] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls or key in self._streams
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()`` – or the identical call already running for *key*.
+
+        The shared task is cancelled only when every waiter has gone away, so
+        one client disconnecting does not fail the others.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, k=key, c=call: self._forget(k, c))
+        else:
+            COALESCED.inc(flight=self.name)
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def stream(
+        self, key: Hashable, make: Callable[[], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        """Yield the items of ``make()``, shared with concurrent subscribers."""
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream(make())
+            self._streams[key] = shared
+            shared.task.add_done_callback(
+                lambda _t, k=key, s=shared: self._streams.pop(k, None) if self._streams.get(k) is s else None
+            )
+        else:
+            COALESCED.inc(flight=self.name)
+        shared.subscribers += 1
+        try:
+            async for item in shared.subscribe():
+                yield item
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.task.done():
+                shared.task.cancel()
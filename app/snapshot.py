@@ -0,0 +1,182 @@
+# app/snapshot.py
+
+"""
+Portable snapshots of the permanent knowledge base
+──────────────────────────────────────────────────
+Re-embedding every PDF on a new (CPU-only, air-gapped) node takes hours.
+Instead, export the collection once and bulk-load it elsewhere:
+
+    python -m app.snapshot export /app/data/kb_snapshot.npz
+    python -m app.snapshot import /app/data/kb_snapshot.npz
+
+The snapshot is one compressed ``.npz`` holding a float32 vector matrix plus
+JSON-encoded columns (ids, documents, metadatas) and a manifest with the
+embedding model name and dimension.  Import never calls Ollama and refuses a
+snapshot made with a different embedding model (or dimension).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app import flat_index, vector_store
+from app.vector_store import EMBED_MODEL, write_embedded
+
+FORMAT_VERSION = 1
+PAGE = 5000
+
+log = logging.getLogger("snapshot")
+
+
+class SnapshotError(ValueError):
+    """Snapshot cannot be loaded into this node."""
+
+
+def _blob(obj):
+    import numpy as np
+    return np.frombuffer(json.dumps(obj, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+
+
+def _unblob(arr):
+    return json.loads(arr.tobytes().decode("utf-8"))
+
+
+def _collection():
+    return vector_store.persistent_store._collection
+
+
+def export_snapshot(path: Path) -> dict:
+    """Write the persistent collection to *path*; return the manifest."""
+    import numpy as np
+
+    coll = _collection()
+    ids, docs, metas, vecs = [], [], [], []
+    for got in vector_store.scan(["embeddings", "documents", "metadatas"], PAGE):
+        ids += got["ids"]
+        docs += got["documents"]
+        metas += [m or {} for m in got["metadatas"]]
+        if got["ids"]:
+            vecs.append(np.asarray(got["embeddings"], dtype=np.float32))
+
+    matrix = np.vstack(vecs) if vecs else np.zeros((0, 0), dtype=np.float32)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "embed_model": EMBED_MODEL,
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "count": len(ids),
+        "collection": "persistent_docs",
+        "space": (coll.metadata or {}).get("hnsw:space", "l2"),
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        manifest=_blob(manifest),
+        ids=_blob(ids),
+        documents=_blob(docs),
+        metadatas=_blob(metas),
+        vectors=matrix,
+    )
+    tmp.replace(path)
+    log.info("📦  exported %d chunks (%d-dim, %s) to %s", len(ids), manifest["dim"], EMBED_MODEL, path)
+    return manifest
+
+
+def read_manifest(path: Path) -> dict:
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as z:
+        return _unblob(z["manifest"])
+
+
+def _existing_dim(coll) -> Optional[int]:
+    got = coll.get(include=["embeddings"], limit=1)
+    embs = got.get("embeddings")
+    if embs is None or len(embs) == 0:
+        return None
+    return len(embs[0])
+
+
+def import_snapshot(path: Path, *, replace: bool = False, if_empty: bool = False) -> int:
+    """Bulk-load *path* into the persistent collection; return rows loaded.
+
+    Refuses to load into a non-empty collection unless *replace* (which
+    upserts over it); with *if_empty* a non-empty collection is a no-op.
+    """
+    import numpy as np
+
+    coll = _collection()
+    existing = vector_store.count()
+    if existing and if_empty:
+        log.info("↪︎  collection already holds %d chunks – snapshot not loaded", existing)
+        return 0
+
+    with np.load(path, allow_pickle=False) as z:
+        manifest = _unblob(z["manifest"])
+        if manifest.get("format") != FORMAT_VERSION:
+            raise SnapshotError(f"unsupported snapshot format {manifest.get('format')!r}")
+        if manifest.get("embed_model") != EMBED_MODEL:
+            raise SnapshotError(
+                f"snapshot was embedded with {manifest.get('embed_model')!r}, "
+                f"this node uses EMBED_MODEL={EMBED_MODEL!r}"
+            )
+        vectors = z["vectors"]
+        if vectors.size and vectors.shape[1] != manifest["dim"]:
+            raise SnapshotError("vector matrix does not match the manifest dimension")
+        if existing:
+            dim = _existing_dim(coll)
+            if not replace:
+                raise SnapshotError(f"collection is not empty ({existing} chunks); use --replace")
+            if dim is not None and dim != manifest["dim"]:
+                raise SnapshotError(f"collection holds {dim}-dim vectors, snapshot has {manifest['dim']}")
+        ids = _unblob(z["ids"])
+        docs = _unblob(z["documents"])
+        metas = _unblob(z["metadatas"])
+
+    if not (len(ids) == len(docs) == len(metas) == len(vectors)):
+        raise SnapshotError("snapshot columns have different lengths")
+
+    batch = PAGE
+    for i in range(0, len(ids), batch):
+        write_embedded(ids[i:i + batch], docs[i:i + batch], metas[i:i + batch], vectors[i:i + batch].tolist())
+    log.info("📥  imported %d chunks from %s", len(ids), path)
+    return len(ids)
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    ap = argparse.ArgumentParser(prog="python -m app.snapshot", description=__doc__.split("\n\n")[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="write the persistent collection to a snapshot")
+    ex.add_argument("path", type=Path)
+    im = sub.add_parser("import", help="bulk-load a snapshot without re-embedding")
+    im.add_argument("path", type=Path)
+    im.add_argument("--replace", action="store_true", help="upsert into a non-empty collection")
+    im.add_argument("--if-empty", action="store_true", help="do nothing if the collection has data")
+    info = sub.add_parser("info", help="print a snapshot's manifest")
+    info.add_argument("path", type=Path)
+    args = ap.parse_args(argv)
+
+    try:
+        if args.cmd == "export":
+            export_snapshot(args.path)
+        elif args.cmd == "import":
+            if import_snapshot(args.path, replace=args.replace, if_empty=args.if_empty):
+                flat_index.publish_locked()  # running workers switch to it
+        else:
+            print(json.dumps(read_manifest(args.path), indent=2))
+    except SnapshotError as exc:
+        log.error("❌  %s", exc)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,245 @@
+"""
+Offline speech-to-text with Whisper.
+
+Long recordings are cut at the quietest points into segments of at most
+``WHISPER_SEGMENT_MAX_S`` seconds and transcribed in parallel across
+``WHISPER_REPLICAS`` preloaded model copies; segment timestamps are shifted
+back onto the original timeline and the real-time factor (processing time /
+audio duration) is reported with every transcript.
+"""
+
 from __future__ import annotations
+import logging
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from app import metrics
+from app.metrics import record_cache, span
+
+# imported on first use: whisper pulls in torch, which dominates worker start-up
+whisper = None
+_IMPORT_ERROR: Optional[BaseException] = None
+
+SAMPLE_RATE = 16000  # whisper.load_audio always resamples to 16 kHz mono
 
-try:
-    import whisper
-except Exception as exc:  # pragma: no cover - library may be missing during tests
-    whisper = None
-    _IMPORT_ERROR = exc
-else:
-    _IMPORT_ERROR = None
+WHISPER_REPLICAS      = max(1, int(os.getenv("WHISPER_REPLICAS", "1")))
+WHISPER_PRELOAD       = os.getenv("WHISPER_PRELOAD", "0") == "1"
+WHISPER_SEGMENT_MAX_S = float(os.getenv("WHISPER_SEGMENT_MAX_S", "30"))
+WHISPER_SEGMENT_MIN_S = float(os.getenv("WHISPER_SEGMENT_MIN_S", "10"))
 
-_MODEL = None
+log = logging.getLogger("speech")
+
+RTF = metrics.histogram(
+    "offlinellm_speech_real_time_factor",
+    "Transcription time divided by audio duration.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0),
+)
+AUDIO_SECONDS = metrics.counter(
+    "offlinellm_speech_audio_seconds_total", "Seconds of audio transcribed."
+)
+
+
+def _whisper():
+    """The ``whisper`` module, imported on first call (None if missing)."""
+    global whisper, _IMPORT_ERROR
+    if whisper is None and _IMPORT_ERROR is None:
+        try:
+            import whisper as mod
+        except Exception as exc:  # pragma: no cover - library may be missing during tests
+            _IMPORT_ERROR = exc
+        else:
+            whisper = mod
+    return whisper
 
 
 def _load_model() -> "whisper.Whisper":  # type: ignore[name-defined]
-    global _MODEL
-    if _MODEL is None:
-        if whisper is None:
-            raise RuntimeError(f"whisper library unavailable: {_IMPORT_ERROR}")
-        name = os.getenv("WHISPER_MODEL", "base")
-        _MODEL = whisper.load_model(name)
-    return _MODEL
+    """Load one Whisper model instance."""
+    if _whisper() is None:
+        raise RuntimeError(f"whisper library unavailable: {_IMPORT_ERROR}")
+    name = os.getenv("WHISPER_MODEL", "base")
+    with span("speech", "load_model"):
+        return whisper.load_model(name)
+
+
+class _ReplicaPool:
+    """Up to *size* model copies, handed out one per concurrent segment."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._idle: "queue.Queue" = queue.Queue()
+        self._loaded = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> int:
+        return self._loaded
+
+    def _grow(self) -> bool:
+        with self._lock:
+            if self._loaded >= self.size:
+                return False
+            self._loaded += 1
+        try:
+            self._idle.put(_load_model())
+        except BaseException:
+            with self._lock:
+                self._loaded -= 1
+            raise
+        return True
+
+    def preload(self, n: Optional[int] = None) -> int:
+        """Load replicas up front so the first request does not pay for it."""
+        target = min(self.size, n or self.size)
+        while self._loaded < target and self._grow():
+            pass
+        return self._loaded
+
+    @contextmanager
+    def borrow(self) -> Iterator[object]:
+        try:
+            model = self._idle.get_nowait()
+            record_cache("whisper_model", True)
+        except queue.Empty:
+            record_cache("whisper_model", False)
+            self._grow()
+            model = self._idle.get()
+        try:
+            yield model
+        finally:
+            self._idle.put(model)
+
+
+_POOL = _ReplicaPool(WHISPER_REPLICAS)
+
+
+def preload_models(n: Optional[int] = None) -> int:
+    """Load *n* (default ``WHISPER_REPLICAS``) model replicas; return count."""
+    return _POOL.preload(n)
+
+
+@dataclass
+class Transcript:
+    text: str
+    segments: List[dict] = field(default_factory=list)
+    duration_s: Optional[float] = None
+    elapsed_s: float = 0.0
+
+    @property
+    def rtf(self) -> Optional[float]:
+        if not self.duration_s:
+            return None
+        return self.elapsed_s / self.duration_s
+
+
+def split_on_silence(
+    audio,
+    sample_rate: int = SAMPLE_RATE,
+    max_s: float = WHISPER_SEGMENT_MAX_S,
+    min_s: float = WHISPER_SEGMENT_MIN_S,
+    frame_s: float = 0.03,
+) -> List[Tuple[int, int]]:
+    """Return ``(start, end)`` sample ranges no longer than *max_s*.
+
+    Each cut is placed at the quietest 30 ms frame between *min_s* and
+    *max_s* after the previous cut, so words are not chopped in half.
+    """
+    import numpy as np
+
+    total = len(audio)
+    max_len, min_len = int(max_s * sample_rate), int(min_s * sample_rate)
+    if total <= max_len:
+        return [(0, total)]
+
+    frame = max(1, int(frame_s * sample_rate))
+    n = total // frame
+    frames = np.asarray(audio[: n * frame], dtype=np.float32).reshape(n, frame)
+    energy = (frames ** 2).mean(axis=1)
+
+    cuts: List[Tuple[int, int]] = []
+    start = 0
+    while total - start > max_len:
+        lo = (start + min_len) // frame
+        hi = min(n, (start + max_len) // frame)
+        if hi <= lo:
+            cut = start + max_len
+        else:
+            # latest of equally quiet frames: no pause at all means cut at max_s
+            quiet = hi - 1 - int(np.argmin(energy[lo:hi][::-1]))
+            cut = quiet * frame + frame // 2
+        cuts.append((start, cut))
+        start = cut
+    cuts.append((start, total))
+    return cuts
+
+
+def _transcribe_segment(audio, offset_s: float) -> Tuple[str, List[dict]]:
+    with _POOL.borrow() as model:
+        result = model.transcribe(audio)
+    segs = [
+        {**s, "start": s.get("start", 0.0) + offset_s, "end": s.get("end", 0.0) + offset_s}
+        for s in result.get("segments", [])
+    ]
+    return result.get("text", "").strip(), segs
+
+
+def transcribe(path: str | Path) -> Transcript:
+    """Transcribe *path*, splitting long audio across model replicas."""
+    start = time.perf_counter()
+    load_audio = getattr(_whisper(), "load_audio", None)
+
+    if load_audio is None:
+        # whole-file path (no ffmpeg decoding helper available)
+        with _POOL.borrow() as model, span("speech", "transcribe"):
+            result = model.transcribe(str(path))
+        segs = result.get("segments", [])
+        duration = segs[-1].get("end") if segs else None
+        out = Transcript(result.get("text", "").strip(), segs, duration)
+    else:
+        with span("speech", "decode"):
+            audio = load_audio(str(path))
+        duration = len(audio) / SAMPLE_RATE
+        ranges = split_on_silence(audio) if _POOL.size > 1 else [(0, len(audio))]
+        with span("speech", "transcribe"):
+            if len(ranges) == 1:
+                parts = [_transcribe_segment(audio, 0.0)]
+            else:
+                with ThreadPoolExecutor(max_workers=_POOL.size) as ex:
+                    parts = list(ex.map(
+                        lambda r: _transcribe_segment(audio[r[0]:r[1]], r[0] / SAMPLE_RATE),
+                        ranges,
+                    ))
+        text = " ".join(t for t, _ in parts if t)
+        out = Transcript(text, [s for _, ss in parts for s in ss], duration)
+
+    out.elapsed_s = time.perf_counter() - start
+    if out.duration_s:
+        RTF.observe(out.rtf)
+        AUDIO_SECONDS.inc(out.duration_s)
+        log.info(
+            "transcribed %.1fs of audio in %.1fs (RTF %.2f, %d replicas)",
+            out.duration_s, out.elapsed_s, out.rtf, _POOL.loaded,
+        )
+    return out
+
+
+def transcribe_pcm16(pcm: bytes) -> str:
+    """Transcribe raw 16 kHz mono PCM16 in host byte order (live dictation)."""
+    import numpy as np
+
+    audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    with _POOL.borrow() as model, span("speech", "transcribe_stream"):
+        # each window is independent; conditioning on earlier text only adds drift
+        result = model.transcribe(audio, condition_on_previous_text=False)
+    return result.get("text", "").strip()
 
 
 def transcribe_audio(path: str | Path) -> str:
     """Return transcribed text from audio file."""
-    model = _load_model()
-    result = model.transcribe(str(path))
-    text = result.get("text", "").strip()
-    return text
+    return transcribe(path).text
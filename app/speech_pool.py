@@ -0,0 +1,246 @@
+# app/speech_pool.py
+
+"""
+Bounded speech-to-text worker pool
+──────────────────────────────────
+• SPEECH_WORKERS processes, each holding its own Whisper model and limited to
+  SPEECH_THREADS torch threads so transcription cannot starve the API or the
+  cross-encoder of CPU
+• at most SPEECH_QUEUE_MAX uploads waiting or running; beyond that callers
+  get ``SpeechBusy`` (→ HTTP 429 + Retry-After)
+• results cached by Whisper model + SHA-256 of the audio bytes, in memory
+  and as JSON under SPEECH_CACHE_DIR, so a re-submitted recording returns instantly – also
+  across restarts and Uvicorn workers
+• identical uploads arriving together share one transcription
+
+``SPEECH_WORKERS=0`` transcribes in a thread of the API process instead
+(handy on Windows dev boxes and in tests).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from app import metrics
+
+SPEECH_WORKERS    = max(0, int(os.getenv("SPEECH_WORKERS", "1")))
+SPEECH_THREADS    = max(1, int(os.getenv("SPEECH_THREADS", "2")))
+SPEECH_QUEUE_MAX  = max(1, int(os.getenv("SPEECH_QUEUE_MAX", "8")))
+SPEECH_CACHE_DIR  = Path(os.getenv("SPEECH_CACHE_DIR", "data/speech_cache"))
+SPEECH_CACHE_SIZE = int(os.getenv("SPEECH_CACHE_SIZE", "256"))
+SPEECH_CACHE_MAX_FILES = int(os.getenv("SPEECH_CACHE_MAX_FILES", "2000"))
+# same default as app.speech; part of the cache key so a model change re-transcribes
+WHISPER_MODEL     = os.getenv("WHISPER_MODEL", "base")
+
+log = logging.getLogger("speech_pool")
+
+REJECTED = metrics.counter(
+    "offlinellm_speech_rejected_total",
+    "Speech-to-text uploads rejected because the queue was full.",
+)
+
+
+class SpeechBusy(Exception):
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"speech-to-text queue is full; retry in {self.retry_after}s")
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Worker-process side
+# ────────────────────────────────────────────────────────────────────────────────
+def _init_worker(threads: int) -> None:
+    """Pin torch to *threads* and load the model before the first job."""
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:  # pragma: no cover - torch missing in dev envs
+        pass
+    from app import speech
+    try:
+        speech.preload_models()
+    except Exception as exc:  # surface the error on the first job instead
+        logging.getLogger("speech_pool").warning("whisper preload failed: %s", exc)
+
+
+def _work(path: str) -> dict:
+    """Transcribe one file; returns a picklable dict."""
+    from app import speech
+    out = speech.transcribe(path)
+    return {
+        "text": out.text,
+        "segments": out.segments,
+        "duration_s": out.duration_s,
+        "elapsed_s": out.elapsed_s,
+    }
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# API-process side
+# ────────────────────────────────────────────────────────────────────────────────
+class _ResultCache:
+    """In-memory LRU in front of one JSON file per (model, audio digest) key."""
+
+    def __init__(self, directory: Path, size: int, max_files: int) -> None:
+        self.dir = directory
+        self.size = size
+        self.max_files = max_files
+        self._mem: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.json"
+
+    def get(self, digest: str) -> Optional[dict]:
+        with self._lock:
+            hit = self._mem.get(digest)
+            if hit is not None:
+                self._mem.move_to_end(digest)
+                return hit
+        try:
+            hit = json.loads(self._path(digest).read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+        self._remember(digest, hit)
+        return hit
+
+    def _remember(self, digest: str, result: dict) -> None:
+        with self._lock:
+            self._mem[digest] = result
+            self._mem.move_to_end(digest)
+            while len(self._mem) > self.size:
+                self._mem.popitem(last=False)
+
+    def put(self, digest: str, result: dict) -> None:
+        self._remember(digest, result)
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._path(digest).with_suffix(".tmp")
+            tmp.write_text(json.dumps(result), "utf-8")
+            os.replace(tmp, self._path(digest))
+            self._prune()
+        except OSError as exc:
+            log.warning("could not persist transcript %s: %s", digest[:12], exc)
+
+    def _prune(self) -> None:
+        files = list(self.dir.glob("*.json"))
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for p in files[: len(files) - self.max_files]:
+            p.unlink(missing_ok=True)
+
+
+class TranscriptionPool:
+    def __init__(
+        self,
+        workers: int = SPEECH_WORKERS,
+        max_queue: int = SPEECH_QUEUE_MAX,
+        cache_dir: Path = SPEECH_CACHE_DIR,
+        threads: int = SPEECH_THREADS,
+        model: str = WHISPER_MODEL,
+    ) -> None:
+        self.workers = workers
+        self.model = model
+        self.max_queue = max_queue
+        self.threads = threads
+        self.cache = _ResultCache(cache_dir, SPEECH_CACHE_SIZE, SPEECH_CACHE_MAX_FILES)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._running: Dict[str, asyncio.Future] = {}
+        self._service_s = 30.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs torch / uvicorn threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.threads,),
+            )
+        return self._executor
+
+    def start(self) -> None:
+        """Spawn the worker processes now (they load their models right away)."""
+        if self.workers:
+            pool = self._pool()
+            for _ in range(self.workers):
+                pool.submit(int)  # forces the worker processes to start
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run(self, path: Path) -> dict:
+        if self.workers:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool(), _work, str(path))
+        return await asyncio.to_thread(_work, str(path))
+
+    def _key(self, digest: str) -> str:
+        model = "".join(c if c.isalnum() or c in "-." else "_" for c in self.model)
+        return f"{model}_{digest}"
+
+    def _finished(self, fut: asyncio.Future, key: str, path: Path, start: float) -> None:
+        # runs when the job ends, even if every caller has gone away meanwhile
+        path.unlink(missing_ok=True)
+        self._pending -= 1
+        metrics.QUEUE_DEPTH.set(self._pending, queue="speech")
+        if self._running.get(key) is fut:
+            del self._running[key]
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        self._service_s = 0.8 * self._service_s + 0.2 * (time.perf_counter() - start)
+        self.cache.put(key, fut.result())
+
+    async def transcribe(self, path: Path, digest: str) -> dict:
+        """Return the transcript for *path*, whose bytes hash to *digest*.
+
+        Takes ownership of *path*: the file is deleted once it is no longer
+        needed, which may be after the caller has gone away.  A job keeps
+        its queue slot and still fills the cache if its callers leave.
+        """
+        key = self._key(digest)
+        cached = self.cache.get(key)
+        metrics.record_cache("speech_transcript", cached is not None)
+        if cached is not None:
+            path.unlink(missing_ok=True)
+            return cached
+
+        running = self._running.get(key)
+        if running is not None:
+            path.unlink(missing_ok=True)
+            return await asyncio.shield(running)
+
+        if self._pending >= self.max_queue:
+            path.unlink(missing_ok=True)
+            REJECTED.inc()
+            raise SpeechBusy(self._service_s * self._pending / max(1, self.workers))
+
+        self._pending += 1
+        metrics.QUEUE_DEPTH.set(self._pending, queue="speech")
+        start = time.perf_counter()
+        fut = asyncio.ensure_future(self._run(path))
+        self._running[key] = fut
+        fut.add_done_callback(lambda f: self._finished(f, key, path, start))
+        return await asyncio.shield(fut)
+
+
+pool = TranscriptionPool()
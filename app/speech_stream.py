@@ -0,0 +1,156 @@
+# app/speech_stream.py
+
+"""
+Incremental speech-to-text for live dictation
+─────────────────────────────────────────────
+``StreamingTranscriber`` is fed 16 kHz mono PCM16 frames as they are
+recorded.  It keeps the current utterance in a buffer and
+
+• every ``partial_every_s`` of new speech, transcribes the last
+  ``window_s`` seconds and emits a *partial* event (text may still change)
+• once the speaker has been quiet for ``silence_s`` – or the utterance
+  reaches ``max_utterance_s`` – transcribes the whole utterance, emits a
+  *final* event with timestamps and starts a new one
+
+so final text arrives within roughly ``silence_s`` plus one transcription of
+a short utterance after the speaker stops, instead of after the recording.
+The transcription function is injected; the API passes
+``speech.transcribe_pcm16``.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import sys
+from array import array
+from typing import Callable, List
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+
+STREAM_SILENCE_S       = float(os.getenv("SPEECH_STREAM_SILENCE_S", "0.7"))
+STREAM_PARTIAL_EVERY_S = float(os.getenv("SPEECH_STREAM_PARTIAL_S", "1.0"))
+STREAM_WINDOW_S        = float(os.getenv("SPEECH_STREAM_WINDOW_S", "8"))
+STREAM_MAX_UTTERANCE_S = float(os.getenv("SPEECH_STREAM_MAX_UTTERANCE_S", "20"))
+STREAM_SILENCE_RMS     = float(os.getenv("SPEECH_STREAM_SILENCE_RMS", "500"))
+
+Event = dict
+
+
+def frame_rms(samples: array) -> float:
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class StreamingTranscriber:
+    def __init__(
+        self,
+        transcribe: Callable[[bytes], str],
+        *,
+        sample_rate: int = SAMPLE_RATE,
+        silence_s: float = STREAM_SILENCE_S,
+        partial_every_s: float = STREAM_PARTIAL_EVERY_S,
+        window_s: float = STREAM_WINDOW_S,
+        max_utterance_s: float = STREAM_MAX_UTTERANCE_S,
+        silence_rms: float = STREAM_SILENCE_RMS,
+        frame_s: float = 0.03,
+    ) -> None:
+        self.transcribe = transcribe
+        self.sr = sample_rate
+        self.silence_len = int(silence_s * sample_rate)
+        self.partial_every = int(partial_every_s * sample_rate)
+        self.window = int(window_s * sample_rate)
+        self.max_len = int(max_utterance_s * sample_rate)
+        self.silence_rms = silence_rms
+        self.frame = max(1, int(frame_s * sample_rate))
+
+        self.buf = array("h")          # current utterance
+        self.offset = 0                # global sample index of buf[0]
+        self.trailing_silence = 0      # samples of silence at the end of buf
+        self.has_speech = False
+        self.since_partial = 0
+        self._carry = b""              # odd byte left over from the last frame
+        self._unscanned = 0            # samples at the end of buf not yet framed
+
+    # ------------------------------------------------------------------
+    def _scan(self) -> None:
+        """Update speech / trailing-silence state for newly buffered frames."""
+        start = len(self.buf) - self._unscanned
+        while self._unscanned >= self.frame:
+            chunk = self.buf[start:start + self.frame]
+            if frame_rms(chunk) >= self.silence_rms:
+                self.has_speech = True
+                self.trailing_silence = 0
+            else:
+                self.trailing_silence += self.frame
+            start += self.frame
+            self._unscanned -= self.frame
+
+    def _emit_final(self) -> List[Event]:
+        end = len(self.buf)
+        if self.has_speech:
+            # drop most of the trailing silence; it only slows Whisper down
+            end = max(1, end - max(0, self.trailing_silence - self.frame * 5))
+        events: List[Event] = []
+        if self.has_speech:
+            text = self.transcribe(self.buf[:end].tobytes()).strip()
+            if text:
+                events.append({
+                    "type": "final",
+                    "text": text,
+                    "start": self.offset / self.sr,
+                    "end": (self.offset + end) / self.sr,
+                })
+        self.offset += len(self.buf)
+        self.buf = array("h")
+        self.trailing_silence = 0
+        self.has_speech = False
+        self.since_partial = 0
+        self._unscanned = 0
+        return events
+
+    def feed(self, pcm: bytes) -> List[Event]:
+        """Add PCM16LE audio; return partial / final events ready to send."""
+        data = self._carry + pcm
+        usable = len(data) - len(data) % BYTES_PER_SAMPLE
+        self._carry = data[usable:]
+        new = array("h")
+        new.frombytes(data[:usable])
+        if sys.byteorder == "big":
+            new.byteswap()
+        self.buf.extend(new)
+        self._unscanned += len(new)
+        self.since_partial += len(new)
+        self._scan()
+
+        if not self.has_speech:
+            # nothing said yet: keep only a short lead-in, not minutes of silence
+            excess = len(self.buf) - self.silence_len
+            if excess > 0:
+                drop = excess - excess % self.frame
+                self.buf = self.buf[drop:]
+                self.offset += drop
+            self.since_partial = 0
+            return []
+
+        if self.trailing_silence >= self.silence_len or len(self.buf) >= self.max_len:
+            return self._emit_final()
+
+        if self.since_partial >= self.partial_every:
+            self.since_partial = 0
+            tail = self.buf[-self.window:]
+            text = self.transcribe(tail.tobytes()).strip()
+            if text:
+                return [{
+                    "type": "partial",
+                    "text": text,
+                    "start": (self.offset + len(self.buf) - len(tail)) / self.sr,
+                }]
+        return []
+
+    def finish(self) -> List[Event]:
+        """Flush whatever is left when the client stops recording."""
+        self._scan()
+        return self._emit_final()
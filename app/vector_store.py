@@ -3,24 +3,44 @@
 """
 Vector-store abstraction layer
 ──────────────────────────────
+• EMBEDDINGS               – Ollama or in-process embedder (EMBED_BACKEND)
 • persistent_store         – embeddings for PDFs in  data/persist/
+  (both are created on first access, so importing this module opens nothing;
+  ``warm()`` builds them ahead of the first request)
+• shard_store(name)        – one shard of the permanent KB (app.shards);
+                             ``persistent_store`` is the default shard
 • new_session_store(id)    – Chroma handle dedicated to ONE chat session
 • purge_session(id)        – drop the collection + files for that session
+• close_store(store)       – release a session handle's cached Chroma system
+• kb_version()             – bumped whenever this process changes the permanent KB
+• search_with_vectors()    – like similarity_search, but also returns the stored
+                             embeddings so the reranker can prefilter for free
+• write_embedded(...)      – batched insert of pre-computed embeddings; all
+                             writers in the process share one lock
+• delete_source(src)       – delete by chunk id via a per-source id sidecar
+                             (falls back to a metadata scan for old data)
 """
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Set
 
+import hashlib
+import json
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-import chromadb
-from chromadb.config import Settings
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+from app import shards
+
+if TYPE_CHECKING:  # chromadb / langchain_chroma are imported on first use
+    from langchain_chroma import Chroma
+
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Config ─ pick up dirs & Ollama URL from env if the defaults are wrong.
@@ -31,58 +51,355 @@ PERSIST_PATH = Path(getenv("PERSIST_CHROMA_DIR", "data/chroma_persist"))
 SESSIONS_ROOT = Path(getenv("SESSION_CHROMA_DIR", "data/chroma_sessions"))
 
 OLLAMA_URL = getenv("OLLAMA_BASE_URL", "http://ollama:11434")
-EMBEDDINGS = OllamaEmbeddings(model="nomic-embed-text", base_url=OLLAMA_URL)
+# ollama | sentence-transformers | onnx (in-process, see app.embedding)
+EMBED_BACKEND = getenv("EMBED_BACKEND", "ollama")
+# recorded in KB snapshots; a snapshot only loads on a node using the same model
+EMBED_MODEL = getenv(
+    "EMBED_MODEL",
+    "nomic-embed-text" if EMBED_BACKEND == "ollama"
+    else f"{EMBED_BACKEND}:{Path(getenv('EMBED_MODEL_DIR', '/app/models/embedder')).name}",
+)
 
-PERSIST_PATH.mkdir(parents=True, exist_ok=True)
-SESSIONS_ROOT.mkdir(parents=True, exist_ok=True)
 
-# ────────────────────────────────────────────────────────────────────────────────
-# 1) 𝙿𝚎𝚛𝚖𝚊𝚗𝚎𝚗𝚝 𝚟𝚎𝚌𝚝𝚘𝚛 store  – indexed once at boot
-# ────────────────────────────────────────────────────────────────────────────────
-_persist_cli = chromadb.PersistentClient(
-    path=str(PERSIST_PATH),
-    settings=Settings(allow_reset=False, anonymized_telemetry=False),
-)
+def _make_embeddings():
+    """The configured embedding provider (anything with ``embed_documents`` /
+    ``embed_query``)."""
+    if EMBED_BACKEND == "ollama":
+        from langchain_community.embeddings import OllamaEmbeddings
 
-persistent_store: Chroma = Chroma(
-    client=_persist_cli,
-    collection_name="persistent_docs",
-    embedding_function=EMBEDDINGS,
-    persist_directory=str(PERSIST_PATH),
-)
+        return OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_URL)
+    from app.embedding import local_embeddings
 
+    return local_embeddings(EMBED_BACKEND)
+
+
+def _open_chroma(path: Path, collection: str, *, allow_reset: bool, persist: bool = False) -> Chroma:
+    import chromadb
+    from chromadb.config import Settings
+    from langchain_chroma import Chroma
 
-def new_persistent_store() -> Chroma:
-    """Return a fresh Chroma handle for the persistent collection."""
     cli = chromadb.PersistentClient(
-        path=str(PERSIST_PATH),
-        settings=Settings(allow_reset=False, anonymized_telemetry=False),
+        path=str(path),
+        settings=Settings(allow_reset=allow_reset, anonymized_telemetry=False),
     )
+    kwargs = {"persist_directory": str(path)} if persist else {}
     return Chroma(
         client=cli,
-        collection_name="persistent_docs",
-        embedding_function=EMBEDDINGS,
-        persist_directory=str(PERSIST_PATH),
+        collection_name=collection,
+        embedding_function=get_embeddings(),
+        **kwargs,
     )
 
+# source → chunk ids, one small JSON file per source, so deleting a document
+# is a delete-by-id instead of two metadata scans of the whole collection
+SOURCE_IDS_DIR = PERSIST_PATH / "source_ids"
+
+# ────────────────────────────────────────────────────────────────────────────────
+# 1) 𝙿𝚎𝚛𝚖𝚊𝚗𝚎𝚗𝚝 𝚟𝚎𝚌𝚝𝚘𝚛 store  – indexed once at boot
+# ────────────────────────────────────────────────────────────────────────────────
+# ``EMBEDDINGS`` and ``persistent_store`` are module attributes created on first
+# access (module ``__getattr__``).  Once set – or monkeypatched – the plain
+# global wins, so the getters below simply return it.
+_LAZY_LOCK = threading.Lock()
+
+
+def get_embeddings():
+    emb = globals().get("EMBEDDINGS")
+    if emb is None:
+        with _LAZY_LOCK:
+            emb = globals().get("EMBEDDINGS")
+            if emb is None:
+                emb = globals()["EMBEDDINGS"] = _make_embeddings()
+    return emb
+
+
+def get_persistent_store() -> Chroma:
+    store = globals().get("persistent_store")
+    if store is None:
+        get_embeddings()  # outside _LAZY_LOCK: it is not re-entrant
+        with _LAZY_LOCK:
+            store = globals().get("persistent_store")
+            if store is None:
+                PERSIST_PATH.mkdir(parents=True, exist_ok=True)
+                store = _open_chroma(PERSIST_PATH, "persistent_docs", allow_reset=False, persist=True)
+                globals()["persistent_store"] = store
+    return store
+
+
+def __getattr__(name: str):
+    if name == "EMBEDDINGS":
+        return get_embeddings()
+    if name == "persistent_store":
+        return get_persistent_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm() -> None:
+    """Import chromadb, open the permanent KB and load an in-process embedder
+    now rather than on the first request (run in a thread at start-up)."""
+    from app.embedding import LocalEmbeddings
+
+    emb = get_embeddings()
+    if isinstance(emb, LocalEmbeddings):
+        emb.model
+    get_persistent_store()
+
+
+# Monotonic counter of permanent-KB writes made by this process.  Used in
+# request-coalescing keys so a question asked after an upload never joins a
+# call that started against the old contents.
+_KB_VERSION = 0
+
+
+def kb_version() -> int:
+    return _KB_VERSION
+
+
+def bump_kb_version() -> None:
+    global _KB_VERSION
+    _KB_VERSION += 1
+
+
+def new_persistent_store() -> Chroma:
+    """Return a fresh Chroma handle for the persistent collection."""
+    PERSIST_PATH.mkdir(parents=True, exist_ok=True)
+    return _open_chroma(PERSIST_PATH, "persistent_docs", allow_reset=False, persist=True)
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Shards – extra collections next to persistent_docs (see app.shards)
+# ────────────────────────────────────────────────────────────────────────────────
+_SHARD_STORES: Dict[str, Chroma] = {}
+_FANOUT: Optional[ThreadPoolExecutor] = None
+
+
+def shard_store(shard: str) -> Chroma:
+    if shard == shards.DEFAULT_SHARD:
+        return get_persistent_store()
+    store = _SHARD_STORES.get(shard)
+    if store is None:
+        get_embeddings()
+        with _LAZY_LOCK:
+            store = _SHARD_STORES.get(shard)
+            if store is None:
+                PERSIST_PATH.mkdir(parents=True, exist_ok=True)
+                store = _open_chroma(PERSIST_PATH, shards.collection_name(shard), allow_reset=False, persist=True)
+                _SHARD_STORES[shard] = store
+    return store
+
+
+def shard_names() -> List[str]:
+    """Configured shards plus any shard collection already on disk."""
+    names = shards.configured()
+    try:
+        for c in get_persistent_store()._client.list_collections():
+            shard = shards.shard_of_collection(getattr(c, "name", c))
+            if shard and shard not in names:
+                names.append(shard)
+    except Exception:  # stub stores in tests, or an older Chroma client
+        pass
+    return names
+
+
+def count() -> int:
+    """Chunks in the permanent KB, over all shards."""
+    return sum(shard_store(s)._collection.count() for s in shard_names())
+
+
+def _shard_of_source(src: str) -> str:
+    """Where *src* was written (id sidecar), else where it would be routed."""
+    try:
+        return json.loads(_ids_path(src).read_text("utf-8")).get("shard") or shards.DEFAULT_SHARD
+    except (OSError, ValueError):
+        return shards.shard_for(src)
+
+
+def indexed_sources() -> Set[str]:
+    """Every ``source`` / ``source_file`` in the permanent KB, read in one pass."""
+    out: Set[str] = set()
+    for shard in shard_names():
+        for m in shard_store(shard).get(include=["metadatas"])["metadatas"]:
+            m = m or {}
+            out.update(v for v in (m.get("source"), m.get("source_file")) if v)
+    return out
+
+
+def _scan_shards(include: Sequence[str], page: int) -> Iterator[tuple]:
+    for shard in shard_names():
+        coll = shard_store(shard)._collection
+        offset = 0
+        while True:
+            got = coll.get(include=list(include), limit=page, offset=offset)
+            yield shard, got
+            if len(got.get("ids") or []) < page:
+                break
+            offset += page
+
+
+def scan(include: Sequence[str], page: int = 5000) -> Iterator[dict]:
+    """Read the whole permanent KB, shard by shard and page by page
+    (``collection.get`` results)."""
+    for _shard, got in _scan_shards(include, page):
+        yield got
+
+
+def source_indexed_at(src: str) -> Optional[str]:
+    """``indexed_at`` of one stored chunk of *src* (ISO time), or None."""
+    got = shard_store(_shard_of_source(src)).get(where={"source": src}, limit=1, include=["metadatas"])
+    metas = got.get("metadatas") or []
+    return (metas[0] or {}).get("indexed_at") if metas else None
+
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Source → chunk-id sidecar
+# ────────────────────────────────────────────────────────────────────────────────
+def _ids_path(src: str) -> Path:
+    return SOURCE_IDS_DIR / f"{hashlib.sha1(src.encode('utf-8')).hexdigest()}.json"
+
+
+def source_ids(src: str) -> Optional[List[str]]:
+    """Chunk ids recorded for *src*, or None if it predates the sidecar."""
+    try:
+        return json.loads(_ids_path(src).read_text("utf-8"))["ids"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _save_ids(src: str, ids: Iterable[str], shard: str = shards.DEFAULT_SHARD) -> None:
+    SOURCE_IDS_DIR.mkdir(parents=True, exist_ok=True)
+    path = _ids_path(src)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps({"source": src, "shard": shard, "ids": sorted(set(ids))}), "utf-8")
+    os.replace(tmp, path)
+
+
+def _source_of(meta: Optional[dict]) -> Optional[str]:
+    return (meta or {}).get("source") or (meta or {}).get("source_file")
+
+
+def _record_ids(ids: Sequence[str], metadatas: Sequence[dict], shard: str = shards.DEFAULT_SHARD) -> None:
+    by_source: Dict[str, Set[str]] = {}
+    for cid, m in zip(ids, metadatas):
+        src = _source_of(m)
+        if src:
+            by_source.setdefault(src, set()).add(cid)
+    for src, new in by_source.items():
+        try:
+            _save_ids(src, new | set(source_ids(src) or ()), shard)
+        except OSError as exc:
+            logging.getLogger("vector_store").warning("could not record ids for %s: %s", src, exc)
+
+
+def rebuild_source_ids(page: int = 5000) -> int:
+    """Rewrite the sidecar from the collections themselves; return #sources."""
+    by_source: Dict[str, Set[str]] = {}
+    shard_of: Dict[str, str] = {}
+    for shard, got in _scan_shards(["metadatas"], page):
+        for cid, m in zip(got.get("ids") or [], got.get("metadatas") or []):
+            src = _source_of(m)
+            if src:
+                by_source.setdefault(src, set()).add(cid)
+                shard_of[src] = shard
+    for old in SOURCE_IDS_DIR.glob("*.json") if SOURCE_IDS_DIR.exists() else ():
+        old.unlink(missing_ok=True)
+    for src, ids in by_source.items():
+        _save_ids(src, ids, shard_of[src])
+    return len(by_source)
+
+
+# Chroma keeps the collection in one SQLite file; concurrent writers only
+# fight over its lock, so every bulk write in this process goes through here.
+_WRITE_LOCK = threading.Lock()
+
+
+def write_embedded(
+    ids: List[str],
+    texts: List[str],
+    metadatas: List[dict],
+    embeddings: List[Sequence[float]],
+) -> None:
+    """Upsert already-embedded chunks into the permanent KB, each into the
+    shard its source routes to."""
+    clean = [{k: v for k, v in m.items() if v is not None} for m in metadatas]
+    by_shard: Dict[str, List[int]] = {}
+    for i, m in enumerate(clean):
+        src = _source_of(m)
+        by_shard.setdefault(shards.shard_for(src) if src else shards.DEFAULT_SHARD, []).append(i)
+    for shard, rows in by_shard.items():
+        with _WRITE_LOCK:
+            shard_store(shard)._collection.upsert(
+                ids=[ids[i] for i in rows],
+                documents=[texts[i] for i in rows],
+                metadatas=[clean[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows],
+            )
+        _record_ids([ids[i] for i in rows], [clean[i] for i in rows], shard)
+    bump_kb_version()
+
+
+def prune_source(src: str, keep: Iterable[str]) -> int:
+    """Delete the chunks of *src* that are not in *keep*; return how many.
+
+    Chunk ids are stable per (file, position), so re-indexing a shorter
+    version overwrites the head and leaves the old tail behind.  Called
+    once the new chunks are written, so a failed re-index keeps the old
+    document searchable.
+    """
+    keep = set(keep)
+    stale = [cid for cid in source_ids(src) or () if cid not in keep]
+    if not stale:
+        return 0
+    shard = _shard_of_source(src)
+    with _WRITE_LOCK:
+        shard_store(shard).delete(ids=stale)
+        _save_ids(src, keep, shard)
+    bump_kb_version()
+    _hide_from_flat_index(ids=stale)
+    return len(stale)
+
 
 def persist_has_source(src: str) -> bool:
     """Return *True* if the given PDF is already indexed."""
-    metas = persistent_store.get()["metadatas"]
     return any(
-        m.get("source_file") == src or m.get("source") == src for m in metas
+        m.get("source_file") == src or m.get("source") == src
+        for shard in shard_names()
+        for m in shard_store(shard).get()["metadatas"]
     )
 
 
 def delete_source(src: str) -> None:
     """Remove all embeddings for *src* from the persistent store."""
     try:
-        persistent_store.delete(where={"source": src})
-        persistent_store.delete(where={"source_file": src})
+        ids = source_ids(src)
+        with _WRITE_LOCK:
+            if ids is not None:
+                if ids:
+                    shard_store(_shard_of_source(src)).delete(ids=ids)
+                _ids_path(src).unlink(missing_ok=True)
+            else:
+                for shard in shard_names():
+                    shard_store(shard).delete(where={"source": src})
+                    shard_store(shard).delete(where={"source_file": src})
+        bump_kb_version()
     except Exception:
         logging.getLogger("vector_store").warning(
             "failed to delete embeddings for %s", src
         )
+        return
+    if ids is not None:
+        _hide_from_flat_index(ids=ids)
+    else:
+        _hide_from_flat_index(sources=[src])
+
+
+def _hide_from_flat_index(**deleted) -> None:
+    """Deletes show in KB searches now, not at the next flat-index publish."""
+    from app.flat_index import note_deleted
+
+    try:
+        note_deleted(**deleted)
+    except OSError as exc:
+        logging.getLogger("vector_store").warning("could not mark deletes in flat index: %s", exc)
 
 
 # ────────────────────────────────────────────────────────────────────────────────
@@ -102,16 +419,7 @@ def new_session_store(session_id: str) -> Chroma:
     """
     path = _session_path(session_id)
     path.mkdir(parents=True, exist_ok=True)
-
-    cli = chromadb.PersistentClient(
-        path=str(path),
-        settings=Settings(allow_reset=True, anonymized_telemetry=False),
-    )
-    return Chroma(
-        client=cli,
-        collection_name=f"session_{session_id}",
-        embedding_function=EMBEDDINGS,
-    )
+    return _open_chroma(path, f"session_{session_id}", allow_reset=True)
 
 
 def purge_session_store(session_id: str) -> None:
@@ -123,6 +431,31 @@ def purge_session_store(session_id: str) -> None:
         shutil.rmtree(path, ignore_errors=True)
 
 
+def close_store(store: Chroma) -> None:
+    """Release the Chroma system (SQLite handle, segment caches) behind *store*.
+
+    Chroma caches one system per path for the life of the process, so
+    without this every session ever opened stays resident.
+    """
+    ident = getattr(getattr(store, "_client", None), "_identifier", None)
+    if ident is None:
+        return
+    try:
+        from chromadb.api.client import SharedSystemClient
+    except ImportError:
+        return
+    # spelled "_identifer_to_system" in chromadb 0.4.x
+    systems = getattr(SharedSystemClient, "_identifer_to_system", None)
+    if systems is None:
+        systems = getattr(SharedSystemClient, "_identifier_to_system", {})
+    system = systems.pop(ident, None)
+    if system is not None:
+        try:
+            system.stop()
+        except Exception:
+            logging.getLogger("vector_store").debug("could not stop Chroma system %s", ident)
+
+
 def get_session_store(session_id: str) -> Chroma:
     """
     Re-open an existing session store WITHOUT resetting its contents.
@@ -131,15 +464,7 @@ def get_session_store(session_id: str) -> Chroma:
     path = SESSIONS_ROOT / session_id
     if not path.exists():
         raise ValueError(f"Session '{session_id}' not found")
-    client = chromadb.PersistentClient(
-        path=str(path),
-        settings=Settings(allow_reset=False, anonymized_telemetry=False),
-    )
-    return Chroma(
-        client=client,
-        collection_name=f"session_{session_id}",
-        embedding_function=EMBEDDINGS,
-    )
+    return _open_chroma(path, f"session_{session_id}", allow_reset=False)
 
 
 
@@ -158,7 +483,11 @@ def add_documents(chunks: List[Document]) -> bool:
         return False
 
     try:
-        persistent_store.add_documents(chunks)
+        src = _source_of(chunks[0].metadata)
+        shard = shards.shard_for(src) if src else shards.DEFAULT_SHARD
+        ids = shard_store(shard).add_documents(chunks)
+        _record_ids(ids or [], [c.metadata for c in chunks], shard)
+        bump_kb_version()
         return True
     except ValueError as exc:
         source = chunks[0].metadata.get("source", "<unknown>")
@@ -170,8 +499,145 @@ def add_documents(chunks: List[Document]) -> bool:
 def similarity_search(query: str, k: int = 10, *, use_mmr: bool = False) -> List[Document]:
     """Query the permanent knowledge base."""
     if use_mmr:
-        return persistent_store.max_marginal_relevance_search(query, k=k)
-    return persistent_store.similarity_search(query, k=k)
-
+        return get_persistent_store().max_marginal_relevance_search(query, k=k)
+    return get_persistent_store().similarity_search(query, k=k)
+
+
+@dataclass
+class Hits:
+    """Retrieved documents plus the vectors Chroma already stored for them."""
+    docs: List[Document] = field(default_factory=list)
+    embeddings: List[Optional[Sequence[float]]] = field(default_factory=list)
+    query_embedding: Optional[Sequence[float]] = None
+    ids: List[Optional[str]] = field(default_factory=list)
+    distances: List[Optional[float]] = field(default_factory=list)
+
+
+def search_with_vectors(
+    query: str,
+    k: int = 10,
+    *,
+    use_mmr: bool = False,
+    store: Optional[Chroma] = None,
+    query_embedding: Optional[Sequence[float]] = None,
+    fetch_k: int = 20,
+    sources: Optional[Sequence[str]] = None,
+    shard_filter: Optional[Sequence[str]] = None,
+) -> Hits:
+    """Top-*k* documents from *store* (default: the permanent KB) with embeddings.
+
+    Pass *query_embedding* from an earlier call to search several stores with
+    a single embedding request.  The permanent KB is read from the shared
+    memory-mapped flat index when one is published (see app.flat_index);
+    otherwise its shards are queried in parallel and the hits merged by
+    distance.  *sources* (file names) and *shard_filter* restrict the KB
+    search to the shards – and, for sources, the documents – asked for.
+    """
+    qv = query_embedding if query_embedding is not None else get_embeddings().embed_query(query)
+    n = max(k, fetch_k) if use_mmr else k
+    if store is not None:
+        rows = _query(store, qv, n, None)
+    else:
+        if not sources and not shard_filter:
+            from app.flat_index import current
+
+            flat = current()
+            if flat is not None:
+                return _search_flat(flat, qv, k, use_mmr=use_mmr, fetch_k=fetch_k)
+        rows = _fan_out(_route(sources, shard_filter), qv, n, _where(sources))
+
+    texts = [r[0] for r in rows]
+    metas = [r[1] for r in rows]
+    ids = [r[2] for r in rows]
+    embs = [r[3] for r in rows]
+    dists = [r[4] for r in rows]
+
+    picked = _mmr(qv, embs, k) if use_mmr and len(texts) > k else range(len(texts))
+    return Hits(
+        [Document(page_content=texts[i], metadata=metas[i] or {}) for i in picked],
+        [embs[i] for i in picked],
+        qv,
+        [ids[i] for i in picked],
+        [dists[i] for i in picked],
+    )
 
 
+def _route(sources: Optional[Sequence[str]], shard_filter: Optional[Sequence[str]]) -> List[str]:
+    names = shard_names()
+    if shard_filter:
+        wanted = {s.lower() for s in shard_filter}
+        names = [s for s in names if s in wanted]
+    if sources:
+        holding = {_shard_of_source(s) for s in sources}
+        names = [s for s in names if s in holding]
+    return names
+
+
+def _where(sources: Optional[Sequence[str]]) -> Optional[dict]:
+    if not sources:
+        return None
+    sources = list(dict.fromkeys(sources))
+    return {"source": sources[0]} if len(sources) == 1 else {"source": {"$in": sources}}
+
+
+def _query(store: Chroma, qv: Sequence[float], n: int, where: Optional[dict]) -> List[tuple]:
+    """``(text, meta, id, embedding, distance)`` rows of one collection."""
+    kwargs = {"where": where} if where else {}
+    res = store._collection.query(
+        query_embeddings=[qv],
+        n_results=n,
+        include=["documents", "metadatas", "embeddings", "distances"],
+        **kwargs,
+    )
+    texts = res["documents"][0]
+    embs = res.get("embeddings")
+    embs = list(embs[0]) if embs is not None else [None] * len(texts)
+    dists = res.get("distances")
+    dists = list(dists[0]) if dists is not None else [None] * len(texts)
+    return [
+        (texts[i], res["metadatas"][0][i] or {}, res["ids"][0][i], embs[i], dists[i])
+        for i in range(len(texts))
+    ]
+
+
+def _query_shard(shard: str, qv: Sequence[float], n: int, where: Optional[dict]) -> List[tuple]:
+    store = shard_store(shard)
+    if not store._collection.count():
+        return []  # configured but still empty
+    return _query(store, qv, n, where)
+
+
+def _fan_out(names: List[str], qv: Sequence[float], n: int, where: Optional[dict]) -> List[tuple]:
+    """Query *names* concurrently; the *n* closest rows over all of them."""
+    global _FANOUT
+    if not names:
+        return []
+    if len(names) == 1:
+        return _query_shard(names[0], qv, n, where)
+    if _FANOUT is None:
+        _FANOUT = ThreadPoolExecutor(shards.KB_SHARD_WORKERS, thread_name_prefix="kb-shard")
+    parts = _FANOUT.map(lambda s: _query_shard(s, qv, n, where), names)
+    rows = [r for part in parts for r in part]
+    rows.sort(key=lambda r: float("inf") if r[4] is None else r[4])
+    return rows[:n]
+
+
+def _mmr(qv: Sequence[float], embs: list, k: int) -> List[int]:
+    import numpy as np
+    from langchain_chroma.vectorstores import maximal_marginal_relevance
+
+    return maximal_marginal_relevance(np.asarray(qv, dtype=np.float32), embs, k=k)
+
+
+def _search_flat(flat, qv: Sequence[float], k: int, *, use_mmr: bool, fetch_k: int) -> Hits:
+    idx, dists = flat.search(qv, max(k, fetch_k) if use_mmr else k)
+    embs = [flat.vectors[i].tolist() for i in idx]
+    picked = _mmr(qv, embs, k) if use_mmr and len(idx) > k else range(len(idx))
+    rows = [flat.row(idx[i]) for i in picked]
+    return Hits(
+        [Document(page_content=r["text"], metadata=r["meta"]) for r in rows],
+        [embs[i] for i in picked],
+        qv,
+        [r["id"] for r in rows],
+        [dists[i] for i in picked],
+    )
@@ -0,0 +1,221 @@
+# app/watcher.py
+
+"""
+Watched-folder incremental indexing
+───────────────────────────────────
+Keeps the permanent KB in step with ``boot.PERSIST_PDF_DIR`` while the API
+runs – PDFs copied in on the host are indexed, overwritten ones re-indexed,
+deleted ones removed – without restarts or full rescans.
+
+• change events come from ``watchfiles`` (inotify) when installed, otherwise
+  from a cheap size/mtime poll every PERSIST_WATCH_POLL_S
+• a file is only touched once its size and mtime have been stable for
+  PERSIST_WATCH_SETTLE_S, so half-copied PDFs are never parsed
+• additions go through the staged ``IngestPipeline``; a changed file keeps
+  its old chunks searchable until the new ones are written, then the
+  surplus is pruned (or all of them dropped if the new version has no text)
+
+Only the worker that owns boot indexing runs the watcher.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from app import metrics
+from app.indexing import IngestPipeline
+from app.vector_store import delete_source, source_indexed_at
+
+try:
+    from watchfiles import awatch
+except Exception:  # pragma: no cover - optional dependency
+    awatch = None
+
+PERSIST_WATCH          = os.getenv("PERSIST_WATCH", "1") == "1"
+PERSIST_WATCH_SETTLE_S = float(os.getenv("PERSIST_WATCH_SETTLE_S", "3"))
+PERSIST_WATCH_POLL_S   = float(os.getenv("PERSIST_WATCH_POLL_S", "2"))
+PERSIST_WATCH_FORCE_POLL = os.getenv("PERSIST_WATCH_FORCE_POLL", "0") == "1"
+
+log = logging.getLogger("watcher")
+
+EVENTS = metrics.counter(
+    "offlinellm_watch_files_total",
+    "PDFs added, changed or removed in the watched folder.",
+    ["action"],
+)
+
+_Sig = Tuple[int, float]
+
+
+def _indexed_since(name: str, mtime: float) -> bool:
+    """True if *name* was indexed after it was last modified (by any worker)."""
+    try:
+        stamp = source_indexed_at(name)
+        return stamp is not None and datetime.fromisoformat(stamp) >= datetime.utcfromtimestamp(mtime)
+    except Exception:
+        return False
+
+
+def _sig(path: Path) -> Optional[_Sig]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime)
+
+
+class FolderWatcher:
+    def __init__(
+        self,
+        directory: Path,
+        *,
+        settle_s: float = PERSIST_WATCH_SETTLE_S,
+        poll_s: float = PERSIST_WATCH_POLL_S,
+        force_polling: bool = PERSIST_WATCH_FORCE_POLL,
+    ) -> None:
+        self.dir = Path(directory)
+        self.settle_s = settle_s
+        self.poll_s = poll_s
+        self.force_polling = force_polling or awatch is None
+        self._known: Dict[str, _Sig] = {}                       # as last indexed
+        self._dirty: Dict[str, Tuple[float, Optional[_Sig]]] = {}  # name -> (since, sig)
+        self._seen: Dict[str, _Sig] = {}                        # polling snapshot
+
+    # -- state -------------------------------------------------------------
+    def snapshot(self) -> Dict[str, _Sig]:
+        out = {}
+        for p in self.dir.glob("*.pdf"):
+            sig = _sig(p)
+            if sig is not None:
+                out[p.name] = sig
+        return out
+
+    def note_indexed(self, path: Path) -> None:
+        """Record a file indexed elsewhere (admin upload) so it is not redone."""
+        sig = _sig(path)
+        if sig is not None:
+            self._known[path.name] = sig
+
+    def forget(self, name: str) -> None:
+        self._known.pop(name, None)
+
+    def mark(self, names: Iterable[str]) -> None:
+        now = time.monotonic()
+        for n in names:
+            self._dirty[n] = (now, _sig(self.dir / n))
+
+    # -- event sources -----------------------------------------------------
+    def poll(self) -> Set[str]:
+        """Names whose size/mtime changed (or appeared / vanished) since last poll."""
+        cur = self.snapshot()
+        changed = {n for n, s in cur.items() if self._seen.get(n) != s}
+        changed |= set(self._seen) - set(cur)
+        self._seen = cur
+        return changed
+
+    async def _events(self) -> AsyncIterator[Set[str]]:
+        if not self.force_polling:
+            try:
+                async for changes in awatch(self.dir, debounce=int(self.poll_s * 1000)):
+                    names = {
+                        Path(p).name for _, p in changes
+                        if p.lower().endswith(".pdf") and Path(p).parent == self.dir
+                    }
+                    if names:
+                        yield names
+                return
+            except Exception as exc:  # inotify limits, unsupported FS …
+                log.warning("inotify watch failed (%s); falling back to polling", exc)
+        while True:
+            await asyncio.sleep(self.poll_s)
+            names = await asyncio.to_thread(self.poll)
+            if names:
+                yield names
+
+    # -- processing --------------------------------------------------------
+    def settled(self) -> List[str]:
+        """Dirty names whose size/mtime held still for ``settle_s``."""
+        now = time.monotonic()
+        ready = []
+        for name, (since, sig) in list(self._dirty.items()):
+            cur = _sig(self.dir / name)
+            if cur != sig:
+                self._dirty[name] = (now, cur)  # still being written
+            elif now - since >= self.settle_s:
+                ready.append(name)
+        for name in ready:
+            del self._dirty[name]
+        return ready
+
+    async def process(self, names: Iterable[str]) -> None:
+        added: List[Path] = []
+        changed: Set[str] = set()
+        for name in names:
+            path = self.dir / name
+            sig = _sig(path)
+            if sig is None:
+                if name in self._known:
+                    log.info("🗑️  %s removed – deleting its chunks", name)
+                    await asyncio.to_thread(delete_source, name)
+                    self._known.pop(name, None)
+                    EVENTS.inc(action="removed")
+                continue
+            if sig[0] == 0 or self._known.get(name) == sig:
+                continue  # empty placeholder, or already indexed as-is
+            if await asyncio.to_thread(_indexed_since, name, sig[1]):
+                self._known[name] = sig  # e.g. a bulk upload in another worker
+                continue
+            if name in self._known:
+                log.info("✏️  %s changed – re-indexing", name)
+                changed.add(name)
+                EVENTS.inc(action="changed")
+            else:
+                log.info("➕  %s added", name)
+                EVENTS.inc(action="added")
+            self._known[name] = sig
+            added.append(path)
+        if added:
+            emptied: List[str] = []
+
+            def on_file(path: Path, outcome: str, *_) -> None:
+                if outcome == "empty" and path.name in changed:
+                    emptied.append(path.name)
+
+            stats = await IngestPipeline("watch", on_file=on_file).run(added)
+            for name in emptied:
+                await asyncio.to_thread(delete_source, name)
+            if stats.failed:
+                log.warning("⚠️  %d watched file(s) failed to index", stats.failed)
+
+    async def _settle_loop(self) -> None:
+        tick = max(0.1, min(1.0, self.settle_s / 2))
+        while True:
+            await asyncio.sleep(tick)
+            ready = self.settled()
+            if ready:
+                try:
+                    await self.process(ready)
+                except Exception:
+                    log.exception("❌  watched-folder update failed")
+
+    async def run(self) -> None:
+        """Watch until cancelled; files present at start are boot indexing's job."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._seen = await asyncio.to_thread(self.snapshot)
+        for name, sig in self._seen.items():
+            self._known.setdefault(name, sig)
+        log.info(
+            "👀  watching %s (%s)", self.dir, "polling" if self.force_polling else "inotify"
+        )
+        settle = asyncio.ensure_future(self._settle_loop())
+        try:
+            async for names in self._events():
+                self.mark(names)
+        finally:
+            settle.cancel()
@@ -0,0 +1,170 @@
+"""
+Chunking strategy benchmark
+───────────────────────────
+For each strategy in ``app.chunking`` report chunk count, average / tiny
+chunk size in tokens, embedding time and retrieval recall@k.
+
+Recall probes are sentences sampled from the PDFs (every fourth word dropped
+so they are not verbatim); a probe is a hit when one of the top-k chunks
+contains the original sentence.
+
+    python benchmarks/chunking.py /app/data/persist          # Ollama / EMBED_BACKEND
+    python benchmarks/chunking.py docs/*.pdf --hash          # no embedding model needed
+    python benchmarks/chunking.py --synthetic --hash
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from langchain.schema import Document  # noqa: E402
+
+from app.chunking import CHUNK_MIN_TOKENS, STRATEGIES  # noqa: E402
+from app.ingestion import load_pages, split_pages  # noqa: E402
+from app.tokenizer import count_tokens  # noqa: E402
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class HashEmbeddings:
+    """Bag-of-words feature hashing: deterministic and model-free."""
+
+    def __init__(self, dim: int = 1024) -> None:
+        self.dim = dim
+
+    def _vec(self, text: str) -> List[float]:
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in re.findall(r"\w+", text.lower()):
+            h = int(hashlib.md5(w.encode()).hexdigest(), 16)
+            v[h % self.dim] += 1.0 if (h >> 20) & 1 else -1.0
+        n = np.linalg.norm(v)
+        return (v / n if n else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vec(text)
+
+
+def synthetic_pages(n_docs: int = 5, n_pages: int = 12, seed: int = 0) -> List[Tuple[str, List[Document]]]:
+    """Manual-like documents: running head, page-number footer, a contents
+    page and short figure captions between paragraphs."""
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ter", "van", "sul", "dor", "pex", "ri", "on", "bra", "gle"]
+    vocab = sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))) for _ in range(4000)})
+    common = ["the", "of", "and", "to", "check", "before", "after", "is", "a", "with"]
+    docs = []
+    for d in range(n_docs):
+        pages = [Document(page_content=f"Manual {d} – Confidential\nContents\n"
+                          + "\n".join(f"Section {i} {'.' * 12} {i + 1}" for i in range(8))
+                          + "\nPage 1 of 12", metadata={"page": 0})]
+        for p in range(1, n_pages):
+            paras = []
+            for _ in range(3):
+                topic = rng.sample(vocab, 40) + common  # each paragraph has its own terms
+                sents = [" ".join(rng.choice(topic) for _ in range(rng.randint(9, 18))).capitalize() + "."
+                         for _ in range(rng.randint(3, 6))]
+                paras.append(" ".join(sents))
+                paras.append(f"Figure {p}.{rng.randint(1, 9)}")
+            body = "\n\n".join(paras)
+            pages.append(Document(
+                page_content=f"Manual {d} – Confidential\n{body}\nPage {p + 1} of {n_pages}",
+                metadata={"page": p},
+            ))
+        docs.append((f"manual_{d}.pdf", pages))
+    return docs
+
+
+def probes(docs, n: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """``(query, sentence)`` pairs sampled from page text."""
+    rng = random.Random(seed)
+    pool = []
+    for _name, pages in docs:
+        for p in pages:
+            for line in p.page_content.splitlines():
+                for s in _SENTENCE.split(" ".join(line.split())):
+                    if 8 <= len(s.split()) <= 40:
+                        pool.append(s)
+    picked = rng.sample(pool, min(n, len(pool)))
+    return [(" ".join(w for i, w in enumerate(s.split()) if i % 4 != 3), s) for s in picked]
+
+
+def run(docs, strategy: str, embedder, queries, k: int) -> dict:
+    chunks = []
+    for name, pages in docs:
+        copies = [Document(page_content=p.page_content, metadata=dict(p.metadata)) for p in pages]
+        chunks += split_pages(copies, name, strategy=strategy)
+    texts = [c.page_content for c in chunks]
+    sizes = [count_tokens(t) for t in texts]
+
+    start = time.perf_counter()
+    matrix = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+    embed_s = time.perf_counter() - start
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    squashed = [_squash(t) for t in texts]
+    hits = 0
+    for query, sentence in queries:
+        q = np.asarray(embedder.embed_query(query), dtype=np.float32)
+        top = np.argsort(-(matrix @ q))[:k]
+        target = _squash(sentence)
+        hits += any(target in squashed[i] for i in top)
+    return {
+        "chunks": len(texts),
+        "avg_tokens": sum(sizes) / max(1, len(sizes)),
+        "tiny": sum(s < CHUNK_MIN_TOKENS for s in sizes),
+        "embed_s": embed_s,
+        "recall": hits / max(1, len(queries)),
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("paths", nargs="*", type=Path, help="PDF files or folders")
+    ap.add_argument("--synthetic", action="store_true", help="generated manual-like documents")
+    ap.add_argument("--hash", action="store_true", help="feature-hashing embedder instead of the configured one")
+    ap.add_argument("-k", type=int, default=5)
+    ap.add_argument("-q", "--queries", type=int, default=100)
+    args = ap.parse_args(argv)
+
+    if args.synthetic or not args.paths:
+        docs = synthetic_pages()
+    else:
+        files = [f for p in args.paths for f in (sorted(p.glob("*.pdf")) if p.is_dir() else [p])]
+        docs = [(f.name, load_pages(str(f))) for f in files]
+    if args.hash:
+        embedder = HashEmbeddings()
+    else:
+        from app.vector_store import get_embeddings
+
+        embedder = get_embeddings()
+
+    queries = probes(docs, args.queries)
+    print(f"{len(docs)} documents, {sum(len(p) for _, p in docs)} pages, {len(queries)} probes, recall@{args.k}\n")
+    print(f"{'strategy':9} {'chunks':>7} {'avg tok':>8} {'tiny':>5} {'embed s':>8} {'recall':>7}")
+    for strategy in STRATEGIES:
+        r = run(docs, strategy, embedder, queries, args.k)
+        print(
+            f"{strategy:9} {r['chunks']:7d} {r['avg_tokens']:8.1f} {r['tiny']:5d} "
+            f"{r['embed_s']:8.2f} {r['recall']:7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
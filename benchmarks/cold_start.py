@@ -0,0 +1,155 @@
+"""
+Cold-start benchmark
+────────────────────
+Measures, in fresh interpreters:
+
+• import time – ``python -X importtime -c "import app.api"``; total plus the
+                slowest modules by cumulative time
+• first request – starts ``uvicorn app.api:app`` and records seconds until
+                ``/ping`` answers and until a real request (``/doc_qa`` by
+                default) first succeeds
+
+    python benchmarks/cold_start.py                       # both, printed
+    python benchmarks/cold_start.py --imports-only --json cold.json
+    python benchmarks/cold_start.py --baseline cold.json  # exit 1 on regression
+
+With ``--baseline`` every timing is compared to the saved run and the script
+fails when one is more than ``--tolerance`` (default 25 %) slower.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module: str = "app.api") -> Tuple[float, List[Tuple[str, float, int]]]:
+    """``(total_s, [(module, cumulative_s, depth), ...])`` for one cold import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(2)) / 1e6, len(m.group(3)) // 2))
+    total = next((s for name, s, _ in rows if name == module), 0.0)
+    return total, rows
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _ok(url: str, body: Optional[dict]) -> bool:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=120) as r:
+            return 200 <= r.status < 300
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return False
+
+
+def first_request(path: str, body: Optional[dict], timeout_s: float) -> Dict[str, Optional[float]]:
+    """Seconds from spawning uvicorn until /ping and *path* first succeed."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "SKIP_BOOT_INDEXING": "1"},
+    )
+    out: Dict[str, Optional[float]] = {"ping_s": None, "first_request_s": None}
+    try:
+        deadline = start + timeout_s
+        while time.perf_counter() < deadline and server.poll() is None:
+            if out["ping_s"] is None and _ok(base + "/ping", None):
+                out["ping_s"] = time.perf_counter() - start
+            if out["ping_s"] is not None and _ok(base + path, body):
+                out["first_request_s"] = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return out
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    return [
+        f"{key}: {current[key]:.3f}s vs baseline {base:.3f}s"
+        for key, base in baseline.items()
+        if isinstance(base, (int, float)) and base >= 0.05  # below that it is noise
+        and current.get(key) is not None and current[key] > base * (1 + tolerance)
+    ]
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--module", default="app.api")
+    ap.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    ap.add_argument("--imports-only", action="store_true", help="skip the server run")
+    ap.add_argument("--path", default="/doc_qa", help="request timed after /ping")
+    ap.add_argument("--body", default='{"question": "What is this document about?"}',
+                    help="JSON body (POST); 'none' for GET")
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--json", type=Path, help="write results here")
+    ap.add_argument("--baseline", type=Path, help="compare with an earlier --json file")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args(argv)
+
+    total, rows = import_times(args.module)
+    results: Dict[str, Optional[float]] = {"import_s": total}
+    print(f"import {args.module}: {total:.3f}s\n")
+    print(f"{'cumulative s':>12}  module")
+    for name, secs, depth in sorted(rows, key=lambda r: -r[1])[:args.top]:
+        print(f"{secs:12.3f}  {'  ' * depth}{name}")
+    for name, secs, _ in rows:
+        if name.startswith("app."):
+            results[f"import_s[{name}]"] = secs
+
+    if not args.imports_only:
+        body = None if args.body.lower() == "none" else json.loads(args.body)
+        timing = first_request(args.path, body, args.timeout)
+        results.update(timing)
+        print()
+        for key, val in timing.items():
+            print(f"{key:16} {'timed out' if val is None else f'{val:.3f}s'}")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        slower = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if slower:
+            print("\nregressions (>{:.0%} slower):".format(args.tolerance))
+            for line in slower:
+                print("  " + line)
+            raise SystemExit(1)
+        print(f"\nno regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
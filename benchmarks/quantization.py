@@ -0,0 +1,93 @@
+"""
+Flat-index quantization benchmark
+─────────────────────────────────
+Compares the float32 scan with the float16 / int8 first stage (plus exact
+rescoring) of ``app.flat_index``: bytes the scan keeps resident, recall@k
+against exact float32 search, and latency per query.
+
+    python benchmarks/quantization.py                  # synthetic 768-dim data
+    python benchmarks/quantization.py --from-index     # the published KB index
+    python benchmarks/quantization.py -n 200000 -k 10 --rescore 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import flat_index  # noqa: E402
+from app.flat_index import FlatIndex, QUANT_MODES, _smallest, write_vectors  # noqa: E402
+
+
+def synthetic(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, roughly like sentence embeddings of a library."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(1, n // 250), dim)).astype(np.float32)
+    x = centres[rng.integers(len(centres), size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def build(root: Path, matrix: np.ndarray, quant: str) -> FlatIndex:
+    dest = root / quant
+    dest.mkdir()
+    np.save(dest / "offsets.npy", np.zeros(len(matrix) + 1, dtype=np.int64))
+    (dest / "rows.bin").write_bytes(b"")
+    write_vectors(dest, matrix, quant)
+    return FlatIndex(dest)
+
+
+def recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("-n", type=int, default=100_000, help="synthetic vectors")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("-q", "--queries", type=int, default=200)
+    ap.add_argument("--rescore", type=int, default=flat_index.FLAT_INDEX_RESCORE)
+    ap.add_argument("--from-index", action="store_true", help="use the published KB vectors")
+    args = ap.parse_args(argv)
+
+    if args.from_index:
+        live = flat_index.current()
+        if live is None:
+            sys.exit("no published flat index – start the API once or set FLAT_INDEX_DIR")
+        matrix = np.asarray(live.vectors, dtype=np.float32)
+    else:
+        matrix = synthetic(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    picks = rng.integers(len(matrix), size=args.queries)
+    queries = matrix[picks] + 0.05 * rng.normal(size=(args.queries, matrix.shape[1])).astype(np.float32)
+    k = min(args.k, len(matrix))
+
+    print(f"{len(matrix)} vectors × {matrix.shape[1]} dims, {args.queries} queries, recall@{k}, rescore ×{args.rescore}\n")
+    print(f"{'mode':8} {'scan MB':>8} {'saved':>6} {'recall 1st':>10} {'recall':>7} {'ms/query':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = build(Path(tmp), matrix, "none")
+        truth = [exact.search(q, k)[0] for q in queries]
+        base_mb = exact.vectors.nbytes / 1e6
+        for mode in QUANT_MODES:
+            idx = exact if mode == "none" else build(Path(tmp), matrix, mode)
+            scan = idx.vectors if idx.qvectors is None else idx.qvectors
+            first = truth if mode == "none" else [_smallest(idx.approx_distances(q), k).tolist() for q in queries]
+            start = time.perf_counter()
+            found = [idx.search(q, k, rescore=args.rescore)[0] for q in queries]
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            mb = scan.nbytes / 1e6
+            print(
+                f"{mode:8} {mb:8.1f} {100 * (1 - mb / base_mb):5.0f}% "
+                f"{recall(first, truth):10.3f} {recall(found, truth):7.3f} {ms:9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
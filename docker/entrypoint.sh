@@ -10,6 +10,14 @@ mkdir -p /app/data/chroma_persist
 # hand ownership to the non-root user
 chown -R llm:llm /app/data 2>/dev/null || true
 
+# ------------------------------------------------------------------
+# optional: seed an empty KB from a snapshot instead of re-embedding
+# ------------------------------------------------------------------
+if [ -n "${KB_SNAPSHOT:-}" ] && [ -f "$KB_SNAPSHOT" ]; then
+  echo "📥  loading KB snapshot $KB_SNAPSHOT"
+  gosu llm python -m app.snapshot import "$KB_SNAPSHOT" --if-empty
+fi
+
 # ------------------------------------------------------------------
 # wait for Ollama to be ready
 # ------------------------------------------------------------------
@@ -20,12 +28,12 @@ done
 echo "✅ Ollama is up!"
 
 # ------------------------------------------------------------------
-# index PDFs (if any) before launching the app
+# PDFs under /app/data/persist are indexed by the API itself, in the
+# background, so queries are served while indexing runs
+# (progress: GET /api/admin/index_status)
 # ------------------------------------------------------------------
-# (errors are caught inside app/boot.py, so this always returns zero)
 if [ "${SKIP_BOOT_INDEXING:-0}" = "0" ]; then
-  echo "📚  running boot indexing"
-  gosu llm python -m app.boot
+  echo "📚  boot indexing will run in the background"
 else
   echo "📚  boot indexing skipped"
 fi
@@ -159,6 +159,10 @@ class FastAPI:
         def decorator(fn):
             return fn
         return decorator
+    def websocket(self, *a, **k):
+        def decorator(fn):
+            return fn
+        return decorator
 
 def File(*a, **k):
     return None
@@ -183,6 +187,19 @@ class Depends:
     def __init__(self, dependency):
         self.dependency = dependency
 
+class WebSocket:
+    pass
+
+class WebSocketDisconnect(Exception):
+    pass
+
+class Response:
+    def __init__(self, content=None, media_type=None, status_code=200, headers=None):
+        self.body = content
+        self.media_type = media_type
+        self.status_code = status_code
+        self.headers = headers or {}
+
 class APIRouter:
     def get(self, *a, **k):
         def decorator(fn):
@@ -210,6 +227,9 @@ fastapi_stub.HTTPException = HTTPException
 fastapi_stub.Query = Query
 fastapi_stub.UploadFile = UploadFile
 fastapi_stub.Depends = Depends
+fastapi_stub.Response = Response
+fastapi_stub.WebSocket = WebSocket
+fastapi_stub.WebSocketDisconnect = WebSocketDisconnect
 fastapi_stub.APIRouter = APIRouter
 cors_mod = types.ModuleType('fastapi.middleware.cors')
 cors_mod.CORSMiddleware = CORSMiddleware
@@ -239,6 +259,10 @@ class ClientStub:
             req = api.QARequest(**json)
             res = asyncio.get_event_loop().run_until_complete(api.doc_qa(req))
             return FakeResponse(res.dict())
+        if url == '/doc_qa/prefetch':
+            req = api.PrefetchRequest(**json)
+            res = asyncio.get_event_loop().run_until_complete(api.doc_qa_prefetch(req))
+            return FakeResponse(res.dict())
         raise ValueError('unsupported url')
     def get(self, url):
         import asyncio
@@ -257,6 +281,7 @@ sys.modules['ollama'] = ollama
 
 # ---- import target module ----
 import app.api as api  # noqa: E402
+import app.retrieval as retrieval  # noqa: E402
 from fastapi.testclient import TestClient  # noqa: E402
 
 class DummyDoc:
@@ -264,11 +289,18 @@ class DummyDoc:
         self.page_content = text
         self.metadata = {}
 
+
+@pytest.fixture(autouse=True)
+def _fresh_query_caches():
+    retrieval.query_embeddings.clear()
+    retrieval.kb_results.clear()
+    yield
+
 def test_doc_qa(monkeypatch):
     docs = [DummyDoc("c1"), DummyDoc("c2")]
 
-    monkeypatch.setattr(api, "similarity_search", lambda q, k=10, use_mmr=False: docs)
-    monkeypatch.setattr(api, "rerank", lambda q, chunks: [chunks[0]])
+    monkeypatch.setattr(retrieval, "search_with_vectors", lambda q, k=10, **kw: api.vector_store.Hits(docs))
+    monkeypatch.setattr(retrieval, "rerank_scored", lambda q, chunks, top_k, **kw: [(0, 1.0)])
     monkeypatch.setattr(api, "safe_chat", lambda model, messages, stream=False: {"message": {"content": "ans"}})
     monkeypatch.setattr(api, "finalize_ollama_chat", lambda raw: raw)
 
@@ -281,6 +313,42 @@ def test_doc_qa(monkeypatch):
     }
 
 
+def test_prefetch_warms_doc_qa(monkeypatch):
+    searches = []
+
+    def search(q, k=10, **kw):
+        searches.append(kw.get("query_embedding"))
+        return api.vector_store.Hits([DummyDoc("c1"), DummyDoc("c2")], query_embedding=[0.5])
+
+    monkeypatch.setattr(retrieval, "search_with_vectors", search)
+    monkeypatch.setattr(retrieval, "rerank_scored", lambda q, chunks, top_k, **kw: [(1, 1.0)])
+    monkeypatch.setattr(api, "safe_chat", lambda model, messages, stream=False: {"message": {"content": "ans"}})
+    monkeypatch.setattr(api, "finalize_ollama_chat", lambda raw: raw)
+
+    client = TestClient(api.app)
+    assert client.post("/doc_qa/prefetch", json={"question": "what is"}).json()["status"] == "skipped"
+    question = "what is the  leave policy"
+    resp = client.post("/doc_qa/prefetch", json={"question": question})
+    assert resp.json() == {"status": "warmed", "candidates": 2}
+    assert len(searches) == 1
+
+    resp = client.post("/doc_qa", json={"question": "what is the leave policy"})
+    assert resp.json()["sources"] == [{"page_number": None, "snippet": "c2"}]
+    assert len(searches) == 1  # served from the prefetch
+
+    client.post("/doc_qa", json={"question": "what is the leave policy", "sources": ["a.pdf"]})
+    assert searches == [None, [0.5]]  # other filter: searched again, embedding reused
+
+
+def test_fuse_keeps_closest_duplicate():
+    kb = [retrieval.Candidate("Same  text", {"page": 3}, distance=0.4),
+          retrieval.Candidate("other", {"page": 1}, distance=0.5)]
+    sess = [retrieval.Candidate("same text", {"page": 9}, distance=0.1, origin="session")]
+    out = retrieval.fuse(kb, sess)
+    assert [c.text for c in out] == ["same text", "other"]
+    assert out[0].page == 9 and out[0].origin == "session"
+
+
 def test_calc_top_k(monkeypatch):
     monkeypatch.setattr(api, "DYNAMIC_K_FACTOR", 5)
     monkeypatch.setattr(api, "SEARCH_TOP_K", 2)
@@ -0,0 +1,95 @@
+import asyncio
+import io
+import json
+import sys
+import types
+import zipfile
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# minimal stubs so app.vector_store / app.ingestion can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+langcore.Document = object
+sys.modules.setdefault("langchain_core.documents", langcore)
+loaders = types.ModuleType("langchain_community.document_loaders")
+loaders.PyPDFLoader = object
+sys.modules.setdefault("langchain_community.document_loaders", loaders)
+splitters = types.ModuleType("langchain_text_splitters")
+splitters.RecursiveCharacterTextSplitter = object
+sys.modules.setdefault("langchain_text_splitters", splitters)
+schema = types.ModuleType("langchain.schema")
+schema.Document = object
+sys.modules.setdefault("langchain.schema", schema)
+
+import app.bulk as bulk  # noqa: E402
+
+
+def test_bulk_batch_stages_zip_and_reports_per_file(tmp_path, monkeypatch):
+    deleted = []
+
+    class Pipe:
+        def __init__(self, name, source_dir=None, on_file=None):
+            self.on_file = on_file
+
+        async def run(self, paths):
+            for p in paths:
+                if p.name == "bad.pdf":
+                    self.on_file(p, "failed", 0, 0.1, "broken")
+                elif p.name == "e.pdf":
+                    self.on_file(p, "empty", 0, 0.1, None)
+                else:
+                    self.on_file(p, "indexed", 4, 0.5, None)
+
+    monkeypatch.setattr(bulk, "IngestPipeline", Pipe)
+    monkeypatch.setattr(bulk, "delete_source", deleted.append)
+
+    pdf_dir = tmp_path / "persist"
+    pdf_dir.mkdir()
+    (pdf_dir / "a.pdf").write_bytes(b"%PDF old")      # will be replaced
+    (pdf_dir / "e.pdf").write_bytes(b"%PDF old")      # replaced by a text-less scan
+    (pdf_dir / "bad.pdf").write_bytes(b"%PDF old")    # replacement fails: kept
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("docs/a.pdf", b"%PDF a")
+        zf.writestr("../../bad.pdf", b"%PDF b")
+        zf.writestr("notes.txt", b"skip me")
+        zf.writestr("e.pdf", b"%PDF e")
+    buf.seek(0)
+
+    mgr = bulk.BulkIngest(pdf_dir, tmp_path / "status")
+    batch = mgr.new_batch()
+    mgr.stage(batch, "library.zip", buf)
+    mgr.stage(batch, "c.pdf", io.BytesIO(b"%PDF c"))
+    mgr.stage(batch, "readme.md", io.BytesIO(b"x"))
+    assert [(f.filename, f.status) for f in batch.files] == [
+        ("a.pdf", "queued"), ("bad.pdf", "queued"), ("e.pdf", "queued"),
+        ("c.pdf", "queued"), ("readme.md", "skipped"),
+    ]
+
+    asyncio.get_event_loop().run_until_complete(mgr.start(batch))
+
+    data = mgr.get(batch.batch_id)
+    assert data["state"] == "done"
+    status = {f["filename"]: (f["status"], f["chunks"]) for f in data["files"]}
+    assert status == {
+        "a.pdf": ("indexed", 4), "bad.pdf": ("failed", 0),
+        "e.pdf": ("empty", 0), "c.pdf": ("indexed", 4), "readme.md": ("skipped", 0),
+    }
+    assert deleted == ["e.pdf"]  # a.pdf's surplus chunks are pruned by the writer
+    assert (pdf_dir / "a.pdf").read_bytes() == b"%PDF a"
+    assert (pdf_dir / "c.pdf").exists() and (pdf_dir / "bad.pdf").read_bytes() == b"%PDF old"
+    assert not list(pdf_dir.glob(".bulk-*"))
+    assert json.loads((tmp_path / "status" / f"{batch.batch_id}.json").read_text())["files"]
@@ -0,0 +1,147 @@
+import sys
+import types
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+ollama = types.ModuleType("ollama")
+ollama.chat = lambda *a, **k: {"message": {"content": "dummy"}}
+sys.modules.setdefault("ollama", ollama)
+
+import app.chat as chat  # noqa: E402
+import app.deadlines as deadlines  # noqa: E402
+import app.scheduler as sched  # noqa: E402
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _http(body=b"{}"):
+    """ASGI receive yielding one body, then a disconnect once *gone* is set."""
+    gone = asyncio.Event()
+
+    async def receive():
+        if not receive.sent:
+            receive.sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    receive.sent = False
+    return receive, gone
+
+
+def test_disconnect_cancels_handler():
+    seen = {}
+
+    async def app(scope, receive, send):
+        await receive()
+        seen["deadline"] = deadlines.remaining()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            seen["cancelled"] = True
+            raise
+
+    async def main():
+        receive, gone = _http()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        mw = deadlines.RequestDeadlineMiddleware(app, deadline_s=60)
+        call = asyncio.ensure_future(mw({"type": "http"}, receive, send))
+        await asyncio.sleep(0.01)
+        gone.set()
+        await asyncio.wait_for(call, 1)
+        return sent
+
+    before = deadlines.ABORTED.value(reason="disconnect")
+    assert _run(main()) == []  # nobody left to answer
+    assert seen["cancelled"] and 50 < seen["deadline"] <= 60
+    assert deadlines.ABORTED.value(reason="disconnect") == before + 1
+
+
+def test_deadline_answers_504():
+    async def slow(scope, receive, send):
+        await receive()
+        await asyncio.sleep(10)
+
+    async def early(scope, receive, send):
+        raise deadlines.DeadlineExceeded("rerank")  # as check() would
+
+    async def call(app, deadline_s):
+        receive, _ = _http()
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        await deadlines.RequestDeadlineMiddleware(app, deadline_s=deadline_s)({"type": "http"}, receive, send)
+        return sent
+
+    for app, deadline_s in ((slow, 0.02), (early, 60)):
+        sent = _run(call(app, deadline_s))
+        assert sent[0]["status"] == 504 and b"deadline" in sent[1]["body"]
+    assert deadlines.remaining() == float("inf")  # outside a request
+
+
+def test_cancelled_generation_stops_stream_and_counts_savings(monkeypatch):
+    produced, closed = [], threading.Event()
+
+    def tokens(**kwargs):
+        try:
+            for i in range(1000):
+                produced.append(i)
+                yield {"message": {"role": "assistant", "content": f"t{i} "}, "done": False}
+                time.sleep(0.005)
+            yield {"message": {"role": "assistant", "content": ""}, "done": True}
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(chat.ollama, "chat", tokens)
+    s = sched.LLMScheduler(default_limit=1, deadline_s=100, slot_dir=None)
+    s._queue("m").service_s = 30
+
+    async def generate():
+        async with s.slot("m"):
+            return await deadlines.run_sync(chat.safe_chat, model="m", messages=[])
+
+    async def main():
+        task = asyncio.ensure_future(generate())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert closed.is_set()  # thread finished before the slot was released
+        assert s._queue("m").active == 0
+
+    before = sched.SECONDS_SAVED.value(model="m")
+    _run(main())
+    assert len(produced) < 1000
+    assert 29 < sched.SECONDS_SAVED.value(model="m") - before <= 30
+    assert s._queue("m").service_s == 30  # a cut-short run does not skew the estimate
+
+
+def test_streamed_chunks_are_joined(monkeypatch):
+    chunks = [
+        {"message": {"role": "assistant", "content": "Hel"}, "done": False},
+        {"message": {"role": "assistant", "content": "lo"}, "done": True, "eval_count": 2},
+    ]
+    monkeypatch.setattr(chat.ollama, "chat", lambda **k: iter(chunks))
+    msg = chat.safe_chat(model=chat.DEFAULT_MODEL, messages=[])
+    assert msg["message"]["content"] == "Hello" and msg["eval_count"] == 2
+
+
+def test_deadline_plus_grace_fits_proxy_timeout():
+    assert deadlines.REQUEST_DEADLINE_S + deadlines.ABORT_GRACE_S < deadlines.PROXY_TIMEOUT_S
+    assert deadlines._request_deadline(None, 40, 300) == 255
+    assert deadlines._request_deadline("299", 15, 300) == 285  # cut down to fit
+    assert deadlines._request_deadline("0", 15, 300) == 0      # disabled stays disabled
@@ -0,0 +1,58 @@
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+np = pytest.importorskip("numpy")
+
+import app.embedding as embedding  # noqa: E402
+
+
+class Session:
+    def __init__(self):
+        self.feeds = []
+
+    def run(self, _outputs, feed):
+        self.feeds.append(feed)
+        ids = feed["input_ids"].astype(np.float32)
+        # token vector = [id, 1]; padding positions carry garbage
+        hidden = np.stack([ids, np.ones_like(ids)], axis=-1)
+        hidden[feed["attention_mask"] == 0] = 99.0
+        return [hidden]
+
+
+class Tokenizer:
+    def encode_batch(self, texts):
+        n = max(len(t.split()) for t in texts)
+        out = []
+        for t in texts:
+            ids = [len(w) for w in t.split()]
+            pad = n - len(ids)
+            out.append(types.SimpleNamespace(ids=ids + [0] * pad, attention_mask=[1] * len(ids) + [0] * pad))
+        return out
+
+
+def test_onnx_embeddings_batch_prefix_and_mean_pool(monkeypatch):
+    monkeypatch.setattr(embedding, "EMBED_NORMALIZE", False)
+    emb = embedding.OnnxEmbeddings(Path("/nonexistent"), batch_size=2, doc_prefix="p: ", query_prefix="q: ")
+    session = Session()
+    emb._model = (session, Tokenizer(), {"input_ids", "attention_mask", "token_type_ids"})
+
+    docs = emb.embed_documents(["aaa", "bb c", "dddd"])
+    assert len(session.feeds) == 2  # batches of two
+    assert "token_type_ids" in session.feeds[0]
+    # "p: aaa" -> ids [2, 3]; padding is ignored by the mean
+    assert docs[0] == pytest.approx([2.5, 1.0])
+    assert docs[1] == pytest.approx([5 / 3, 1.0])
+    assert emb.embed_query("xy") == pytest.approx([2.0, 1.0])
+
+
+def test_unknown_backend_and_missing_model():
+    with pytest.raises(ValueError):
+        embedding.local_embeddings("nope")
+    emb = embedding.local_embeddings("onnx", Path("/nonexistent/model"))
+    with pytest.raises(RuntimeError, match="not found"):
+        emb.embed_query("x")
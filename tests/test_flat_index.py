@@ -0,0 +1,146 @@
+import asyncio
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+np = pytest.importorskip("numpy")
+
+# minimal stubs so app.vector_store can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+
+
+class Document:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+langcore.Document = Document
+sys.modules.setdefault("langchain_core.documents", langcore)
+
+import app.flat_index as flat_index  # noqa: E402
+import app.vector_store as vs  # noqa: E402
+
+
+class Collection:
+    metadata = None
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def count(self):
+        return len(self.vectors)
+
+    def get(self, include=(), limit=None, offset=0):
+        rows = list(range(len(self.vectors)))[offset:offset + limit]
+        return {
+            "ids": [f"id{i}" for i in rows],
+            "documents": [f"chunk {i}" for i in rows],
+            "metadatas": [{"source": "a.pdf", "page": i} for i in rows],
+            "embeddings": [self.vectors[i] for i in rows],
+        }
+
+
+def test_flat_index_matches_exact_l2_and_swaps(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(50, 8)).astype(np.float32)
+    monkeypatch.setattr(vs, "persistent_store", types.SimpleNamespace(_collection=Collection(vecs.tolist())))
+    monkeypatch.setattr(flat_index, "FLAT_INDEX_DIR", tmp_path / "flat")
+    monkeypatch.setattr(flat_index, "FLAT_INDEX_CHECK_S", 0)
+    monkeypatch.setattr(flat_index, "FLAT_INDEX", True)
+    monkeypatch.setattr(flat_index, "_open", None)
+    monkeypatch.setattr(vs, "Document", Document)
+
+    assert flat_index.current() is None
+    assert flat_index._is_stale()
+    assert flat_index.publish_locked()["count"] == 50
+    assert not flat_index._is_stale()
+
+    q = rng.normal(size=8).astype(np.float32)
+    hits = vs.search_with_vectors("ignored", k=5, query_embedding=q.tolist())
+    want = np.argsort(((vecs - q) ** 2).sum(axis=1))[:5]
+    assert hits.ids == [f"id{i}" for i in want]
+    assert hits.docs[0].page_content == f"chunk {want[0]}"
+    assert hits.docs[0].metadata == {"source": "a.pdf", "page": int(want[0])}
+    assert np.allclose(hits.distances, ((vecs[want] - q) ** 2).sum(axis=1), atol=1e-4)
+
+    first = flat_index.current()
+    monkeypatch.setattr(vs, "persistent_store", types.SimpleNamespace(_collection=Collection(vecs[:10].tolist())))
+    flat_index.publish()
+    flat_index.publish()
+    assert flat_index.current() is not first and len(flat_index.current()) == 10
+    assert len(list((tmp_path / "flat").glob("v*"))) == flat_index.FLAT_INDEX_KEEP
+
+
+def test_deletes_hidden_before_republish(tmp_path, monkeypatch):
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(30, 8)).astype(np.float32)
+    monkeypatch.setattr(vs, "persistent_store", types.SimpleNamespace(_collection=Collection(vecs.tolist())))
+    monkeypatch.setattr(flat_index, "FLAT_INDEX_DIR", tmp_path / "flat")
+    monkeypatch.setattr(flat_index, "FLAT_INDEX_CHECK_S", 0)
+    monkeypatch.setattr(flat_index, "FLAT_INDEX", True)
+    monkeypatch.setattr(flat_index, "_open", None)
+    flat_index.publish()
+    other = flat_index.FlatIndex(flat_index.current().path)  # another worker's view
+
+    q = rng.normal(size=8).astype(np.float32)
+    order = np.argsort(((vecs - q) ** 2).sum(axis=1))
+    gone = [f"id{i}" for i in order[:3]]
+    flat_index.note_deleted(ids=gone)
+    idx, _ = flat_index.current().search(q, 5)
+    assert idx == order[3:8].tolist()
+    other.load_deleted()
+    assert other.search(q, 5)[0] == idx
+
+    flat_index.note_deleted(sources=["a.pdf"])  # legacy delete: no ids known
+    assert flat_index.current().search(q, 5) == ([], [])
+
+    # a live version is reused at start-up without opening Chroma to count it
+    calls = []
+
+    async def stop(_):
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(flat_index, "publish_locked", lambda *a: calls.append(a))
+    monkeypatch.setattr(asyncio, "sleep", stop)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.get_event_loop().run_until_complete(flat_index.keep_published())
+    assert calls == []
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantized_scan_rescored_matches_exact(tmp_path, mode):
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(400, 16)).astype(np.float32)
+    indexes = {}
+    for quant in ("none", mode):
+        dest = tmp_path / quant
+        dest.mkdir()
+        np.save(dest / "offsets.npy", np.zeros(len(vecs) + 1, dtype=np.int64))
+        (dest / "rows.bin").write_bytes(b"")
+        flat_index.write_vectors(dest, vecs, quant)
+        indexes[quant] = flat_index.FlatIndex(dest)
+    exact, quant = indexes["none"], indexes[mode]
+    assert quant.qvectors.nbytes <= vecs.nbytes // 2
+
+    for q in rng.normal(size=(20, 16)).astype(np.float32):
+        want_idx, want_d = exact.search(q, 5)
+        got_idx, got_d = quant.search(q, 5, rescore=4)
+        assert got_idx == want_idx
+        assert np.allclose(got_d, want_d, atol=1e-4)  # rescored at full precision
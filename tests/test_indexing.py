@@ -0,0 +1,94 @@
+import asyncio
+import sys
+import types
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# minimal stubs so app.vector_store / app.ingestion can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+langcore.Document = object
+sys.modules.setdefault("langchain_core.documents", langcore)
+loaders = types.ModuleType("langchain_community.document_loaders")
+loaders.PyPDFLoader = object
+sys.modules.setdefault("langchain_community.document_loaders", loaders)
+splitters = types.ModuleType("langchain_text_splitters")
+splitters.RecursiveCharacterTextSplitter = object
+sys.modules.setdefault("langchain_text_splitters", splitters)
+schema = types.ModuleType("langchain.schema")
+schema.Document = object
+sys.modules.setdefault("langchain.schema", schema)
+
+import app.indexing as indexing  # noqa: E402
+
+
+class Doc:
+    def __init__(self, text):
+        self.page_content = text
+        self.metadata = {}
+
+
+def test_pipeline_batches_writes_and_isolates_failures(monkeypatch):
+    writes = []
+
+    def fake_parse(path):
+        if path.name == "bad.pdf":
+            raise RuntimeError("broken pdf")
+        return ["p"]
+
+    def fake_split(pages, path):
+        n = 0 if path.endswith("empty.pdf") else 3
+        return [Doc(f"{Path(path).name}-{i}") for i in range(n)]
+
+    def fake_write(ids, texts, metas, vecs):
+        writes.append(list(texts))
+
+    monkeypatch.setattr(indexing, "load_pages", lambda p: fake_parse(Path(p)))
+    monkeypatch.setattr(indexing, "split_pages", fake_split)
+    monkeypatch.setattr(
+        indexing.vector_store, "EMBEDDINGS",
+        types.SimpleNamespace(embed_documents=lambda t: [[0.0]] * len(t)), raising=False,
+    )
+    monkeypatch.setattr(indexing, "write_embedded", fake_write)
+    pruned = []
+    monkeypatch.setattr(indexing.vector_store, "prune_source", lambda src, keep: pruned.append((src, len(keep))))
+
+    paths = [Path(f"f{i}.pdf") for i in range(6)] + [Path("bad.pdf"), Path("empty.pdf")]
+    pipe = indexing.IngestPipeline(
+        "test", parse_workers=3, chunk_workers=2, embed_workers=2,
+        embed_batch=2, write_batch=9, write_delay_s=0.05,
+    )
+    stats = asyncio.get_event_loop().run_until_complete(pipe.run(paths))
+
+    assert (stats.indexed, stats.empty, stats.failed, stats.chunks) == (6, 1, 1, 18)
+    assert sum(len(w) for w in writes) == 18
+    assert len(writes) < 6                    # rows from several files per write
+    assert all(len(w) <= 9 for w in writes)
+    assert sorted(pruned) == [(f"f{i}.pdf", 3) for i in range(6)]  # after each file's write
+    assert len(indexing.chunk_ids("a.pdf", 3)) == 3
+    assert indexing.chunk_ids("a.pdf", 1) == indexing.chunk_ids("a.pdf", 1)
+
+
+def test_boot_progress_reports_eta(tmp_path, monkeypatch):
+    import app.boot as boot
+
+    monkeypatch.setattr(boot, "BOOT_PROGRESS_FILE", tmp_path / "progress.json")
+    assert boot.read_progress()["state"] == "idle"
+
+    stats = indexing.IngestStats(files=10, indexed=3, failed=1)
+    snap = boot._progress("running", stats, started=boot.time.time() - 40)
+    boot._write_progress(snap)
+    got = boot.read_progress()
+    assert got["percent"] == 40.0
+    assert 55 <= got["eta_s"] <= 65          # 10 s per file, 6 files left
@@ -52,3 +52,62 @@ def test_load_and_split_bytes():
     assert [c.page_content for c in chunks] == ["page1", "page2"]
     expected_meta = {"page_number": None, "source_file": "<uploaded-pdf>"}
     assert [c.metadata for c in chunks] == [expected_meta, expected_meta]
+
+
+class Doc:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class ParagraphSplitter:
+    def __init__(self, chunk_size, chunk_overlap, length_function=len):
+        self.length_function = length_function
+
+    def split_documents(self, pages):
+        return [Doc(part, dict(p.metadata)) for p in pages for part in p.page_content.split("\n\n")]
+
+
+def test_token_strategy_strips_boilerplate_and_merges_fragments(monkeypatch):
+    import app.chunking as chunking
+
+    monkeypatch.setattr(chunking, "Document", Doc)
+    monkeypatch.setattr(chunking, "RecursiveCharacterTextSplitter", ParagraphSplitter)
+    body = " ".join(f"word{i}" for i in range(60))
+    pages = [
+        Doc(f"ACME Manual – Rev 3\n{body} page{n}\n\nSee annex {'ABCD'[n - 1]}.\nPage {n} of 4", {"page": n})
+        for n in range(1, 5)
+    ]
+    pages.insert(0, Doc("ACME Manual – Rev 3\nContents\nIntro ........ 1\nPage 0 of 4", {"page": 0}))
+
+    chunks = chunking.split_tokens(pages, chunk_tokens=100, overlap=0, min_tokens=10)
+    texts = [c.page_content for c in chunks]
+    assert not any("ACME" in t or "Page " in t or "....." in t for t in texts)
+    # "Contents" (cover) and the one-line notes are folded into neighbours
+    assert len(chunks) == 4
+    assert texts[0].startswith("Contents\nword0") and texts[0].endswith("See annex A.")
+    assert [c.metadata["page"] for c in chunks] == [1, 2, 3, 4]
+
+
+def test_strategy_rules_pick_per_document(monkeypatch):
+    import app.chunking as chunking
+
+    monkeypatch.setattr(chunking, "CHUNK_STRATEGY", "tokens")
+    monkeypatch.setattr(chunking, "CHUNK_STRATEGY_RULES", "slides_*.pdf=chars; bad=nope")
+    assert chunking.strategy_for("/data/slides_q3.pdf") == "chars"
+    assert chunking.strategy_for("/data/manual.pdf") == "tokens"
+
+
+def test_upload_strategy_follows_original_filename(tmp_path, monkeypatch):
+    import app.chunking as chunking
+
+    monkeypatch.setattr(chunking, "CHUNK_STRATEGY_RULES", "manual_*.pdf=tokens")
+    used = []
+    monkeypatch.setattr(ingestion, "_split", lambda pages, strategy, **kw: used.append(strategy) or [])
+    tmp = tmp_path / "tmpa1b2c3.pdf"
+    tmp.write_bytes(b"%PDF-1.1")
+
+    ingestion.load_and_split(str(tmp), filename="manual_pump.pdf")
+    ingestion.load_and_split_bytes(b"%PDF-1.1", filename="manual_pump.pdf")
+    ingestion.load_and_split(str(tmp))
+    assert used[:2] == ["tokens", "tokens"] and used[2] != "tokens"
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import sys
+import time
+import types
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# minimal stubs so app.vector_store / app.ingestion can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+langcore.Document = object
+sys.modules.setdefault("langchain_core.documents", langcore)
+
+import app.maintenance as maint  # noqa: E402
+import app.vector_store as vs  # noqa: E402
+
+
+def test_maintenance_vacuums_and_sweeps(tmp_path, monkeypatch):
+    persist, sessions = tmp_path / "persist", tmp_path / "sessions"
+    persist.mkdir()
+    sessions.mkdir()
+    db = persist / "chroma.sqlite3"
+    con = sqlite3.connect(db)
+    con.execute("CREATE TABLE embeddings (id INTEGER PRIMARY KEY, v BLOB)")
+    con.executemany("INSERT INTO embeddings (v) VALUES (?)", [(b"x" * 4000,)] * 200)
+    con.commit()
+    con.execute("DELETE FROM embeddings WHERE id > 20")
+    con.commit()
+    con.close()
+
+    old = sessions / "dead"
+    old.mkdir()
+    (old / "chroma.sqlite3").write_bytes(b"x")
+    past = time.time() - 3 * 3600
+    os.utime(old / "chroma.sqlite3", (past, past))
+    os.utime(old, (past, past))
+    (sessions / "live").mkdir()
+
+    monkeypatch.setattr(maint, "PERSIST_PATH", persist)
+    monkeypatch.setattr(maint, "SESSIONS_ROOT", sessions)
+    monkeypatch.setattr(maint, "SQLITE_FILE", db)
+    monkeypatch.setattr(maint, "MAINT_REPORT_FILE", tmp_path / "report.json")
+    monkeypatch.setattr(vs, "SOURCE_IDS_DIR", tmp_path)  # sidecar already present
+
+    result = maint.run()
+    assert result["orphan_sessions_removed"] == 1
+    assert not old.exists() and (sessions / "live").exists()
+    assert result["vacuumed"] is True
+    assert result["before"]["fragmentation"] > 0.5
+    assert result["after"]["fragmentation"] == 0
+    assert result["after"]["sqlite_bytes"] < result["before"]["sqlite_bytes"]
+    assert result["after"]["vectors"] == 20
+    assert maint.last_report()["after"]["vectors"] == 20
+
+
+def test_delete_source_uses_recorded_ids(tmp_path, monkeypatch):
+    calls = []
+
+    class Store:
+        def delete(self, ids=None, where=None):
+            calls.append((ids, where))
+
+    monkeypatch.setattr(vs, "SOURCE_IDS_DIR", tmp_path / "ids")
+    monkeypatch.setattr(vs, "persistent_store", Store())
+    vs._record_ids(["a1", "a2", "b1"], [{"source": "a.pdf"}, {"source": "a.pdf"}, {"source": "b.pdf"}])
+
+    vs.delete_source("a.pdf")
+    assert calls == [(["a1", "a2"], None)]
+    assert vs.source_ids("a.pdf") is None
+
+    vs.delete_source("legacy.pdf")          # no sidecar entry → metadata delete
+    assert calls[1:] == [(None, {"source": "legacy.pdf"}), (None, {"source_file": "legacy.pdf"})]
+
+
+def test_sweep_keeps_sessions_in_use(tmp_path, monkeypatch):
+    past = time.time() - 3 * 3600
+    for sid in ("queried", "local", "dead"):
+        d = tmp_path / sid
+        d.mkdir()
+        (d / "chroma.sqlite3").write_bytes(b"x")  # reads never bump this mtime
+        os.utime(d / "chroma.sqlite3", (past, past))
+        os.utime(d, (past, past))
+    monkeypatch.setattr(maint, "SESSIONS_ROOT", tmp_path)
+    monkeypatch.setattr(maint.session_manager, "_meta", {"local": object()})
+
+    import app.sessions as sessions
+    monkeypatch.setattr(sessions, "SESSIONS_ROOT", tmp_path)
+    sessions.mark_used("queried")  # e.g. by another worker's /session_qa
+
+    assert maint.sweep_orphan_sessions(60) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["local", "queried"]
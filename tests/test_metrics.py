@@ -0,0 +1,48 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.metrics as metrics  # noqa: E402
+
+
+def test_histogram_render():
+    h = metrics.Histogram("t_seconds", "test", ["stage"], buckets=(0.1, 1.0))
+    h.observe(0.05, stage="a")
+    h.observe(0.5, stage="a")
+    text = h.render()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1.0' in text
+    assert 't_seconds_bucket{stage="a",le="1.0"} 2.0' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 2.0' in text
+    assert 't_seconds_count{stage="a"} 2.0' in text
+
+
+def test_record_ollama_converts_nanoseconds():
+    before = metrics.OLLAMA_EVAL_TOKENS.value(model="m")
+    metrics.record_ollama("m", {"eval_duration": 2_000_000_000, "eval_count": 7})
+    assert metrics.OLLAMA_EVAL_TOKENS.value(model="m") == before + 7
+    assert metrics.OLLAMA_EVAL_SECONDS.count(model="m") >= 1
+
+
+def test_server_timing_header():
+    async def endpoint(scope, receive, send):
+        with metrics.span("doc_qa", "rerank"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    mw = metrics.ServerTimingMiddleware(endpoint)
+    asyncio.get_event_loop().run_until_complete(
+        mw({"type": "http", "method": "POST"}, None, send)
+    )
+
+    headers = dict(sent[0]["headers"])
+    timing = headers[b"server-timing"].decode()
+    assert timing.startswith("rerank;dur=")
+    assert "total;dur=" in timing
+    assert metrics.STAGE_SECONDS.count(op="doc_qa", stage="rerank") >= 1
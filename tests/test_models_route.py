@@ -7,15 +7,15 @@ sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 # stub httpx.AsyncClient
 httpx_mod = types.ModuleType("httpx")
+calls = []
 class AsyncClient:
     def __init__(self, *a, **k):
         pass
-    async def __aenter__(self):
-        return self
-    async def __aexit__(self, exc_type, exc, tb):
+    async def aclose(self):
         pass
     async def get(self, url):
         assert url == "http://ollama:11434/api/tags"
+        calls.append(url)
         class R:
             def raise_for_status(self):
                 pass
@@ -35,14 +35,53 @@ class AsyncClient:
                     ]
                 }
         return R()
+    async def post(self, url, json=None):
+        assert url == "http://ollama:11434/api/show"
+        calls.append((url, json["model"]))
+        class R:
+            def raise_for_status(self):
+                pass
+            def json(self):
+                return {
+                    "details": {"family": "llama", "parameter_size": "8B"},
+                    "model_info": {"general.architecture": "llama", "llama.context_length": 8192},
+                    "parameters": "stop \"<|eot_id|>\"\nnum_ctx 4096",
+                }
+        return R()
 httpx_mod.AsyncClient = AsyncClient
-sys.modules['httpx'] = httpx_mod
+sys.modules.setdefault("httpx", httpx_mod)
 
+import app.model_catalog as model_catalog  # noqa: E402
 import app.routes.models as models  # noqa: E402
-models.httpx = httpx_mod
 
-def test_list_models_route():
-    res = asyncio.get_event_loop().run_until_complete(models.list_models())
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_list_models_route(monkeypatch):
+    monkeypatch.setattr(model_catalog, "httpx", httpx_mod)
+    monkeypatch.setattr(models, "catalog", model_catalog.ModelCatalog("http://ollama:11434"))
+    calls.clear()
+    res = run(models.list_models())
     assert res == [
         {"name": "m1", "description": "f, 7B, q3"}
     ]
+    run(models.list_models())
+    assert calls == ["http://ollama:11434/api/tags"]  # second poll served from cache
+
+
+def test_details_and_context_limit(monkeypatch):
+    monkeypatch.setattr(model_catalog, "httpx", httpx_mod)
+    cat = model_catalog.ModelCatalog("http://ollama:11434", ttl_s=0)
+    calls.clear()
+    assert cat.context_limit("m1", default=2048) == 2048  # not fetched yet
+
+    info = run(cat.details("m1"))
+    assert (info.family, info.context_length, info.num_ctx) == ("llama", 8192, 4096)
+    assert cat.context_limit("m1") == 4096
+
+    run(cat.models())
+    run(cat.models())  # stale: served at once, refreshed in the background
+    run(asyncio.sleep(0))
+    assert calls.count("http://ollama:11434/api/tags") == 2
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.paragraphs import ParagraphCache, split_sections  # noqa: E402
+
+
+def test_split_sections_keeps_separators_and_glues_headings():
+    text = "Subject: leave\n\nThe unit will proceed on leave from Monday onwards as planned.\n\n\nSecond part follows here with enough words to stand alone."
+    sections = split_sections(text, max_tokens=100, min_tokens=5)
+    assert [s.text for s in sections] == [
+        "Subject: leave\n\nThe unit will proceed on leave from Monday onwards as planned.",
+        "Second part follows here with enough words to stand alone.",
+    ]
+    assert "".join(s.text + s.sep for s in sections) == text
+
+
+def test_split_sections_cuts_long_paragraph_at_sentences():
+    text = "One two three. Four five six. Seven eight nine."
+    sections = split_sections(text, max_tokens=5, min_tokens=0)
+    assert [s.text for s in sections] == ["One two three.", "Four five six.", "Seven eight nine."]
+
+
+def test_paragraph_cache_lru():
+    cache = ParagraphCache(maxsize=1)
+    k1 = ParagraphCache.key("proofread", "m", "a")
+    k2 = ParagraphCache.key("proofread", "m", "b")
+    cache.put(k1, "A")
+    cache.put(k2, "B")
+    assert cache.get(k1) is None
+    assert cache.get(k2) == "B"
+    assert ParagraphCache.key("redraft", "m", "a") != k1
@@ -152,6 +152,10 @@ class FastAPI:
         def decorator(fn):
             return fn
         return decorator
+    def websocket(self, *a, **k):
+        def decorator(fn):
+            return fn
+        return decorator
 
 def File(*a, **k):
     return None
@@ -176,6 +180,19 @@ class Depends:
     def __init__(self, dependency):
         self.dependency = dependency
 
+class WebSocket:
+    pass
+
+class WebSocketDisconnect(Exception):
+    pass
+
+class Response:
+    def __init__(self, content=None, media_type=None, status_code=200, headers=None):
+        self.body = content
+        self.media_type = media_type
+        self.status_code = status_code
+        self.headers = headers or {}
+
 class APIRouter:
     def get(self, *a, **k):
         def decorator(fn):
@@ -207,6 +224,9 @@ fastapi_stub.HTTPException = HTTPException
 fastapi_stub.Query = Query
 fastapi_stub.UploadFile = UploadFile
 fastapi_stub.Depends = Depends
+fastapi_stub.Response = Response
+fastapi_stub.WebSocket = WebSocket
+fastapi_stub.WebSocketDisconnect = WebSocketDisconnect
 fastapi_stub.APIRouter = APIRouter
 cors_mod = types.ModuleType('fastapi.middleware.cors')
 cors_mod.CORSMiddleware = CORSMiddleware
@@ -257,3 +277,30 @@ def test_proofread_endpoint(monkeypatch):
     assert resp.status_code == 200
     assert resp.json() == {"corrected": "fixed"}
 
+
+
+def test_proofread_long_text_is_split_and_cached(monkeypatch):
+    seen = []
+
+    def fake_chat(model, messages, stream=False):
+        text = messages[-1]["content"]
+        seen.append(text)
+        return {"message": {"content": text.upper()}}
+
+    monkeypatch.setattr(api, "safe_chat", fake_chat)
+    monkeypatch.setattr(api, "finalize_ollama_chat", lambda raw: raw)
+    api.paragraph_cache.clear()
+
+    para1 = "The first paragraph has quite a few words in it so it stands alone."
+    para2 = "The second paragraph is also long enough to be sent on its own."
+    client = TestClient(api.app)
+    resp = client.post("/proofread", json={"text": f"{para1}\n\n{para2}"})
+    assert resp.json() == {"corrected": f"{para1.upper()}\n\n{para2.upper()}"}
+    assert sorted(seen) == sorted([para1, para2])
+
+    # editing one paragraph only re-runs that paragraph
+    seen.clear()
+    edited = para2.replace("second", "edited")
+    resp = client.post("/proofread", json={"text": f"{para1}\n\n{edited}"})
+    assert resp.json() == {"corrected": f"{para1.upper()}\n\n{edited.upper()}"}
+    assert seen == [edited]
@@ -152,6 +152,10 @@ class FastAPI:
         def decorator(fn):
             return fn
         return decorator
+    def websocket(self, *a, **k):
+        def decorator(fn):
+            return fn
+        return decorator
 
 def File(*a, **k):
     return None
@@ -176,6 +180,19 @@ class Depends:
     def __init__(self, dependency):
         self.dependency = dependency
 
+class WebSocket:
+    pass
+
+class WebSocketDisconnect(Exception):
+    pass
+
+class Response:
+    def __init__(self, content=None, media_type=None, status_code=200, headers=None):
+        self.body = content
+        self.media_type = media_type
+        self.status_code = status_code
+        self.headers = headers or {}
+
 class APIRouter:
     def get(self, *a, **k):
         def decorator(fn):
@@ -199,6 +216,9 @@ fastapi_stub.HTTPException = HTTPException
 fastapi_stub.Query = Query
 fastapi_stub.UploadFile = UploadFile
 fastapi_stub.Depends = Depends
+fastapi_stub.Response = Response
+fastapi_stub.WebSocket = WebSocket
+fastapi_stub.WebSocketDisconnect = WebSocketDisconnect
 fastapi_stub.APIRouter = APIRouter
 cors_mod = types.ModuleType('fastapi.middleware.cors')
 cors_mod.CORSMiddleware = CORSMiddleware
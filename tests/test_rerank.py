@@ -0,0 +1,51 @@
+import sys
+import types
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+st_mod = types.ModuleType("sentence_transformers")
+class CrossEncoder:
+    def __init__(self, *a, **k):
+        pass
+st_mod.CrossEncoder = CrossEncoder
+sys.modules.setdefault("sentence_transformers", st_mod)
+
+import app.rerank as rr  # noqa: E402
+
+
+def _vecs(sims):
+    # unit vectors whose cosine with (1, 0) is exactly *s*
+    return [[s, (1 - s * s) ** 0.5] for s in sims]
+
+
+def test_prefilter_keeps_close_candidates_and_quota():
+    sims = [0.95, 0.93, 0.9, 0.5, 0.45, 0.4, 0.35, 0.3, 0.2, 0.1]
+    groups = ["a", "a", "a", "a", "a", "a", "b", "a", "c", "a"]
+    keep = rr.prefilter([1.0, 0.0], _vecs(sims), top_k=2, groups=groups,
+                        min_keep=3, max_keep=8, gap=0.1, diversity=1)
+    # three leaders within the gap, then the best candidate from another source
+    assert keep == [0, 1, 2, 6]
+
+
+def test_prefilter_keeps_candidates_without_vectors():
+    vecs = _vecs([0.9, 0.1, 0.1, 0.1]) + [None]
+    keep = rr.prefilter([1.0, 0.0], vecs, top_k=1, min_keep=1, gap=0.05, diversity=0)
+    assert keep == [0, 4]
+
+
+def test_rerank_only_scores_prefiltered(monkeypatch):
+    seen = []
+
+    class Cross:
+        def predict(self, pairs):
+            seen.extend(d for _, d in pairs)
+            return [len(d) for _, d in pairs]
+
+    monkeypatch.setattr(rr, "_cross", lambda: Cross())
+    before = rr.PAIRS.value(result="skipped")
+    docs = [f"d{i}" * (i + 1) for i in range(10)]
+    sims = [0.9, 0.89] + [0.1] * 8
+    out = rr.rerank("q", docs, top_k=1, query_vec=[1.0, 0.0], doc_vecs=_vecs(sims))
+    assert len(seen) == rr.PREFILTER_MIN
+    assert out == [max(seen, key=len)]
+    assert rr.PAIRS.value(result="skipped") - before == 10 - rr.PREFILTER_MIN
@@ -0,0 +1,97 @@
+import sys
+import asyncio
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.scheduler as sched  # noqa: E402
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_priority_and_fairness_order():
+    s = sched.LLMScheduler(default_limit=1, deadline_s=1000, slot_dir=None)
+    order = []
+    gate = asyncio.Event()
+
+    async def call(name, priority, client):
+        async with s.slot("m", priority=priority, client=client):
+            order.append(name)
+            if name == "first":
+                await gate.wait()
+
+    async def main():
+        first = asyncio.ensure_future(call("first", sched.PRIORITY_INTERACTIVE, "x"))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.ensure_future(call("bulk", sched.PRIORITY_BULK, "a")),
+            asyncio.ensure_future(call("a1", sched.PRIORITY_INTERACTIVE, "a")),
+            asyncio.ensure_future(call("a2", sched.PRIORITY_INTERACTIVE, "a")),
+            asyncio.ensure_future(call("b1", sched.PRIORITY_INTERACTIVE, "b")),
+        ]
+        await asyncio.sleep(0)
+        assert s.depth("m") == 4
+        gate.set()
+        await asyncio.gather(first, *tasks)
+
+    _run(main())
+    # interactive before bulk, and client b is not stuck behind both of a's calls
+    assert order == ["first", "a1", "b1", "a2", "bulk"]
+
+
+def test_rejects_when_estimated_wait_exceeds_deadline():
+    s = sched.LLMScheduler(default_limit=1, deadline_s=5, slot_dir=None)
+    s._queue("m").service_s = 10
+
+    async def main():
+        async with s.slot("m"):
+            with pytest.raises(sched.SchedulerBusy) as exc:
+                async with s.slot("m"):
+                    pass
+            assert exc.value.retry_after == 10
+
+    _run(main())
+    assert s._queue("m").active == 0
+
+
+def test_rejection_does_not_push_client_back():
+    s = sched.LLMScheduler(default_limit=1, deadline_s=5, slot_dir=None)
+    q = s._queue("m")
+    q.service_s = 10
+
+    async def main():
+        async with s.slot("m", client="x"):
+            for _ in range(3):
+                with pytest.raises(sched.SchedulerBusy):
+                    async with s.slot("m", client="a"):
+                        pass
+
+    _run(main())
+    assert q.client_tags == {(sched.PRIORITY_INTERACTIVE, "x"): 1.0}
+    assert q.next_tag(sched.PRIORITY_INTERACTIVE, "a") == 2.0
+
+
+@pytest.mark.skipif(sched.fcntl is None, reason="needs flock")
+def test_host_slot_wait_is_bounded(tmp_path):
+    s = sched.LLMScheduler(default_limit=1, deadline_s=0.2, slot_dir=str(tmp_path))
+    other = sched._HostSlots(str(tmp_path))  # another worker holding the token
+    fd = other._try_take("m", 1)
+
+    async def main():
+        with pytest.raises(sched.SchedulerBusy):
+            async with s.slot("m"):
+                pass
+
+    try:
+        _run(asyncio.wait_for(main(), 5))
+    finally:
+        other.give(fd)
+    assert s._queue("m").active == 0
+
+
+def test_parse_limits():
+    assert sched._parse_limits("llama3:8b=2, mistral=1") == {"llama3:8b": 2, "mistral": 1}
+    with pytest.raises(ValueError):
+        sched._parse_limits("m=x")
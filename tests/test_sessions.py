@@ -0,0 +1,136 @@
+import asyncio
+import time
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# minimal stubs so app.vector_store can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+langcore.Document = object
+sys.modules.setdefault("langchain_core.documents", langcore)
+
+import app.sessions as sessions  # noqa: E402
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    calls = {"opened": [], "closed": [], "purged": []}
+
+    def new(sid):
+        calls["opened"].append(sid)
+        return f"store-{sid}"
+
+    def get(sid):
+        if sid.startswith("missing"):
+            raise ValueError(f"Session '{sid}' not found")
+        return new(sid)
+
+    monkeypatch.setattr(sessions, "new_session_store", new)
+    monkeypatch.setattr(sessions, "get_session_store", get)
+    monkeypatch.setattr(sessions, "close_store", calls["closed"].append)
+    monkeypatch.setattr(sessions, "purge_session_store", calls["purged"].append)
+    return calls
+
+
+def run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+async def _use(mgr, sid, **kw):
+    async with mgr.use(sid, **kw) as store:
+        return store
+
+
+def test_handle_lru_skips_pinned_and_reuses_open(backend):
+    mgr = sessions.SessionManager(max_open=2)
+
+    async def scenario():
+        async with mgr.use("a", create=True):
+            await _use(mgr, "b", create=True)
+            await _use(mgr, "c", create=True)  # "a" is pinned, so "b" goes
+        await _use(mgr, "a")
+
+    run(scenario())
+    assert backend["closed"] == ["store-b"]
+    assert backend["opened"] == ["a", "b", "c"]  # "a" was still open
+    assert mgr.usage("a")["open"] and not mgr.usage("b")["open"]
+
+
+def test_expiry_heap_honours_touch_and_runs_hooks(backend, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: clock[0])
+    mgr = sessions.SessionManager(ttl_s=60)
+    forgotten = []
+    mgr.on_expire(forgotten.append)
+
+    run(_use(mgr, "a", create=True))
+    mgr.touch("b")
+    clock[0] += 50
+    mgr.touch("a")  # "a" now lives until 1110
+    clock[0] += 20
+    assert run(mgr.expire_due()) == 1
+    assert forgotten == ["b"] and backend["purged"] == ["b"]
+    assert "a" in mgr and "b" not in mgr
+
+    clock[0] += 100
+    run(mgr.expire_due())
+    assert backend["closed"] == ["store-a"] and len(mgr) == 0
+
+
+def test_quotas_and_unknown_session(backend):
+    mgr = sessions.SessionManager(max_chunks=10, max_bytes=1000)
+    mgr.check_upload("s", 600, 6)
+    mgr.charge("s", 600, 6)
+    with pytest.raises(sessions.SessionQuotaExceeded, match="MB"):
+        mgr.check_upload("s", 500)
+    with pytest.raises(sessions.SessionQuotaExceeded, match="chunks"):
+        mgr.check_upload("s", 100, 5)
+
+    with pytest.raises(ValueError):
+        run(_use(mgr, "missing-1"))
+    assert "missing-1" not in mgr
+
+
+def test_end_waits_for_requests_using_the_session(backend):
+    mgr = sessions.SessionManager()
+    forgotten = []
+    mgr.on_expire(forgotten.append)
+
+    async def scenario():
+        async with mgr.use("s", create=True):
+            await mgr.end("s")  # DELETE /session/s during an upload
+            assert backend["purged"] == [] and backend["closed"] == []
+            with pytest.raises(ValueError):
+                await _use(mgr, "s")  # no new requests once ended
+            assert mgr.due(time.monotonic() + 10 * mgr.ttl_s) == []  # pinned: not expired
+        assert backend["closed"] == ["store-s"] and backend["purged"] == ["s"]
+
+    run(scenario())
+    assert forgotten == ["s"] and "s" not in mgr
+
+
+def test_due_skips_pinned_sessions_with_zero_ttl(backend):
+    mgr = sessions.SessionManager(ttl_s=0)
+
+    async def scenario():
+        async with mgr.use("s", create=True):
+            assert mgr.due() == []  # returns instead of re-arming forever
+        assert mgr.due() == ["s"]
+
+    run(scenario())
@@ -0,0 +1,140 @@
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# minimal stubs so app.vector_store can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+
+
+class Document:
+    def __init__(self, page_content, metadata=None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+langcore.Document = Document
+sys.modules.setdefault("langchain_core.documents", langcore)
+
+import app.flat_index as flat_index  # noqa: E402
+import app.shards as shards  # noqa: E402
+import app.vector_store as vs  # noqa: E402
+
+
+class Collection:
+    def __init__(self):
+        self.rows = {}
+        self.queries = []
+
+    def count(self):
+        return len(self.rows)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, d, m, e in zip(ids, documents, metadatas, embeddings):
+            self.rows[i] = (d, m, e)
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        self.queries.append(where)
+        q = query_embeddings[0]
+        hits = []
+        wanted = None
+        if where:
+            cond = where["source"]
+            wanted = cond["$in"] if isinstance(cond, dict) else [cond]
+        for cid, (doc, meta, vec) in self.rows.items():
+            if wanted is not None and meta.get("source") not in wanted:
+                continue
+            hits.append((sum((a - b) ** 2 for a, b in zip(q, vec)), cid, doc, meta, vec))
+        hits.sort()
+        hits = hits[:n_results]
+        return {
+            "ids": [[h[1] for h in hits]],
+            "documents": [[h[2] for h in hits]],
+            "metadatas": [[h[3] for h in hits]],
+            "embeddings": [[h[4] for h in hits]],
+            "distances": [[h[0] for h in hits]],
+        }
+
+
+class Store:
+    def __init__(self):
+        self._collection = Collection()
+
+    def delete(self, ids):
+        for i in ids:
+            self._collection.rows.pop(i, None)
+
+
+def _kb(monkeypatch, tmp_path):
+    monkeypatch.setattr(shards, "KB_SHARD_RULES", "manual_*.pdf=manuals")
+    monkeypatch.setattr(shards, "KB_SHARD_COUNT", 0)
+    monkeypatch.setattr(vs, "SOURCE_IDS_DIR", tmp_path / "ids")
+    monkeypatch.setattr(flat_index, "FLAT_INDEX", False)
+    monkeypatch.setattr(vs, "Document", Document)
+    stores = {name: Store() for name in ("default", "manuals")}
+    monkeypatch.setattr(vs, "persistent_store", stores["default"])
+    monkeypatch.setattr(vs, "_SHARD_STORES", {"manuals": stores["manuals"]})
+    vs.write_embedded(
+        ["m1", "m2", "o1", "o2"],
+        ["manual one", "manual two", "other one", "other two"],
+        [{"source": "manual_a.pdf"}, {"source": "manual_b.pdf"}, {"source": "notes.pdf"}, {"source": "notes.pdf"}],
+        [[0.0, 0.0], [1.0, 0.0], [0.1, 0.0], [5.0, 5.0]],
+    )
+    return {k: s._collection for k, s in stores.items()}
+
+
+def test_router_rules_and_hash_buckets():
+    assert shards.shard_for("/x/manual_7.pdf", rules="manual_*=manuals;hr_*=hr") == "manuals"
+    assert shards.shard_for("notes.pdf", rules="manual_*=manuals", count=0) == "default"
+    bucket = shards.shard_for("notes.pdf", rules="", count=4)
+    assert bucket in {"h00", "h01", "h02", "h03"} and bucket == shards.shard_for("notes.pdf", rules="", count=4)
+    assert shards.collection_name("default") == "persistent_docs"
+    assert shards.shard_of_collection(shards.collection_name("h03")) == "h03"
+    assert shards.shard_of_collection("something_else") is None
+
+
+def test_writes_route_and_fan_out_merges_by_distance(monkeypatch, tmp_path):
+    colls = _kb(monkeypatch, tmp_path)
+    assert set(colls["manuals"].rows) == {"m1", "m2"} and set(colls["default"].rows) == {"o1", "o2"}
+    assert vs.count() == 4
+
+    hits = vs.search_with_vectors("q", k=3, query_embedding=[0.0, 0.0])
+    assert [d.page_content for d in hits.docs] == ["manual one", "other one", "manual two"]
+
+    vs.delete_source("manual_a.pdf")  # found through the id sidecar's shard
+    assert set(colls["manuals"].rows) == {"m2"} and vs.count() == 3
+
+
+def test_prune_source_drops_tail_of_shorter_reindex(monkeypatch, tmp_path):
+    colls = _kb(monkeypatch, tmp_path)
+    vs.write_embedded(["o1"], ["other one v2"], [{"source": "notes.pdf"}], [[0.1, 0.0]])
+    assert set(colls["default"].rows) == {"o1", "o2"}  # upsert alone keeps the old tail
+
+    assert vs.prune_source("notes.pdf", ["o1"]) == 1
+    assert set(colls["default"].rows) == {"o1"} and vs.source_ids("notes.pdf") == ["o1"]
+    assert vs.prune_source("notes.pdf", ["o1"]) == 0
+
+
+def test_source_and_collection_filters_query_only_needed_shards(monkeypatch, tmp_path):
+    colls = _kb(monkeypatch, tmp_path)
+
+    hits = vs.search_with_vectors("q", k=5, query_embedding=[0.0, 0.0], sources=["notes.pdf"])
+    assert [d.metadata["source"] for d in hits.docs] == ["notes.pdf", "notes.pdf"]
+    assert colls["manuals"].queries == [] and colls["default"].queries == [{"source": "notes.pdf"}]
+
+    hits = vs.search_with_vectors("q", k=5, query_embedding=[0.0, 0.0], shard_filter=["manuals"])
+    assert {d.metadata["source"] for d in hits.docs} == {"manual_a.pdf", "manual_b.pdf"}
+    assert len(colls["default"].queries) == 1
@@ -0,0 +1,70 @@
+import sys
+import asyncio
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.singleflight import SingleFlight, normalize_text  # noqa: E402
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_do_coalesces_concurrent_calls():
+    flight = SingleFlight("t")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert _run(main()) == ["answer"] * 5
+    assert len(calls) == 1
+    assert not flight.in_flight("k")
+
+
+def test_do_survives_one_waiter_cancelling():
+    flight = SingleFlight("t")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert _run(main()) == 42
+
+
+def test_stream_shares_tokens_with_late_subscriber():
+    flight = SingleFlight("t")
+    produced = []
+
+    async def tokens():
+        for tok in ["a", "b", "c"]:
+            produced.append(tok)
+            await asyncio.sleep(0.005)
+            yield tok
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return [t async for t in flight.stream("k", tokens)]
+
+    async def main():
+        return await asyncio.gather(collect(0), collect(0.007))
+
+    early, late = _run(main())
+    assert early == late == ["a", "b", "c"]
+    assert produced == ["a", "b", "c"]
+
+
+def test_normalize_text():
+    assert normalize_text("  What IS\tthe  SOP? ") == "what is the sop?"
@@ -0,0 +1,99 @@
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+np = pytest.importorskip("numpy")
+
+# minimal stubs so app.vector_store can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+langcore.Document = object
+sys.modules.setdefault("langchain_core.documents", langcore)
+
+import app.snapshot as snapshot  # noqa: E402
+import app.vector_store as vs  # noqa: E402
+
+
+class Collection:
+    metadata = {"hnsw:space": "l2"}
+
+    def __init__(self):
+        self.rows = {}
+
+    def count(self):
+        return len(self.rows)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for i, d, m, e in zip(ids, documents, metadatas, embeddings):
+            self.rows[i] = (d, m, list(e))
+
+    def get(self, include=(), limit=None, offset=0):
+        keys = sorted(self.rows)[offset:offset + limit if limit else None]
+        return {
+            "ids": keys,
+            "documents": [self.rows[k][0] for k in keys],
+            "metadatas": [self.rows[k][1] for k in keys],
+            "embeddings": [self.rows[k][2] for k in keys],
+        }
+
+
+def _use(monkeypatch, coll, tmp_path):
+    monkeypatch.setattr(vs, "persistent_store", types.SimpleNamespace(_collection=coll))
+    monkeypatch.setattr(vs, "SOURCE_IDS_DIR", tmp_path / "ids")
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    src = Collection()
+    src.upsert(
+        ["a", "b", "c"],
+        ["alpha", "βeta", "gamma"],
+        [{"source": "x.pdf", "page": 1}, {"source": "x.pdf", "page": 2}, {"source": "y.pdf"}],
+        [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]],
+    )
+    _use(monkeypatch, src, tmp_path)
+    monkeypatch.setattr(snapshot, "PAGE", 2)  # exercise paging
+    path = tmp_path / "kb.npz"
+    manifest = snapshot.export_snapshot(path)
+    assert manifest["count"] == 3 and manifest["dim"] == 2
+    assert snapshot.read_manifest(path)["embed_model"] == vs.EMBED_MODEL
+
+    dst = Collection()
+    _use(monkeypatch, dst, tmp_path)
+    assert snapshot.import_snapshot(path) == 3
+    assert dst.rows["b"][0] == "βeta"
+    assert dst.rows["a"][1] == {"source": "x.pdf", "page": 1}
+    assert np.allclose(dst.rows["c"][2], [0.5, 0.6])
+    assert sorted(vs.source_ids("x.pdf")) == ["a", "b"]
+
+    # already populated: refused unless asked, skipped with --if-empty
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.import_snapshot(path)
+    assert snapshot.import_snapshot(path, if_empty=True) == 0
+
+
+def test_snapshot_refuses_other_embedding_model(tmp_path, monkeypatch):
+    src = Collection()
+    src.upsert(["a"], ["alpha"], [{}], [[1.0, 0.0]])
+    _use(monkeypatch, src, tmp_path)
+    path = tmp_path / "kb.npz"
+    snapshot.export_snapshot(path)
+
+    _use(monkeypatch, Collection(), tmp_path)
+    monkeypatch.setattr(snapshot, "EMBED_MODEL", "mxbai-embed-large")
+    with pytest.raises(snapshot.SnapshotError, match="EMBED_MODEL"):
+        snapshot.import_snapshot(path)
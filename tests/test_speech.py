@@ -1,6 +1,7 @@
 import sys
 import types
 from pathlib import Path
+import pytest
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
 # stub whisper
@@ -19,3 +20,31 @@ def test_transcribe_audio(tmp_path):
     audio = tmp_path / 'a.wav'
     audio.write_bytes(b'fake')
     assert speech.transcribe_audio(audio) == f'transcribed {audio.name}'
+
+
+def test_split_on_silence_cuts_at_quiet_frame():
+    np = pytest.importorskip("numpy")
+    sr = 100
+    audio = np.ones(25 * sr, dtype=np.float32)
+    audio[12 * sr:12 * sr + 5] = 0.0  # short pause at 12 s
+    ranges = speech.split_on_silence(audio, sample_rate=sr, max_s=20, min_s=5, frame_s=0.03)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(audio)
+    assert abs(ranges[0][1] - 12 * sr) <= 3
+    assert all(b - a <= 20 * sr for a, b in ranges)
+
+
+def test_transcribe_reports_rtf_and_offsets(monkeypatch):
+    np = pytest.importorskip("numpy")
+
+    class SegModel:
+        def transcribe(self, audio):
+            return {"text": "x", "segments": [{"start": 0.0, "end": len(audio) / 16000}]}
+
+    monkeypatch.setattr(speech, "_POOL", speech._ReplicaPool(2))
+    monkeypatch.setattr(speech, "_load_model", SegModel)
+    monkeypatch.setattr(whisper_mod, "load_audio", lambda p: np.ones(16000 * 50, dtype=np.float32), raising=False)
+    out = speech.transcribe("a.wav")
+    assert out.text == "x x"
+    assert out.duration_s == 50
+    assert out.segments[-1]["end"] == 50
+    assert out.rtf is not None
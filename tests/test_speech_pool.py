@@ -0,0 +1,95 @@
+import sys
+import asyncio
+from pathlib import Path
+import pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import app.speech_pool as sp  # noqa: E402
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _audio(tmp_path, name):
+    p = tmp_path / name
+    p.write_bytes(b"fake")
+    return p
+
+
+def test_result_cached_by_digest(tmp_path, monkeypatch):
+    calls = []
+
+    def work(path):
+        calls.append(path)
+        return {"text": "hello", "segments": [], "duration_s": 2.0, "elapsed_s": 1.0}
+
+    monkeypatch.setattr(sp, "_work", work)
+    pool = sp.TranscriptionPool(workers=0, max_queue=2, cache_dir=tmp_path / "cache")
+
+    first = _audio(tmp_path, "a.wav")
+    assert _run(pool.transcribe(first, "abc"))["text"] == "hello"
+    assert not first.exists()  # pool cleans up the upload
+
+    # same content again – served from cache, also by a fresh pool (disk cache)
+    again = sp.TranscriptionPool(workers=0, max_queue=2, cache_dir=tmp_path / "cache")
+    assert _run(again.transcribe(_audio(tmp_path, "b.wav"), "abc"))["text"] == "hello"
+    assert len(calls) == 1
+
+
+def test_queue_limit_raises_busy(tmp_path, monkeypatch):
+    release = asyncio.Event()
+
+    async def slow_run(self, path):
+        await release.wait()
+        return {"text": "t", "segments": [], "duration_s": None, "elapsed_s": 0.0}
+
+    monkeypatch.setattr(sp.TranscriptionPool, "_run", slow_run)
+    pool = sp.TranscriptionPool(workers=0, max_queue=1, cache_dir=tmp_path / "cache")
+
+    async def main():
+        first = asyncio.ensure_future(pool.transcribe(_audio(tmp_path, "a.wav"), "d1"))
+        await asyncio.sleep(0)
+        with pytest.raises(sp.SpeechBusy):
+            await pool.transcribe(_audio(tmp_path, "b.wav"), "d2")
+        # identical upload joins the running job instead of being rejected
+        joined = asyncio.ensure_future(pool.transcribe(_audio(tmp_path, "c.wav"), "d1"))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(first, joined)
+
+    a, b = _run(main())
+    assert a == b
+    assert pool.pending == 0
+
+
+def test_cancelled_caller_keeps_job_accounted_and_cached(tmp_path, monkeypatch):
+    release = asyncio.Event()
+    runs = []
+
+    async def slow_run(self, path):
+        runs.append(path)
+        await release.wait()
+        return {"text": "t", "segments": [], "duration_s": None, "elapsed_s": 0.0}
+
+    monkeypatch.setattr(sp.TranscriptionPool, "_run", slow_run)
+    pool = sp.TranscriptionPool(workers=0, max_queue=1, cache_dir=tmp_path / "cache", model="base")
+
+    async def main():
+        first = asyncio.ensure_future(pool.transcribe(_audio(tmp_path, "a.wav"), "d1"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert pool.pending == 1  # the job is still running
+        joined = asyncio.ensure_future(pool.transcribe(_audio(tmp_path, "b.wav"), "d1"))
+        await asyncio.sleep(0)
+        release.set()
+        return await joined
+
+    assert _run(main())["text"] == "t"
+    assert len(runs) == 1 and pool.pending == 0
+
+    # cached for this model only
+    assert pool.cache.get(pool._key("d1")) is not None
+    other = sp.TranscriptionPool(workers=0, cache_dir=tmp_path / "cache", model="large-v3")
+    assert other.cache.get(other._key("d1")) is None
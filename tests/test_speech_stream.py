@@ -0,0 +1,51 @@
+import sys
+from array import array
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.speech_stream import StreamingTranscriber  # noqa: E402
+
+SR = 1000  # small rate keeps the pure-python RMS loop fast
+
+
+def _pcm(seconds, level):
+    return array("h", [level] * int(seconds * SR)).tobytes()
+
+
+def _make(calls):
+    def transcribe(pcm):
+        calls.append(len(pcm) // 2)
+        return f"utt{len(calls)}"
+
+    return StreamingTranscriber(
+        transcribe,
+        sample_rate=SR,
+        silence_s=0.5,
+        partial_every_s=1.0,
+        window_s=2.0,
+        max_utterance_s=10,
+        silence_rms=100,
+    )
+
+
+def test_partial_then_final_after_silence():
+    calls = []
+    st = _make(calls)
+    assert st.feed(_pcm(2.0, 0)) == []           # leading silence is trimmed
+    events = st.feed(_pcm(1.2, 1000))            # speech -> partial
+    assert [e["type"] for e in events] == ["partial"]
+    events = st.feed(_pcm(0.6, 0))               # pause -> final
+    assert [e["type"] for e in events] == ["final"]
+    final = events[0]
+    assert 1.4 <= final["start"] <= 2.0
+    assert final["end"] > 3.2
+    assert st.buf == array("h")
+
+
+def test_finish_flushes_pending_speech():
+    calls = []
+    st = _make(calls)
+    st.feed(_pcm(0.5, 1000))
+    events = st.finish()
+    assert [e["type"] for e in events] == ["final"]
+    assert st.finish() == []
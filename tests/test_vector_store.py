@@ -54,3 +54,18 @@ def test_persist_has_source(monkeypatch):
     monkeypatch.setattr(vs, "persistent_store", store)
     assert vs.persist_has_source("a.pdf") is True
     assert vs.persist_has_source("c.pdf") is False
+
+
+def test_persistent_store_opens_lazily_once(monkeypatch, tmp_path):
+    opened = []
+    monkeypatch.delitem(vars(vs), "persistent_store", raising=False)
+    monkeypatch.setattr(vs, "PERSIST_PATH", tmp_path / "persist")
+    monkeypatch.setattr(vs, "_open_chroma", lambda path, name, **kw: opened.append(name) or object())
+
+    first = vs.persistent_store
+    assert vs.get_persistent_store() is first and opened == ["persistent_docs"]
+    assert (tmp_path / "persist").is_dir()
+
+    patched = DummyStore([])
+    monkeypatch.setattr(vs, "persistent_store", patched)
+    assert vs.get_persistent_store() is patched and len(opened) == 1
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import types
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# minimal stubs so app.vector_store / app.ingestion can import
+chromadb = types.ModuleType("chromadb")
+chromadb.PersistentClient = lambda *a, **k: None
+sys.modules.setdefault("chromadb", chromadb)
+config = types.ModuleType("chromadb.config")
+config.Settings = lambda *a, **k: None
+sys.modules.setdefault("chromadb.config", config)
+emb = types.ModuleType("langchain_community.embeddings")
+emb.OllamaEmbeddings = lambda *a, **k: types.SimpleNamespace()
+sys.modules.setdefault("langchain_community.embeddings", emb)
+vecstores = types.ModuleType("langchain_chroma")
+vecstores.Chroma = lambda *a, **k: None
+sys.modules.setdefault("langchain_chroma", vecstores)
+langcore = types.ModuleType("langchain_core.documents")
+langcore.Document = object
+sys.modules.setdefault("langchain_core.documents", langcore)
+loaders = types.ModuleType("langchain_community.document_loaders")
+loaders.PyPDFLoader = object
+sys.modules.setdefault("langchain_community.document_loaders", loaders)
+splitters = types.ModuleType("langchain_text_splitters")
+splitters.RecursiveCharacterTextSplitter = object
+sys.modules.setdefault("langchain_text_splitters", splitters)
+schema = types.ModuleType("langchain.schema")
+schema.Document = object
+sys.modules.setdefault("langchain.schema", schema)
+
+import app.watcher as watcher_mod  # noqa: E402
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_watcher_adds_changes_and_removes(tmp_path, monkeypatch):
+    indexed, deleted = [], []
+
+    class Pipe:
+        def __init__(self, name, on_file=None):
+            self.on_file = on_file
+
+        async def run(self, paths):
+            indexed.extend(p.name for p in paths)
+            for p in paths:
+                self.on_file(p, "empty" if b"scan" in p.read_bytes() else "indexed", 1, 0.1, None)
+            return types.SimpleNamespace(failed=0)
+
+    monkeypatch.setattr(watcher_mod, "IngestPipeline", Pipe)
+    monkeypatch.setattr(watcher_mod, "delete_source", deleted.append)
+
+    (tmp_path / "old.pdf").write_bytes(b"%PDF old")
+    w = watcher_mod.FolderWatcher(tmp_path, settle_s=0.0, force_polling=True)
+    w._seen = w.snapshot()
+    w._known = dict(w._seen)
+
+    # a new file shows up; a partial write keeps it dirty until it settles
+    new = tmp_path / "new.pdf"
+    new.write_bytes(b"%PDF")
+    w.mark(w.poll())
+    new.write_bytes(b"%PDF more")
+    assert w.settled() == []
+    assert w.settled() == ["new.pdf"]
+    _run(w.process(["new.pdf"]))
+    assert indexed == ["new.pdf"] and deleted == []
+
+    # nothing changed → nothing to do
+    _run(w.process(["new.pdf"]))
+    assert indexed == ["new.pdf"]
+
+    # overwrite an existing file → re-indexed in place (the writer prunes the rest)
+    (tmp_path / "old.pdf").write_bytes(b"%PDF old but longer")
+    os.utime(tmp_path / "old.pdf", (1, 1))
+    assert "old.pdf" in w.poll()
+    _run(w.process(["old.pdf"]))
+    assert deleted == [] and indexed[-1] == "old.pdf"
+
+    # overwritten by a text-less scan → its old chunks go once that is known
+    (tmp_path / "old.pdf").write_bytes(b"%PDF scan only")
+    os.utime(tmp_path / "old.pdf", (2, 2))
+    assert "old.pdf" in w.poll()
+    _run(w.process(["old.pdf"]))
+    assert deleted == ["old.pdf"] and indexed[-1] == "old.pdf"
+
+    # removal
+    new.unlink()
+    assert w.poll() == {"new.pdf"}
+    _run(w.process(["new.pdf"]))
+    assert deleted == ["old.pdf", "new.pdf"]